@@ -0,0 +1,169 @@
+"""
+DeepSeek 响应的内容寻址缓存（磁盘 JSON，按请求内容的 sha256 命名）。
+
+aiDeepSeekAnly 每次都把最新 80 根 K 线发给模型，webhtml 报告每次重新生成也会重发同一份提示词，
+单次调用可能耗时数分钟。只要 (模型, 系统提示词, 用户提示词, 数据行, 采样参数) 完全相同，
+模型输出就可以复用：
+- 键: 上述内容规范化 JSON 的 sha256，数据或提示词任何变化都会得到新键；
+- 有效期: config.AI_CACHE_TTL，"close" 表示有效至下一个收盘时刻（同一交易日内重跑直接命中），
+  也可以是秒数；0 表示关闭缓存；
+- 容量: 超过 AI_CACHE_MAX_ENTRIES / AI_CACHE_MAX_BYTES 时先删过期条目，再按最近使用时间淘汰；
+- 只缓存完整的响应，失败、截断的结果不写入。
+命中的结果由调用方在邮件/报告中标注 CACHED_MARK。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import AI_CACHE_DIR, AI_CACHE_TTL, AI_CACHE_MAX_ENTRIES, AI_CACHE_MAX_BYTES
+
+CACHED_MARK = "(缓存结果)"
+
+
+def request_key(**parts: Any) -> str:
+    """把请求内容规范化后取 sha256；参数名与取值都参与计算。"""
+    canonical = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def cached_label(created_at: Optional[float] = None) -> str:
+    """邮件/报告中的缓存标注，如 "(缓存结果，生成于 10-18 15:32)"。"""
+    if not created_at:
+        return CACHED_MARK
+    stamp = datetime.fromtimestamp(created_at).strftime("%m-%d %H:%M")
+    return f"(缓存结果，生成于 {stamp})"
+
+
+class AIResponseCache:
+    """按请求哈希缓存模型响应，带有效期与容量上限。"""
+
+    def __init__(self, cache_dir: Optional[Path] = None, ttl: Any = AI_CACHE_TTL,
+                 max_entries: int = AI_CACHE_MAX_ENTRIES, max_bytes: int = AI_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir or AI_CACHE_DIR)
+        self.ttl = ttl
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl == "close" or float(self.ttl) > 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _expires_at(self, created_at: float) -> float:
+        if self.ttl == "close":
+            from quote_cache import next_market_close
+            return next_market_close(created_at)
+        return created_at + float(self.ttl)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """返回缓存条目 {"response", "created_at", "expires_at", "meta"}；未命中或已过期返回 None。"""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            entry = None
+        if entry is None or entry.get("expires_at", 0) <= time.time():
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        try:
+            # 以 mtime 记录最近使用时间，淘汰时优先保留常用条目
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.stats["hits"] += 1
+        return entry
+
+    def put(self, key: str, response: Any, meta: Optional[Dict[str, Any]] = None) -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        entry = {
+            "key": key,
+            "created_at": now,
+            "expires_at": self._expires_at(now),
+            "meta": meta or {},
+            "response": response,
+        }
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as exc:
+            # 缓存写入失败不影响分析结果
+            print(f"[AI缓存] 写入失败: {exc}")
+            return
+        with self._lock:
+            self.stats["writes"] += 1
+        self.evict()
+
+    def evict(self) -> int:
+        """删除过期条目，并按最近使用时间淘汰到容量上限以内，返回删除数量。"""
+        try:
+            files = []
+            for path in self.cache_dir.glob("*.json"):
+                st = path.stat()
+                files.append((st.st_mtime, st.st_size, path))
+        except OSError:
+            return 0
+
+        now = time.time()
+        removed = []
+        kept = []
+        for mtime, size, path in files:
+            try:
+                expires_at = json.loads(path.read_text(encoding="utf-8")).get("expires_at", 0)
+            except (OSError, ValueError):
+                expires_at = 0
+            (removed if expires_at <= now else kept).append((mtime, size, path))
+
+        kept.sort(key=lambda item: item[0])
+        total = sum(size for _, size, _ in kept)
+        while kept and (len(kept) > self.max_entries or total > self.max_bytes):
+            item = kept.pop(0)
+            total -= item[1]
+            removed.append(item)
+
+        count = 0
+        for _, _, path in removed:
+            try:
+                path.unlink()
+                count += 1
+            except OSError:
+                pass
+        with self._lock:
+            self.stats["evictions"] += count
+        return count
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+
+_shared_cache: Optional[AIResponseCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_ai_cache() -> AIResponseCache:
+    """返回进程内共享的 AI 响应缓存。"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = AIResponseCache()
+    return _shared_cache
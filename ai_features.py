@@ -0,0 +1,236 @@
+"""
+AI 分析的本地特征提取（紧凑提示词）。
+
+原提示词把最新 80 根日线以 markdown 表格发给模型，再让模型自己计算均线、MACD、RSI
+以及缠论包含处理和分型，既消耗数千输入 token，又拉长推理时间。这里在本地用向量化代码
+先算好这些指标，只给模型发送结构化摘要：
+- 最新值：收盘、涨跌幅、量比、MA5/10/20/60 及排列、MACD（DIF/DEA/柱）、RSI6/RSI14；
+- 近期事件：MACD 金叉/死叉、MA5 与 MA20 交叉、收盘突破/跌破 MA20；
+- 缠论结构（chan_engine）：包含处理后的 K 线数、过滤后的顶/底分型、当前笔、最近中枢 ZG/ZD；
+- 另附最新若干根原始 K 线（默认 10 根）供模型核对。
+config.AI_PROMPT_MODE = "compact" 使用本模块的提示词，"full" 保持原 80 行表格提示词。
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+import chan_engine
+
+EVENT_LOOKBACK = 20          # 交叉事件回看的 K 线数
+MAX_FRACTALS = 6             # 摘要中列出的最近分型数量
+
+
+# ----------------------------------------------------------------------
+# 指标
+# ----------------------------------------------------------------------
+def _rsi(close: pd.Series, period: int) -> pd.Series:
+    delta = close.diff()
+    gain = delta.clip(lower=0)
+    loss = -delta.clip(upper=0)
+    avg_gain = gain.ewm(com=period - 1, min_periods=period).mean()
+    avg_loss = loss.ewm(com=period - 1, min_periods=period).mean()
+    return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+def compute_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """返回与 df 等长的指标表：MA5/10/20/60、DIF/DEA/MACD 柱、RSI6/RSI14、量比。"""
+    close = df["CloseValue"].astype(float)
+    volume = df["Volume"].astype(float)
+    out = pd.DataFrame(index=df.index)
+    for window in (5, 10, 20, 60):
+        out[f"MA{window}"] = close.rolling(window, min_periods=window).mean()
+    ema12 = close.ewm(span=12, adjust=False).mean()
+    ema26 = close.ewm(span=26, adjust=False).mean()
+    out["DIF"] = ema12 - ema26
+    out["DEA"] = out["DIF"].ewm(span=9, adjust=False).mean()
+    out["MACD"] = 2 * (out["DIF"] - out["DEA"])
+    out["RSI6"] = _rsi(close, 6)
+    out["RSI14"] = _rsi(close, 14)
+    # 量比：当日成交量 / 前 5 日均量
+    out["VOL_RATIO"] = volume / volume.rolling(5, min_periods=1).mean().shift(1)
+    return out
+
+
+def _crosses(fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    """返回 +1（上穿）/-1（下穿）/0 的数组。"""
+    above = np.where(np.isnan(fast) | np.isnan(slow), 0, np.sign(fast - slow))
+    change = np.zeros(len(above), dtype=int)
+    change[1:] = np.where((above[1:] > 0) & (above[:-1] <= 0), 1,
+                          np.where((above[1:] < 0) & (above[:-1] >= 0), -1, 0))
+    return change
+
+
+def cross_events(df: pd.DataFrame, ind: pd.DataFrame, lookback: int = EVENT_LOOKBACK) -> List[str]:
+    """最近 lookback 根 K 线内的交叉事件，按时间倒序。"""
+    dates = _date_strings(df["DateTime"])
+    close = df["CloseValue"].to_numpy(float)
+    series = [
+        (_crosses(ind["DIF"].to_numpy(), ind["DEA"].to_numpy()), "MACD金叉", "MACD死叉"),
+        (_crosses(ind["MA5"].to_numpy(), ind["MA20"].to_numpy()), "MA5上穿MA20", "MA5下穿MA20"),
+        (_crosses(close, ind["MA20"].to_numpy()), "收盘站上MA20", "收盘跌破MA20"),
+    ]
+    start = max(0, len(df) - lookback)
+    events = []
+    for change, up_label, down_label in series:
+        for i in np.flatnonzero(change[start:]) + start:
+            events.append((i, f"{dates[i]} {up_label if change[i] > 0 else down_label}"))
+    events.sort(key=lambda item: item[0], reverse=True)
+    return [text for _, text in events]
+
+
+# ----------------------------------------------------------------------
+# 摘要与提示词
+# ----------------------------------------------------------------------
+def _date_strings(values) -> List[str]:
+    return [str(v)[:10] for v in pd.to_datetime(values)]
+
+
+def _fmt(value: float, digits: int = 3) -> str:
+    if value is None or not np.isfinite(value):
+        return "-"
+    return f"{value:.{digits}f}"
+
+
+def _ma_alignment(row: pd.Series) -> str:
+    values = [row.get(f"MA{w}") for w in (5, 10, 20, 60)]
+    if any(v is None or not np.isfinite(v) for v in values):
+        return "数据不足"
+    if values == sorted(values, reverse=True):
+        return "多头排列"
+    if values == sorted(values):
+        return "空头排列"
+    return "交织"
+
+
+def extract_features(df: pd.DataFrame) -> Dict[str, Any]:
+    """计算提示词所需的全部特征，返回可 JSON 序列化的字典。"""
+    df = df.reset_index(drop=True)
+    ind = compute_indicators(df)
+    last = ind.iloc[-1]
+    close = df["CloseValue"].to_numpy(float)
+    dates = _date_strings(df["DateTime"])
+
+    chan = chan_engine.analyze_frame(df)
+    fractals = chan.fractals()[-MAX_FRACTALS:]
+    for f in fractals:
+        f["date"] = dates[f["raw_index"]]
+
+    current = None
+    if chan.strokes:
+        s = chan.strokes[-1]
+        current = {
+            "direction": s["direction"],
+            "start": dates[s["start_index"]],
+            "end": dates[s["end_index"]],
+            "bars": s["end_index"] - s["start_index"],
+            "change_pct": (s["end_price"] / s["start_price"] - 1) * 100,
+            # 最后一个分型之后的走势（尚未确认的下一笔）
+            "since_end_pct": (close[-1] / s["end_price"] - 1) * 100,
+            "since_end_bars": len(df) - 1 - s["end_index"],
+        }
+    pivot = chan.latest_pivot
+
+    macd_hist = ind["MACD"].to_numpy()
+    recent = slice(max(0, len(df) - 20), len(df))
+    return {
+        "range": (dates[0], dates[-1]),
+        "bars": len(df),
+        "last": {
+            "date": dates[-1],
+            "close": float(close[-1]),
+            "change_pct": float((close[-1] / close[-2] - 1) * 100) if len(close) > 1 else 0.0,
+            "vol_ratio": float(last["VOL_RATIO"]),
+        },
+        "ma": {f"MA{w}": float(last[f"MA{w}"]) for w in (5, 10, 20, 60)},
+        "ma_alignment": _ma_alignment(last),
+        "close_vs_ma20_pct": float((close[-1] / last["MA20"] - 1) * 100) if np.isfinite(last["MA20"]) else None,
+        "macd": {
+            "DIF": float(last["DIF"]),
+            "DEA": float(last["DEA"]),
+            "hist": float(macd_hist[-1]),
+            "hist_prev": float(macd_hist[-2]) if len(macd_hist) > 1 else float("nan"),
+        },
+        "rsi": {"RSI6": float(last["RSI6"]), "RSI14": float(last["RSI14"])},
+        "change_5d_pct": float((close[-1] / close[-6] - 1) * 100) if len(close) > 5 else None,
+        "high_20": float(df["HighValue"].iloc[recent].max()),
+        "low_20": float(df["LowValue"].iloc[recent].min()),
+        "events": cross_events(df, ind),
+        "chan": {
+            "merged_bars": chan.merged_bars,
+            "fractals": fractals,
+            "strokes": len(chan.strokes),
+            "current_stroke": current,
+            "pivot": {"ZG": pivot["ZG"], "ZD": pivot["ZD"], "start": dates[pivot["start_index"]],
+                      "strokes": pivot["strokes"]} if pivot else None,
+        },
+    }
+
+
+def format_features(features: Dict[str, Any]) -> str:
+    """把 extract_features 的结果排成紧凑的中文要点。"""
+    last, ma, macd, rsi, chan = (features[k] for k in ("last", "ma", "macd", "rsi", "chan"))
+    hist, hist_prev = macd["hist"], macd["hist_prev"]
+    bar_color = "红柱" if hist >= 0 else "绿柱"
+    bar_trend = "放大" if abs(hist) > abs(hist_prev) else "缩小"
+    lines = [
+        f"数据: {features['range'][0]}~{features['range'][1]} 共{features['bars']}根日线",
+        f"最新: {last['date']} 收{_fmt(last['close'])} 涨跌{last['change_pct']:+.2f}% "
+        f"量比{_fmt(last['vol_ratio'], 2)} 5日涨跌{_fmt(features['change_5d_pct'], 2)}% "
+        f"20日高{_fmt(features['high_20'])} 低{_fmt(features['low_20'])}",
+        "均线: " + " ".join(f"{k} {_fmt(v)}" for k, v in ma.items())
+        + f" {features['ma_alignment']} 收盘距MA20 {_fmt(features['close_vs_ma20_pct'], 2)}%",
+        f"MACD: DIF {_fmt(macd['DIF'], 4)} DEA {_fmt(macd['DEA'], 4)} {bar_color}{bar_trend}"
+        f"({_fmt(hist, 4)}) {'零轴上方' if macd['DEA'] >= 0 else '零轴下方'}",
+        f"RSI: RSI6 {_fmt(rsi['RSI6'], 1)} RSI14 {_fmt(rsi['RSI14'], 1)}",
+        "近期事件: " + ("; ".join(features["events"]) if features["events"] else "无"),
+        f"缠论: 包含处理后{chan['merged_bars']}根 笔{chan['strokes']}条",
+        "分型(最近): " + ("; ".join(f"{f['date']}{f['type']}{_fmt(f['price'])}" for f in chan["fractals"]) or "无"),
+    ]
+    stroke = chan["current_stroke"]
+    if stroke:
+        lines.append(
+            f"当前笔: {stroke['direction']}笔 {stroke['start']}~{stroke['end']} {stroke['bars']}根 "
+            f"{stroke['change_pct']:+.2f}%；其后{stroke['since_end_bars']}根 {stroke['since_end_pct']:+.2f}%"
+        )
+    pivot = chan["pivot"]
+    lines.append(f"中枢: ZG {_fmt(pivot['ZG'])} ZD {_fmt(pivot['ZD'])}（{pivot['start']}起 {pivot['strokes']}笔）"
+                 if pivot else "中枢: 尚无三笔重叠")
+    return "\n".join(lines)
+
+
+def build_compact_prompt(df: pd.DataFrame, tail_rows: int) -> str:
+    """紧凑提示词：本地特征摘要 + 分析要求；原始 K 线由 analyze_data 追加最新 tail_rows 根。"""
+    features = format_features(extract_features(df))
+    return f"""你是专业严谨的ETF量化分析师。以下指标与缠论结构已在本地按规则计算完毕（包含处理：上涨高高、下跌低低，相对前收跳空≥3%保留；分型间隔≥5根且波动≥1.5%；中枢为连续三笔重叠区间，后续重叠的笔延伸该中枢），直接采用，不要重新计算。
+<特征摘要>
+{features}
+</特征摘要>
+另附最新{tail_rows}根原始日线供核对。
+请结合均线、MACD、RSI、量价与缠论结构判断趋势和买卖点，输出要求：语言精炼、结论明确。
+在<分析报告></分析报告>标签内按以下结构输出：
+<分析报告>
+##最新收盘时间XX，收盘价XX
+### 趋势结构
+- 当前笔方向：[上涨/下跌]笔（持续X天）
+- 中枢区间：ZG-X元 | ZD-X元
+- 买卖点信号：当前的买卖类型（一/二/三） @触发价
+### 关键位置
+支撑位：`X~X元`（基于中枢ZD±百分比）
+阻力位：`X~X元`（基于中枢ZG±百分比）
+### 操作建议
+| 场景 | 多头策略 | 空头策略 |
+|---|---|---|
+| 中枢上沿放量突破 | | |
+| 中枢下沿缩量跌破 | | |
+| RSI连续超买或超卖 | | |
+**持仓策略（目前100%仓位）**
+趋势状态：
+关键位置：支撑[] | 阻力[]
+建议操作：(买入/卖出/持仓/观望)
+仓位建议：X%
+操作建议：XX策略，[]加仓，止损XX@X%(相对最新收盘价)
+X日预期：看X概率X%，目标X（X%）
+风控提示：XXX
+</分析报告>"""
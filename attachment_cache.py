@@ -0,0 +1,203 @@
+"""
+邮件图片附件的优化版本（缩放 + 调色板量化 PNG / WebP），按源文件内容哈希缓存。
+
+{symbol}_expectSignal.png、{symbol}_Strategy_Performance_Dashboard.png 等 matplotlib 图表以
+原始分辨率的 RGBA PNG 保存，base64 编码后单封邮件可达数 MB，SMTP 发送很慢。这里为每张图生成
+逐级变小的版本（config.ATTACHMENT_RENDITIONS）：
+- 第 0 级保持原尺寸，只做调色板量化（图表颜色很少，观感基本无损，体积通常降到 1/3 以下）；
+- 之后各级依次缩小宽度、减少颜色数；ATTACHMENT_FORMAT=webp 时改存 WebP；
+- 版本文件放在 ATTACHMENT_CACHE_DIR/<源文件sha256>/r<级别>/<原文件名>，文件名不变，
+  邮件里显示的附件名与原来一致；源图不变时直接复用，超过 ATTACHMENT_CACHE_MAX_ENTRIES 个源文件
+  时按最近使用时间淘汰。
+
+fit_attachments(paths, budget_bytes) 为一封邮件挑选版本：图片先换成第 0 级，编码后总大小仍超出
+预算时，每次把当前最大的图片降一级，直到满足预算或都已是最小版本。非图片附件（CSV 等）保持原样。
+未安装 Pillow 时直接返回原路径。
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import ATTACHMENT_CACHE_DIR, ATTACHMENT_CACHE_MAX_ENTRIES, ATTACHMENT_FORMAT, ATTACHMENT_RENDITIONS
+
+RENDERABLE_SUFFIXES = (".png", ".jpg", ".jpeg")
+
+
+def encoded_size(size: int) -> int:
+    """附件 base64 编码后的字节数（每 76 字符换行 CRLF）。"""
+    encoded = (size + 2) // 3 * 4
+    return encoded + encoded // 76 * 2
+
+
+class AttachmentCache:
+    """按源文件哈希缓存图片附件的各级优化版本。"""
+
+    def __init__(self, cache_dir: Optional[Path] = None, renditions=ATTACHMENT_RENDITIONS,
+                 fmt: str = ATTACHMENT_FORMAT, max_entries: int = ATTACHMENT_CACHE_MAX_ENTRIES):
+        self.cache_dir = Path(cache_dir or ATTACHMENT_CACHE_DIR)
+        self.renditions = tuple(renditions)
+        self.fmt = "webp" if fmt == "webp" else "png"
+        self.max_entries = int(max_entries)
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+        self._pillow_missing = False
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def levels(self) -> int:
+        return len(self.renditions)
+
+    def _digest(self, path: Path) -> str:
+        st = path.stat()
+        memo_key = (str(path), st.st_mtime_ns, st.st_size)
+        digest = self._digests.get(memo_key)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+            digest = h.hexdigest()
+            with self._lock:
+                self._digests[memo_key] = digest
+        return digest
+
+    def _target(self, digest: str, level: int, source: Path) -> Path:
+        name = source.name if self.fmt == "png" else f"{source.stem}.webp"
+        return self.cache_dir / digest / f"r{level}" / name
+
+    def _render(self, source: Path, target: Path, level: int) -> bool:
+        try:
+            from PIL import Image
+        except ImportError:
+            if not self._pillow_missing:
+                self._pillow_missing = True
+                print("警告：Pillow 库未安装，邮件附件使用原图。请运行 'pip install Pillow' 进行安装。")
+            return False
+
+        width, colors = self.renditions[level]
+        with Image.open(source) as img:
+            img.load()
+            if img.mode in ("RGBA", "LA", "P"):
+                # matplotlib 图表背景为不透明白色，去掉 alpha 通道后再量化
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, "white")
+                img.paste(rgba, mask=rgba.getchannel("A"))
+            else:
+                img = img.convert("RGB")
+            if width and img.width > width:
+                img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            if self.fmt == "webp":
+                img.save(tmp, "WEBP", quality=80, method=4)
+            else:
+                img = img.quantize(colors=colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+                img.save(tmp, "PNG", optimize=True)
+        os.replace(tmp, target)
+        return True
+
+    def rendition(self, path: str, level: int) -> str:
+        """返回第 level 级版本的路径；非图片、源文件不存在或无法生成时返回原路径。"""
+        source = Path(path)
+        if source.suffix.lower() not in RENDERABLE_SUFFIXES or not source.exists():
+            return path
+        try:
+            digest = self._digest(source)
+            target = self._target(digest, level, source)
+            if target.exists():
+                with self._lock:
+                    self.stats["hits"] += 1
+                try:
+                    # 以目录 mtime 记录最近使用时间，淘汰时优先保留
+                    os.utime(target.parent.parent)
+                except OSError:
+                    pass
+                return str(target)
+            if not self._render(source, target, level):
+                return path
+        except (OSError, ValueError) as exc:
+            print(f"警告：生成附件优化版本失败 {path} -> {exc}")
+            return path
+        with self._lock:
+            self.stats["misses"] += 1
+        self.evict()
+        return str(target)
+
+    def fit(self, paths: List[str], budget_bytes: int) -> List[str]:
+        """为一封邮件挑选附件版本，使 base64 编码后的总大小不超过 budget_bytes（尽量）。"""
+        chosen = list(paths)
+        sizes: Dict[int, int] = {}
+        levels: Dict[int, int] = {}          # 可降级的图片附件当前所在级别，-1 表示原图
+
+        def step_down(i: int) -> None:
+            # 换成下一级版本；更小才替换（第 0 级偶尔比原图大）
+            levels[i] += 1
+            candidate = self.rendition(paths[i], levels[i])
+            if candidate == paths[i]:
+                # 无法生成（Pillow 缺失等），不再继续降级
+                del levels[i]
+                return
+            size = os.path.getsize(candidate)
+            if size < sizes[i]:
+                chosen[i], sizes[i] = candidate, size
+            if levels[i] >= self.levels - 1:
+                del levels[i]
+
+        for i, path in enumerate(paths):
+            if not os.path.exists(path):
+                continue
+            sizes[i] = os.path.getsize(path)
+            if Path(path).suffix.lower() in RENDERABLE_SUFFIXES:
+                levels[i] = -1
+                step_down(i)
+
+        total = sum(encoded_size(size) for size in sizes.values())
+        while total > budget_bytes:
+            if not levels:
+                print(f"警告：附件已是最小版本，仍超出预算 ({total / 1024:.0f}KB > {budget_bytes / 1024:.0f}KB)")
+                break
+            step_down(max(levels, key=lambda i: sizes[i]))
+            total = sum(encoded_size(size) for size in sizes.values())
+        return chosen
+
+    def evict(self) -> int:
+        """源文件个数超过上限时，按最近使用时间删除最旧的缓存目录。"""
+        try:
+            entries = sorted((d.stat().st_mtime, d) for d in self.cache_dir.iterdir() if d.is_dir())
+        except OSError:
+            return 0
+        count = 0
+        while len(entries) - count > self.max_entries:
+            shutil.rmtree(entries[count][1], ignore_errors=True)
+            count += 1
+        if count:
+            with self._lock:
+                self.stats["evictions"] += count
+        return count
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+
+_shared_cache: Optional[AttachmentCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_attachment_cache() -> AttachmentCache:
+    """返回进程内共享的附件缓存。"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = AttachmentCache()
+    return _shared_cache
+
+
+def fit_attachments(paths: List[str], budget_bytes: int) -> List[str]:
+    """按预算为附件挑选优化版本（见 AttachmentCache.fit）。"""
+    return get_attachment_cache().fit(paths, budget_bytes)
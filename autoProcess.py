@@ -4,6 +4,7 @@ from datetime import datetime, timezone, timedelta
 import pandas as pd
 import numpy as np
 import json
+import threading
 import time
 
 # 将项目根目录添加到 Python 模块搜索路径中
@@ -13,10 +14,14 @@ sys.path.append(project_root)
 print('code path is ',project_root)
 
 from main import ETFTest
+from config import SIGNAL_CACHE_DIR
+from data_manager import ETFStorage
+from trade_calendar import get_trade_calendar
 from sdd import strategyFunc, load_etf_data
-from mailFun import EmailSender
+from chart_render import get_render_queue
+from mailFun import MailDispatcher
+from mail_outbox import get_mail_outbox, notification_key
 from mailFun import config as email_config
-from deepSeekAi import aiDeepSeekAnly, extract_position_strategy
 
 def get_beijing_time():
     """返回当前的北京时间 (UTC+8)"""
@@ -117,20 +122,11 @@ def build_signal_reason(etf_data, params):
 
     return f"信号来源说明：{', '.join(parts + triggers)}"
 
-def run_trading_strategy(stock_code, send_email: bool = True):
+def fetch_latest_data(stock_code, send_email: bool = True, max_retries: int = 3, delay_seconds: int = 15):
     """
-    执行完整的交易策略流程：获取数据、分析信号、发送邮件。
+    获取最新的ETF数据（失败重试）。成功返回 None，失败返回错误说明（send_email 时同时发送错误邮件）。
     """
-    print("="*50)
-    print(f"开始执行 {stock_code} 交易策略自动化流程...")
-    print(f"执行时间: {get_beijing_time().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("="*50)
-
-    # 1. 获取最新的ETF数据，增加鲁棒性（返回值检查 + 重试）
     try:
-        print("\n[步骤 1/3] 正在获取最新ETF数据...")
-        max_retries = 3
-        delay_seconds = 15
         success = False
 
         for attempt in range(1, max_retries + 1):
@@ -148,48 +144,97 @@ def run_trading_strategy(stock_code, send_email: bool = True):
             print(msg)
             if send_email:
                 notify_error(f"ETF数据获取失败 for {stock_code}", msg)
-            return {
-                "code": stock_code,
-                "status": "error",
-                "error": msg
-            }
+            return msg
 
     except Exception as e:
         print(f"错误：获取ETF数据失败（异常）。错误信息: {e}")
         # 如果数据获取失败，可以选择发送错误邮件或直接退出
         if send_email:
             notify_error(f"ETF数据获取失败 for {stock_code}", f"错误详情: {e}")
-        return {
-            "code": stock_code,
-            "status": "error",
-            "error": f"获取ETF数据异常: {e}"
-        }
+        return f"获取ETF数据异常: {e}"
+    return None
 
-    # 2. 实现类似 testOnlyNew 的功能，分析交易信号
-    print("\n[步骤 2/3] 正在分析交易信号...")
-    _, signal_text, signal_reason = get_trading_signal(stock_code)
-    print(f"分析完成。{stock_code} 的今日信号: {signal_text}")
 
-    #3 新增股票分析功能 调用 aiDeepSeekAnly("588180") 
+def run_ai_analysis(stock_code):
+    """
+    调用 AI 分析指定标的的日线数据，返回 (AI 分析全文, 提取出的仓位策略)。
+    """
+    # deepSeekAi 依赖 httpx/pydantic 等，只在需要 AI 分析时导入
+    from deepSeekAi import aiDeepSeekAnly, extract_position_strategy
+
     symbol = f"{stock_code.split('.')[0]}"
     print(f"----AI开始获取{symbol}数据，并智能分析---------） ")
-    aiResultInfo = aiDeepSeekAnly(symbol)
-    
-    # 根据AI分析结果拼接signal_text
+    report, strategy = aiDeepSeekAnly(symbol, with_strategy=True)
+    return _ai_result(report, strategy, extract_position_strategy)
+
+
+def submit_ai_analysis(stock_code, runner):
+    """
+    run_ai_analysis 的异步提交版本：在 deepSeekAi.AsyncAnalysisRunner 上发起请求，
+    立即返回 Future，结果同为 (AI 分析全文, 提取出的仓位策略)。
+    """
+    from deepSeekAi import aiDeepSeekAnlyAsync, extract_position_strategy
+
+    symbol = f"{stock_code.split('.')[0]}"
+    print(f"----AI开始获取{symbol}数据，并智能分析（异步）---------） ")
+
+    async def analyze(analyzer):
+        report, strategy = await aiDeepSeekAnlyAsync(symbol, analyzer, with_strategy=True)
+        return _ai_result(report, strategy, extract_position_strategy)
+
+    return runner.submit(analyze)
+
+
+def _ai_result(aiResultInfo, strategy, extract_position_strategy):
+    # 根据AI分析结果拼接signal_text；strategy 为流式读取中 <策略输出> 段结束时已提取的仓位策略
     aiDataInfo = ""
-    strategyinfo = ""
+    strategyinfo = strategy or ""
     if aiResultInfo and aiResultInfo.strip():
         aiDataInfo = aiResultInfo
         print(f"AI分析结果长度: {len(aiDataInfo)}")
-        strategyinfo = extract_position_strategy(aiDataInfo)
+        if not strategyinfo:
+            strategyinfo = extract_position_strategy(aiDataInfo)
     else:
         aiDataInfo =  "aiResultInfo not ok"
         print("AI分析结果为空，已添加默认提示信息")
+    return aiDataInfo, strategyinfo
+
+
+def run_trading_strategy(stock_code, send_email: bool = True):
+    """
+    执行完整的交易策略流程：获取数据、分析信号、发送邮件。
+    """
+    started_at = time.time()
+    print("="*50)
+    print(f"开始执行 {stock_code} 交易策略自动化流程...")
+    print(f"执行时间: {get_beijing_time().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("="*50)
+
+    # 1. 获取最新的ETF数据，增加鲁棒性（返回值检查 + 重试）
+    print("\n[步骤 1/3] 正在获取最新ETF数据...")
+    error = fetch_latest_data(stock_code, send_email=send_email)
+    if error:
+        return {
+            "code": stock_code,
+            "status": "error",
+            "error": error
+        }
+
+    # 2. 实现类似 testOnlyNew 的功能，分析交易信号
+    print("\n[步骤 2/3] 正在分析交易信号...")
+    # 图表交给后台进程渲染，与 AI 分析并行，发送邮件前再等待
+    render_queue = get_render_queue()
+    _, signal_text, signal_reason = get_trading_signal(stock_code, render_queue=render_queue)
+    print(f"分析完成。{stock_code} 的今日信号: {signal_text}")
+
+    #3 新增股票分析功能 调用 aiDeepSeekAnly("588180") 
+    aiDataInfo, strategyinfo = run_ai_analysis(stock_code)
 
     # 4. 根据交易信号发送邮件
     if send_email:
         print("\n[步骤 3/3] 正在准备发送邮件通知...")
-        notify_by_email(stock_code, signal_text, signal_reason, aiDataInfo, strategyinfo)
+        notify_by_email(stock_code, signal_text, signal_reason, aiDataInfo, strategyinfo,
+                        render_queue=render_queue, charts_since=started_at)
     else:
         print("\n[步骤 3/3] 已配置为不发送邮件，跳过邮件通知。")
 
@@ -205,10 +250,48 @@ def run_trading_strategy(stock_code, send_email: bool = True):
         "ai_analysis": aiDataInfo
     }
 
-def get_trading_signal(stock_code):
+SIGNAL_NAMES = {1: "买入", -1: "卖出"}
+
+
+def _signal_cache_key(params):
+    return json.dumps({k: float(v) for k, v in params.items()}, sort_keys=True)
+
+
+def load_cached_signal(symbol, data_last, params):
+    """
+    读取该标的上次完整回测记录的最后一个信号；数据末日或策略参数已变化时返回 None。
+    返回 {"date", "signal", "reason"}。
+    """
+    path = os.path.join(SIGNAL_CACHE_DIR, f"{symbol}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get("data_last") != data_last or entry.get("params") != _signal_cache_key(params):
+        return None
+    return entry
+
+
+def save_cached_signal(symbol, data_last, params, signal_date, signal_val, reason_text):
+    """记录完整回测得到的最后一个信号（写临时文件后替换，进程/线程并发时不会读到半个文件）。"""
+    try:
+        os.makedirs(SIGNAL_CACHE_DIR, exist_ok=True)
+        path = os.path.join(SIGNAL_CACHE_DIR, f"{symbol}.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"data_last": data_last, "params": _signal_cache_key(params), "date": signal_date,
+                       "signal": int(signal_val), "reason": reason_text}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"警告：保存 {symbol} 的信号缓存失败: {e}")
+
+
+def get_trading_signal(stock_code, render_queue=None):
     """
     调用策略函数，获取最新的交易信号。
     返回信号类型、信号文本、信号来源说明。
+    render_queue: chart_render.RenderQueue，提供时图表在后台渲染，信号计算不等待绘图。
     """
     symbol = stock_code.split('.')[0]
     filepath = os.path.join(project_root, 'stock_data',  f'{symbol}', f'{symbol}_Day.csv')
@@ -216,7 +299,7 @@ def get_trading_signal(stock_code):
     if not os.path.exists(filepath):
         print(f"错误：数据文件不存在 -> {filepath}")
         return "error", "数据文件丢失", "信号来源说明：数据文件丢失"
-
+
     # 从JSON文件加载策略参数
     params_path = os.path.join(project_root, 'strategy_params.json')
     try:
@@ -257,6 +340,25 @@ def get_trading_signal(stock_code):
             'divergence_threshold': np.float64(0.05)
         }
     
+    # 用交易日历判断今天能否产生新信号：休市或本地数据未更新到今天时结果与上次相同，
+    # 直接复用上次完整回测记录的最后一个信号与说明，不再加载数据和回测
+    calendar = get_trade_calendar()
+    today = get_beijing_time().date()
+    data_last = (ETFStorage.last_datetime(filepath) or "")[:10]
+    skip_note = None
+    if not calendar.is_trading_day(today):
+        skip_note = "今日休市"
+    elif data_last and data_last < today.isoformat():
+        skip_note = f"数据截至 {data_last}"
+    if skip_note is not None:
+        cached = load_cached_signal(symbol, data_last, params)
+        if cached is not None:
+            last_signal_str = SIGNAL_NAMES.get(cached["signal"], "无信号")
+            print(f"{skip_note}：跳过回测，沿用 {cached['date']} 的最后一个信号: {last_signal_str}")
+            return "no_data", f"无信号 ({skip_note}，最后一个信号: {last_signal_str})", cached["reason"]
+        print(f"{skip_note}：没有可复用的信号记录，执行一次回测（不生成图表）。")
+    charts = skip_note is None
+
     # 策略执行起始时间
     statTime='2024-01-01'
     try:
@@ -281,9 +383,10 @@ def get_trading_signal(stock_code):
             # 设置时间范围，确保包含今天
             statTime = statTime, 
             endTime=get_beijing_time().strftime('%Y-%m-%d'),
-            plot_results=1,  # 需要设置为True以生成图片
+            plot_results=1 if charts else 0,  # 需要设置为True以生成图片
             verbose=False,
-            enable_file_io=True
+            enable_file_io=charts,
+            render_queue=render_queue if charts else None
         )
 
         portfolio_df = performance_stats.get('portfolio_df')
@@ -291,6 +394,8 @@ def get_trading_signal(stock_code):
         reason_text = build_signal_reason(etf_data, params)
 
         if portfolio_df is not None and not portfolio_df.empty:
+            save_cached_signal(symbol, data_last, params, portfolio_df.index[-1].strftime('%Y-%m-%d'),
+                               portfolio_df.iloc[-1]['signal'], reason_text)
             today = pd.to_datetime(get_beijing_time().date())
             # 检查回测结果中是否有今天的信号
             if today in portfolio_df.index:
@@ -305,11 +410,11 @@ def get_trading_signal(stock_code):
                  # 获取最后一个交易日的信号作为参考
                 last_signal_date = portfolio_df.index[-1]
                 last_signal_val = portfolio_df.iloc[-1]['signal']
-                signal_map = {1: "买入", -1: "卖出"}
-                last_signal_str = signal_map.get(last_signal_val, "无信号")
+                last_signal_str = SIGNAL_NAMES.get(last_signal_val, "无信号")
                 print(f"警告：策略结果中不包含今天({today.strftime('%Y-%m-%d')})的数据。")
                 print(f"最后一个有信号的日期是 {last_signal_date.strftime('%Y-%m-%d')}，信号为: {last_signal_str}")
-                return "no_data", f"无信号 (最后一个信号: {last_signal_str})", reason_text
+                note = f"{skip_note}，" if skip_note else ""
+                return "no_data", f"无信号 ({note}最后一个信号: {last_signal_str})", reason_text
         else:
             return "hold", "无信号", reason_text
 
@@ -319,10 +424,77 @@ def get_trading_signal(stock_code):
         print(traceback.format_exc())
         return "error", "策略执行出错", "信号来源说明：计算失败"
 
-def notify_by_email(stock_code, signal_text, signal_reason=None, aiDataInfo = None, strategyinfo = None):
+# 单标的邮件的附件；汇总邮件每个标的只附两张图，避免附件过多
+SIGNAL_ATTACHMENTS = ('{symbol}_expectSignal.png',
+                      '{symbol}_Strategy_Performance_Dashboard.png',
+                      '{symbol}_temp_strategy.csv',
+                      '{symbol}_divergence_ratio.csv',
+                      '{symbol}_BuyAndSell.csv')
+DIGEST_ATTACHMENTS = SIGNAL_ATTACHMENTS[:2]
+
+
+def collect_attachments(stock_code, names=SIGNAL_ATTACHMENTS, render_queue=None, since=None):
+    """
+    返回 pic 目录中已存在的附件路径；render_queue 提供时先等待该标的的图表写完。
+    since: 本次运行开始的时间戳，早于它的文件是之前运行遗留的（休市/数据未更新时不重新绘图），不作为附件。
+    """
+    symbol = stock_code.split('.')[0]
+    if render_queue is not None:
+        render_queue.wait(symbol)
+    image_folder = os.path.join(project_root, 'pic')
+    paths = []
+    for name in names:
+        path = os.path.join(image_folder, name.format(symbol=symbol))
+        if not os.path.exists(path):
+            print(f"警告：邮件附件图片不存在 -> {path}")
+        elif since is not None and os.path.getmtime(path) < since:
+            print(f"提示：{path} 不是本次运行生成的，不作为附件")
+        else:
+            paths.append(path)
+    return paths
+
+
+def _open_dispatcher():
+    try:
+        return MailDispatcher(provider_name=email_config.ACTIVE_SMTP_PROVIDER)
+    except Exception as e:
+        print(f"错误：初始化邮件发送器失败: {e}")
+        return None
+
+
+def _dispatch(dispatcher, subject, body, image_paths=None, cc=True, dedupe_key=None):
     """
-    根据信号发送邮件，增加5次重试逻辑。
+    用给定的 MailDispatcher / MailOutbox 发送。未提供时：启用发件箱（MAIL_OUTBOX）则写入共享发件箱
+    由后台投递，否则临时建立一个 MailDispatcher（发送后关闭连接）。
     """
+    owned = False
+    if dispatcher is None:
+        if email_config.MAIL_OUTBOX:
+            dispatcher = get_mail_outbox()
+        else:
+            owned = True
+            dispatcher = _open_dispatcher()
+            if dispatcher is None:
+                return False
+    try:
+        return dispatcher.send(
+            recipient_emails=email_config.DEFAULT_RECIPIENTS["to"],
+            cc_emails=email_config.DEFAULT_RECIPIENTS["cc"] if cc else None,
+            subject=subject,
+            body_text=body,
+            image_paths=image_paths,
+            dedupe_key=dedupe_key,
+            size_budget_bytes=email_config.MAIL_ATTACHMENT_BUDGET_BYTES or None,
+        )
+    finally:
+        if owned:
+            dispatcher.close()
+
+
+def build_signal_mail(stock_code, signal_text, signal_reason=None, aiDataInfo=None, strategyinfo=None,
+                      has_charts=True):
+    """单个标的的信号邮件主题与正文；has_charts 为假时正文注明本次未生成图表。"""
+    charts_line = "请查看附件图片获取详细图表。" if has_charts else "本次运行未生成新的图表，邮件不含图表附件。"
     subject = f"交易信号提醒: {stock_code} - {signal_text}"
     body = f"""
             你好，
@@ -340,87 +512,110 @@ def notify_by_email(stock_code, signal_text, signal_reason=None, aiDataInfo = No
             详细AI趋势分析：\n
             {aiDataInfo}
 
-            请查看附件图片获取详细图表。
+            {charts_line}
 
             祝好，
             交易机器人
             """
-    
-    image_paths = []
-    # 无条件附上图片
-    symbol = stock_code.split('.')[0]
-    image_folder = os.path.join(project_root, 'pic')
-    print(f"图片文件夹路径为: {image_folder}")
-    required_images = [f'{symbol}_expectSignal.png', 
-                       f'{symbol}_Strategy_Performance_Dashboard.png',
-                       f'{symbol}_temp_strategy.csv', 
-                       f'{symbol}_divergence_ratio.csv', 
-                       f'{symbol}_BuyAndSell.csv']
-    
-    for img_name in required_images:
-        path = os.path.join(image_folder, img_name)
-        if os.path.exists(path):
-            image_paths.append(path)
-        else:
-            print(f"警告：邮件附件图片不存在 -> {path}")
-
-    max_retries = 3
-    delay_seconds = 10
-
-    for attempt in range(max_retries):
-        try:
-            sender = EmailSender(provider_name=email_config.ACTIVE_SMTP_PROVIDER)
-            time.sleep(2)
-            success = sender.send(
-                recipient_emails=email_config.DEFAULT_RECIPIENTS["to"],
-                cc_emails=email_config.DEFAULT_RECIPIENTS["cc"],
-                subject=subject,
-                body_text=body,
-                image_paths=image_paths
-            )
-            if success:
-                print("邮件通知已成功发送。")
-                return
-            else:
-                print(f"邮件发送返回失败状态 (尝试 {attempt + 1}/{max_retries})")
-        except Exception as e:
-            print(f"错误：初始化或发送邮件时发生严重错误 (尝试 {attempt + 1}/{max_retries}): {e}")
-
-        if attempt < max_retries - 1:
-            print(f"将在 {delay_seconds} 秒后重试...")
-            time.sleep(delay_seconds)
-    
-    print("错误：邮件发送失败，已达到最大重试次数。请检查 emailFile/mailFun.py 的输出日志。")
+    return subject, body
+
 
-def notify_error(subject, body):
+def build_digest_mail(entries, without_charts=()):
+    """
+    多个标的合并为一封汇总邮件。
+    entries: [{"code", "status", "signal", "signal_reason", "ai_strategy", "ai_analysis", "error"}]
+    （与 run.py auto 模式的摘要条目相同）；without_charts: 本次未生成图表的标的代码。
+    """
+    ok = [e for e in entries if e.get("status") == "ok"]
+    counts = {}
+    for e in ok:
+        counts[e.get("signal")] = counts.get(e.get("signal"), 0) + 1
+    summary = "，".join(f"{signal} {n}" for signal, n in counts.items()) or "无有效信号"
+    subject = f"交易信号汇总: {len(entries)}个标的 - {summary}"
+
+    lines = [
+        "你好，",
+        "",
+        "这是来自您的自动化策略信号识别系统机器人的汇总通知。",
+        f"时间: {get_beijing_time().strftime('%Y-%m-%d %H:%M:%S')}",
+        "",
+        "信号一览：",
+    ]
+    for e in entries:
+        if e.get("status") == "ok":
+            lines.append(f"  {e['code']}: {e.get('signal')}")
+        else:
+            lines.append(f"  {e['code']}: 失败 ({e.get('error')})")
+    for e in ok:
+        lines += [
+            "",
+            "=" * 40,
+            f"标的: {e['code']}    交易信号: {e.get('signal')}",
+            e.get("signal_reason") or "信号来源说明：暂无",
+            *(["（本次运行未生成新的图表）"] if e["code"] in without_charts else []),
+            "",
+            "AI趋势策略：",
+            str(e.get("ai_strategy") or ""),
+            "",
+            "详细AI趋势分析：",
+            str(e.get("ai_analysis") or ""),
+        ]
+    lines += ["", "请查看附件图片获取各标的的详细图表。", "", "祝好，", "交易机器人"]
+    return subject, "\n".join(lines)
+
+
+def notify_by_email(stock_code, signal_text, signal_reason=None, aiDataInfo = None, strategyinfo = None,
+                    render_queue=None, dispatcher=None, charts_since=None):
     """
-    当发生严重错误时，发送不带附件的纯文本邮件，增加5次重试逻辑。
+    根据信号发送邮件（失败重试由 MailDispatcher / 发件箱负责）。
+    render_queue: 图表在后台渲染时传入，附加图片前等待该标的的图表写完。
+    charts_since: 本次运行开始的时间戳，只附加此后生成的图表与 CSV。
+    dispatcher: mailFun.MailDispatcher 或 mail_outbox.MailOutbox，一次运行内多封邮件共用；
+                不传时按 MAIL_OUTBOX 写入共享发件箱或单独连接发送。
+    """
+    image_paths = collect_attachments(stock_code, render_queue=render_queue, since=charts_since)
+    subject, body = build_signal_mail(stock_code, signal_text, signal_reason, aiDataInfo, strategyinfo,
+                                      has_charts=bool(image_paths))
+    # 正文含发送时间，去重键只取信号内容：同一信号在去重窗口内重跑不重复发信
+    key = notification_key("signal", stock_code, signal_text, signal_reason, strategyinfo, aiDataInfo)
+    if _dispatch(dispatcher, subject, body, image_paths, dedupe_key=key):
+        print("邮件通知已提交。")
+        return True
+    print("错误：邮件发送失败，已达到最大重试次数。请检查 mailFun.py 的输出日志。")
+    return False
+
+
+def notify_digest(entries, render_queue=None, dispatcher=None, charts_since=None):
+    """把多个标的的信号、AI 策略和图表合并为一封邮件发送（charts_since 同 notify_by_email）。"""
+    image_paths = []
+    without_charts = set()
+    for e in entries:
+        if e.get("status") == "ok":
+            paths = collect_attachments(e["code"], DIGEST_ATTACHMENTS, render_queue=render_queue, since=charts_since)
+            if not paths:
+                without_charts.add(e["code"])
+            image_paths += paths
+    subject, body = build_digest_mail(entries, without_charts)
+    key = notification_key("digest", entries)
+    if _dispatch(dispatcher, subject, body, image_paths, dedupe_key=key):
+        print(f"汇总邮件已提交（{len(entries)} 个标的，{len(image_paths)} 个附件）。")
+        return True
+    print("错误：汇总邮件发送失败，已达到最大重试次数。请检查 mailFun.py 的输出日志。")
+    return False
+
+
+def notify_error(subject, body, dispatcher=None):
+    """
+    当发生严重错误时，发送不带附件的纯文本邮件。
+    重试与其他邮件一致：启用发件箱时由后台按指数退避投递，最多 MAIL_OUTBOX_MAX_ATTEMPTS 次；
+    直接发送时由 MailDispatcher 重试 MAIL_MAX_RETRIES 次。
     """
     print(f"正在发送错误报告邮件: {subject}")
-    max_retries = 5
-    delay_seconds = 10
-
-    for attempt in range(max_retries):
-        try:
-            sender = EmailSender(provider_name=email_config.ACTIVE_SMTP_PROVIDER)
-            success = sender.send(
-                recipient_emails=email_config.DEFAULT_RECIPIENTS["to"],
-                subject=f"[策略机器人错误] {subject}",
-                body_text=f"错误报告:\n\n{body}"
-            )
-            if success:
-                print("错误报告邮件已发送。")
-                return
-            else:
-                print(f"错误报告邮件发送返回失败状态 (尝试 {attempt + 1}/{max_retries})")
-        except Exception as e:
-            print(f"错误：发送错误报告邮件失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-
-        if attempt < max_retries - 1:
-            print(f"将在 {delay_seconds} 秒后重试...")
-            time.sleep(delay_seconds)
-    
-    print("错误：发送错误报告邮件失败，已达到最大重试次数。")
+    if _dispatch(dispatcher, f"[策略机器人错误] {subject}", f"错误报告:\n\n{body}", cc=False):
+        print("错误报告邮件已提交。")
+        return True
+    print("错误：发送错误报告邮件失败。")
+    return False
 
 def autoProcessETF(target_stock_code):
     # 要监控的ETF代码
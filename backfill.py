@@ -0,0 +1,306 @@
+"""
+历史数据并行回补。
+
+把 [start, end] 拆成适合数据源的分块并发抓取（受全局速率限制），
+拼接去重后一次性写入存储；中断后再次运行会根据分块清单跳过已完成的分块。
+
+- 日线: 东方财富 fund_etf_hist_em 按年分块（新浪接口只能取最近 1000 根，不能按区间翻页，
+        仅在东方财富失败时作为该分块的备用）；
+- 分钟线: 东方财富 fund_etf_hist_min_em 按周期取较小窗口（见 config.BACKFILL_CHUNK_DAYS）。
+- 分钟线相邻分块重叠 BACKFILL_OVERLAP_DAYS 天，接缝处按 DateTime 去重（日线按自然年对齐，不重叠）。
+
+断点数据（目录不含结束日期；未指定 --end 时续传沿用清单中首次运行解析出的结束日期）:
+    stock_data/_cache/backfill/{code}_{period}_{start}/manifest.json
+    stock_data/_cache/backfill/{code}_{period}_{start}/chunk_XXX.pkl
+
+用法:
+    python run.py backfill --codes 159843 --start 2015-01-01 --period Day
+    python run.py backfill --codes 159843 --start 2024-01-01 --period 5 --jobs 4
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from config import (
+    ETFConfig, START_TIME, BACKFILL_DIR, BACKFILL_MAX_WORKERS, BACKFILL_RPS,
+    BACKFILL_CHUNK_DAYS, BACKFILL_OVERLAP_DAYS,
+)
+from data_fetcher import ETFFetcher, _sina_etf_daily_hist
+from data_manager import ETFStorage, ETFMinuteStore, merge_by_datetime
+
+CHUNK_MAX_ATTEMPTS = 3
+
+
+class RateLimiter:
+    """线程安全的令牌桶：acquire() 在超过速率时阻塞等待。rate<=0 表示不限速。"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """取一个令牌，返回实际等待的秒数。"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+# ============================================================
+# 分块规划
+# ============================================================
+def plan_chunks(start: str, end: str, period: str) -> List[Dict[str, Any]]:
+    """把 [start, end] 按周期拆分为重叠的分块（按时间先后编号）。"""
+    period = str(period)
+    if period not in BACKFILL_CHUNK_DAYS:
+        raise ValueError(f"不支持的回补周期: {period}")
+    span = timedelta(days=BACKFILL_CHUNK_DAYS[period])
+    overlap = timedelta(days=BACKFILL_OVERLAP_DAYS)
+    begin = pd.Timestamp(start).normalize()
+    finish = pd.Timestamp(end).normalize()
+    if finish < begin:
+        raise ValueError(f"回补区间无效: {start} > {end}")
+
+    chunks = []
+    cursor = begin
+    while cursor <= finish:
+        if period == "Day":
+            # 日线按自然年对齐
+            chunk_end = min(pd.Timestamp(year=cursor.year, month=12, day=31), finish)
+        else:
+            chunk_end = min(cursor + span - timedelta(days=1), finish)
+        chunks.append({
+            "id": len(chunks),
+            "start": cursor.strftime("%Y-%m-%d"),
+            "end": chunk_end.strftime("%Y-%m-%d"),
+            "status": "pending",
+            "rows": 0,
+            "attempts": 0,
+            "error": "",
+        })
+        if chunk_end >= finish:
+            break
+        cursor = chunk_end + timedelta(days=1) - (overlap if period != "Day" else timedelta(0))
+    return chunks
+
+
+# ============================================================
+# 单个分块抓取
+# ============================================================
+def _fetch_daily_chunk(fetcher: ETFFetcher, code: str, start: str, end: str) -> pd.DataFrame:
+    start_date, end_date = start.replace("-", ""), end.replace("-", "")
+    try:
+        df = fetcher._fetch_etf_daily_raw(symbol=code, period="daily",
+                                          start_date=start_date, end_date=end_date, adjust="")
+        if df is not None and not df.empty:
+            return fetcher._process_raw_dataDaily(df)
+        return pd.DataFrame()
+    except Exception as e:
+        print(f"[回补] {code} {start}~{end} 东方财富失败，尝试新浪备用: {e}")
+    # 新浪只覆盖最近 1000 个交易日；更早的分块返回空时仍视为失败，留待下次续传
+    df = _sina_etf_daily_hist(code, start_date, end_date)
+    if df is None or df.empty:
+        raise RuntimeError("东方财富与新浪接口均未返回数据")
+    return fetcher._process_raw_dataDaily(df)
+
+
+def _fetch_minute_chunk(fetcher: ETFFetcher, code: str, period: str, start: str, end: str) -> pd.DataFrame:
+    df = fetcher._fetch_etf_min_raw(symbol=code, period=period, adjust="",
+                                    start_date=f"{start} 09:30:00", end_date=f"{end} 15:00:00")
+    if df is None or df.empty:
+        return pd.DataFrame()
+    return fetcher._etf_min_format_data(df)
+
+
+# ============================================================
+# 回补任务
+# ============================================================
+class BackfillJob:
+    """单个代码、单个周期的回补任务（支持断点续传）。"""
+
+    def __init__(self, code: str, start: str, end: Optional[str] = None, period: str = "Day",
+                 max_workers: Optional[int] = None, limiter: Optional[RateLimiter] = None,
+                 work_dir: Optional[Path] = None, data_dir: Optional[Path] = None):
+        self.code = str(code).split(".")[0]
+        self.period = str(period)
+        self.start = pd.Timestamp(start).strftime("%Y-%m-%d")
+        # None 表示未指定：续传时沿用清单中的结束日期，新任务取今天
+        self.end = pd.Timestamp(end).strftime("%Y-%m-%d") if end else None
+        self.max_workers = max(1, int(max_workers or BACKFILL_MAX_WORKERS))
+        self.limiter = limiter or RateLimiter(BACKFILL_RPS)
+        self.data_dir = Path(data_dir or ETFConfig.dataPath)
+        name = f"{self.code}_{self.period}_{self.start}"
+        self.work_dir = Path(work_dir or BACKFILL_DIR) / name
+        self._lock = threading.Lock()
+        self.config = ETFConfig(stock_code=self.code, periods=[self.period], start_date=self.start)
+        self.config.data_dir = self.data_dir
+        self.fetcher = ETFFetcher(self.config)
+
+    # ---------------- 清单 ----------------
+    @property
+    def manifest_path(self) -> Path:
+        return self.work_dir / "manifest.json"
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if self.manifest_path.exists():
+            try:
+                manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+                if self.end is None or manifest["end"] == self.end:
+                    self.end = manifest["end"]
+                    done = sum(1 for c in manifest["chunks"] if c["status"] in ("done", "empty"))
+                    print(f"[回补] {self.code} {self.period} 续传：{done}/{len(manifest['chunks'])} 个分块已完成")
+                    return manifest
+                print(f"[回补] {self.code} {self.period} 结束日期由 {manifest['end']} 改为 {self.end}，重新规划分块")
+                shutil.rmtree(self.work_dir, ignore_errors=True)
+            except Exception:
+                pass
+        if self.end is None:
+            self.end = datetime.now().strftime("%Y-%m-%d")
+        return {
+            "code": self.code, "period": self.period, "start": self.start, "end": self.end,
+            "chunks": plan_chunks(self.start, self.end, self.period),
+            "written": False,
+        }
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        with self._lock:
+            self._write_manifest(manifest)
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp_path, self.manifest_path)
+
+    def _mark(self, chunk: Dict[str, Any], manifest: Dict[str, Any], **fields) -> None:
+        """更新分块状态并落盘（多个工作线程共享同一清单）。"""
+        with self._lock:
+            chunk.update(fields)
+            self._write_manifest(manifest)
+
+    def _chunk_path(self, chunk: Dict[str, Any]) -> Path:
+        return self.work_dir / f"chunk_{chunk['id']:03d}.pkl"
+
+    # ---------------- 抓取 ----------------
+    def _fetch_chunk(self, chunk: Dict[str, Any]) -> pd.DataFrame:
+        if self.period == "Day":
+            return _fetch_daily_chunk(self.fetcher, self.code, chunk["start"], chunk["end"])
+        return _fetch_minute_chunk(self.fetcher, self.code, self.period, chunk["start"], chunk["end"])
+
+    def _run_chunk(self, chunk: Dict[str, Any], manifest: Dict[str, Any]) -> Dict[str, Any]:
+        last_error = ""
+        for attempt in range(1, CHUNK_MAX_ATTEMPTS + 1):
+            self.limiter.acquire()
+            try:
+                df = self._fetch_chunk(chunk)
+                if df.empty:
+                    self._mark(chunk, manifest, status="empty", rows=0, attempts=chunk["attempts"] + 1, error="")
+                else:
+                    df.to_pickle(self._chunk_path(chunk))
+                    self._mark(chunk, manifest, status="done", rows=int(len(df)),
+                               attempts=chunk["attempts"] + 1, error="")
+                return chunk
+            except Exception as e:
+                last_error = str(e)
+                self._mark(chunk, manifest, attempts=chunk["attempts"] + 1, error=last_error)
+                if attempt < CHUNK_MAX_ATTEMPTS:
+                    time.sleep(2 * attempt)
+        self._mark(chunk, manifest, status="failed")
+        print(f"[回补] {self.code} 分块 {chunk['start']}~{chunk['end']} 失败: {last_error}")
+        return chunk
+
+    def _stitch(self, manifest: Dict[str, Any]) -> pd.DataFrame:
+        frames = [pd.read_pickle(self._chunk_path(c)) for c in manifest["chunks"] if c["status"] == "done"]
+        if not frames:
+            return pd.DataFrame()
+        stitched = pd.concat(frames, ignore_index=True)
+        return merge_by_datetime(stitched.iloc[:0], stitched).reset_index(drop=True)
+
+    def _write(self, df: pd.DataFrame) -> str:
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        if self.period == "Day":
+            storage = ETFStorage(self.config)
+            filepath = storage._get_filepath("Day")
+            storage.saveDataToFile(df, filepath)
+            return str(filepath)
+        store = ETFMinuteStore(self.data_dir)
+        store.append(df, self.code, self.period)
+        return str(store._partition_dir(self.code, self.period))
+
+    def run(self, keep_chunks: bool = False) -> Dict[str, Any]:
+        """执行回补；全部分块成功时拼接写入并清理断点数据，否则保留以便续传。"""
+        started = time.perf_counter()
+        manifest = self._load_manifest()
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self._save_manifest(manifest)
+
+        pending = [c for c in manifest["chunks"] if c["status"] not in ("done", "empty")]
+        print(f"[回补] {self.code} {self.period} {self.start}~{self.end}: "
+              f"{len(manifest['chunks'])} 个分块，待抓取 {len(pending)} 个，并发 {self.max_workers}")
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"backfill-{self.code}") as pool:
+            futures = [pool.submit(self._run_chunk, chunk, manifest) for chunk in pending]
+            for future in as_completed(futures):
+                future.result()
+
+        failed = [c for c in manifest["chunks"] if c["status"] == "failed"]
+        result = {
+            "code": self.code,
+            "period": self.period,
+            "start": self.start,
+            "end": self.end,
+            "chunks": len(manifest["chunks"]),
+            "failed_chunks": len(failed),
+            "rows": 0,
+            "path": "",
+            "seconds": 0.0,
+        }
+        if failed:
+            result["status"] = "partial"
+            print(f"[回补] {self.code} 有 {len(failed)} 个分块失败，已保留断点，重新运行同一命令即可续传")
+        else:
+            stitched = self._stitch(manifest)
+            if stitched.empty:
+                result["status"] = "empty"
+            else:
+                result["path"] = self._write(stitched)
+                result["rows"] = int(len(stitched))
+                result["status"] = "ok"
+            manifest["written"] = True
+            self._save_manifest(manifest)
+            if not keep_chunks:
+                shutil.rmtree(self.work_dir, ignore_errors=True)
+        result["seconds"] = round(time.perf_counter() - started, 2)
+        return result
+
+
+def backfill_codes(codes: List[str], start: Optional[str] = None, end: Optional[str] = None,
+                   period: str = "Day", max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """对多个代码依次回补；同一速率限制器在所有代码间共享。end 为空时续传沿用上次的结束日期，否则取今天。"""
+    start = start or START_TIME.split()[0]
+    limiter = RateLimiter(BACKFILL_RPS)
+    results = []
+    for code in codes:
+        try:
+            results.append(BackfillJob(code, start, end, period, max_workers=max_workers, limiter=limiter).run())
+        except Exception as e:
+            results.append({"code": str(code).split(".")[0], "period": str(period), "status": f"error: {e}"})
+    return results
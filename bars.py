@@ -0,0 +1,157 @@
+"""
+紧凑的 OHLCV K线容器。
+
+load_etf_data 得到的 DataFrame 每列都是 float64，参数寻优时还会随每个任务拷贝进工作进程。
+这里提供一种紧凑表示：
+- 价格列在 3 位小数（ETF 最小报价单位 0.001）下可无损还原时存为 float32，否则保留 float64；
+- 成交量全为整数时存为 int64，否则 float32；换手率与价格相同规则；
+- 时间索引为 datetime64 数组（保留原始精度单位）；
+- OHLCVBars 使用 __slots__，各字段是 NumPy 数组，切片/取列均为零拷贝视图。
+
+策略/回测/AI 入口通过 as_ohlcv_frame() 接受 OHLCVBars：
+exact=True 时价格（及换手率）按精度还原为 float64，计算结果与原始 CSV 读入的数据完全一致。
+"""
+
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ("OpenValue", "HighValue", "LowValue", "CloseValue")
+PRICE_DECIMALS = 3
+# exact=True 时需要按精度还原为 float64 的列
+_RESTORE_COLUMNS = PRICE_COLUMNS + ("ChangeRate",)
+
+# 字段名 -> DataFrame 列名
+_FIELD_COLUMNS = {
+    "open": "OpenValue",
+    "high": "HighValue",
+    "low": "LowValue",
+    "close": "CloseValue",
+    "volume": "Volume",
+    "change_rate": "ChangeRate",
+}
+
+
+def _compact_price(values: np.ndarray, decimals: int = PRICE_DECIMALS) -> np.ndarray:
+    """价格在给定小数位下可由 float32 无损还原时返回 float32，否则返回 float64。"""
+    values = np.asarray(values, dtype=np.float64)
+    narrow = values.astype(np.float32)
+    restored = np.round(narrow.astype(np.float64), decimals)
+    if np.array_equal(restored, values, equal_nan=True):
+        return narrow
+    return values
+
+
+def _compact_volume(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    if np.isfinite(values).all() and np.array_equal(values, np.floor(values)):
+        return values.astype(np.int64)
+    return values.astype(np.float32)
+
+
+def _restore_price(values: np.ndarray, decimals: int = PRICE_DECIMALS) -> np.ndarray:
+    if values.dtype == np.float32:
+        return np.round(values.astype(np.float64), decimals)
+    return values
+
+
+class OHLCVBars:
+    """紧凑 K 线容器：各字段为 NumPy 数组（可能是其他 OHLCVBars 的视图）。"""
+
+    __slots__ = ("symbol", "index", "open", "high", "low", "close", "volume", "change_rate")
+
+    def __init__(self, index: np.ndarray, open: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: np.ndarray, volume: np.ndarray, change_rate: Optional[np.ndarray] = None,
+                 symbol: Optional[str] = None):
+        self.symbol = symbol
+        index = np.asarray(index)
+        self.index = index if index.dtype.kind == "M" else index.astype("datetime64[ns]")
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.change_rate = change_rate
+
+    # ------------------------------------------------------------------
+    # 构造
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, symbol: Optional[str] = None) -> "OHLCVBars":
+        """从 DateTime 索引（或 DateTime 列）的 DataFrame 构造，按规则压缩数据类型。"""
+        if "DateTime" in df.columns:
+            index = pd.to_datetime(df["DateTime"]).to_numpy()
+        else:
+            index = pd.DatetimeIndex(df.index).to_numpy()
+        prices = {field: _compact_price(df[col].to_numpy()) for field, col in _FIELD_COLUMNS.items()
+                  if col in PRICE_COLUMNS}
+        change_rate = None
+        if "ChangeRate" in df.columns:
+            change_rate = _compact_price(pd.to_numeric(df["ChangeRate"], errors="coerce").to_numpy(dtype=np.float64))
+        return cls(index=index, volume=_compact_volume(df["Volume"].to_numpy()),
+                   change_rate=change_rate, symbol=symbol, **prices)
+
+    # ------------------------------------------------------------------
+    # 访问
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, key: Union[slice, str]):
+        """按列名取 Series（零拷贝），或按位置切片得到新的 OHLCVBars（零拷贝视图）。"""
+        if isinstance(key, str):
+            field = {col: f for f, col in _FIELD_COLUMNS.items()}.get(key, key)
+            return pd.Series(getattr(self, field), index=pd.DatetimeIndex(self.index, name="DateTime"),
+                             name=key, copy=False)
+        if not isinstance(key, slice):
+            raise TypeError("OHLCVBars 只支持列名或切片索引")
+        return OHLCVBars(
+            index=self.index[key], open=self.open[key], high=self.high[key], low=self.low[key],
+            close=self.close[key], volume=self.volume[key],
+            change_rate=None if self.change_rate is None else self.change_rate[key],
+            symbol=self.symbol,
+        )
+
+    def tail(self, n: int = 5) -> "OHLCVBars":
+        return self[max(len(self) - n, 0):]
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.index, self.open, self.high, self.low, self.close, self.volume, self.change_rate]
+        return int(sum(a.nbytes for a in arrays if a is not None))
+
+    @property
+    def dtypes(self) -> Dict[str, str]:
+        return {col: str(getattr(self, field).dtype) for field, col in _FIELD_COLUMNS.items()
+                if getattr(self, field) is not None}
+
+    def to_frame(self, exact: bool = True, datetime_column: bool = False) -> pd.DataFrame:
+        """
+        转为 DataFrame。
+        exact=True: 价格与换手率按精度还原为 float64（与原始数据逐位一致），成交量等零拷贝；
+        exact=False: 全部列零拷贝（float32 价格）。
+        datetime_column=True 时 DateTime 作为普通列（AI 加载器的格式），否则作为索引。
+        """
+        columns = {}
+        for field, col in _FIELD_COLUMNS.items():
+            values = getattr(self, field)
+            if values is None:
+                continue
+            columns[col] = _restore_price(values) if exact and col in _RESTORE_COLUMNS else values
+        index = pd.DatetimeIndex(self.index, name="DateTime")
+        frame = pd.DataFrame(columns, index=index, copy=False)
+        if datetime_column:
+            frame = frame.reset_index()
+        return frame
+
+    def __repr__(self) -> str:
+        span = f"{self.index[0]} ~ {self.index[-1]}" if len(self) else "empty"
+        return f"OHLCVBars(symbol={self.symbol!r}, rows={len(self)}, {span}, {self.nbytes} bytes)"
+
+
+def as_ohlcv_frame(data, exact: bool = True, datetime_column: bool = False) -> pd.DataFrame:
+    """策略/回测/AI 入口统一使用：OHLCVBars 转为 DataFrame，DataFrame 原样返回。"""
+    if isinstance(data, OHLCVBars):
+        return data.to_frame(exact=exact, datetime_column=datetime_column)
+    return data
@@ -0,0 +1,255 @@
+"""
+缠论结构引擎：K 线包含处理、分型、笔与中枢（NumPy 数组，单次遍历）。
+
+experiments/K-topDown.py::process_klines 在 Python 循环里逐行 loc/iloc 追加 DataFrame，
+几千根 K 线以上就非常慢。这里把同样的规则放在数组上：
+- 包含处理：一次遍历原始 K 线，上涨取高高、下跌取低低；相对前一根收盘跳空≥3% 的 K 线保留原样不合并；
+  同时记录每根合并 K 线覆盖的原始区间和高/低点所在的原始下标；
+- 分型：在合并后的 K 线上向量化比较相邻三根；同类分型间隔≥5 根且波动≥1.5% 才保留；
+- 笔：顶底交替连接，相邻同类取更极端者，两端间隔≥5 根原始 K 线且幅度≥1.5%；
+  未达标的反向分型暂存为候选，之后只被更极端的同类分型替换，保证每一笔止于区间极值；
+- 中枢：连续三笔价格区间的交集 [ZD, ZG]，其后仍与区间重叠的笔延伸该中枢。
+AI 提示词（ai_features）和图表（sdd.plot_expect_signal）共用 analyze_frame 的结果；
+策略需要分型过滤时可用 ChanResult.fractal_flags()，与原始 K 线逐根对齐。
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from bars import as_ohlcv_frame
+
+GAP_KEEP_RATIO = 0.03        # 相对前一根收盘跳空≥3% 的原始 K 线不参与包含合并
+FRACTAL_MIN_BARS = 5         # 同类分型间隔≥5 根（合并后）K 线；笔两端间隔≥5 根原始 K 线
+FRACTAL_MIN_MOVE = 0.015     # 价格波动≥1.5%
+
+TOP = 1
+BOTTOM = -1
+
+
+class ChanResult:
+    """analyze 的结果：合并后的 K 线、过滤后的分型、笔与中枢，下标均可映射回原始 K 线。"""
+
+    __slots__ = ("n_bars", "high", "low", "start", "end", "high_index", "low_index",
+                 "fractal_type", "fractal_index", "fractal_price", "strokes", "pivots")
+
+    def __init__(self, n_bars, high, low, start, end, high_index, low_index,
+                 fractal_type, fractal_index, fractal_price, strokes, pivots):
+        self.n_bars = n_bars
+        self.high = high                    # 合并后 K 线高点
+        self.low = low                      # 合并后 K 线低点
+        self.start = start                  # 合并 K 线覆盖的第一根原始 K 线下标
+        self.end = end                      # 合并 K 线覆盖的最后一根原始 K 线下标
+        self.high_index = high_index        # 合并高点所在的原始 K 线下标
+        self.low_index = low_index          # 合并低点所在的原始 K 线下标
+        self.fractal_type = fractal_type    # TOP / BOTTOM，按时间排序
+        self.fractal_index = fractal_index  # 分型极值所在的原始 K 线下标
+        self.fractal_price = fractal_price
+        self.strokes = strokes
+        self.pivots = pivots
+
+    @property
+    def merged_bars(self) -> int:
+        return len(self.high)
+
+    @property
+    def latest_pivot(self) -> Optional[Dict[str, Any]]:
+        return self.pivots[-1] if self.pivots else None
+
+    def fractals(self) -> List[Dict[str, Any]]:
+        """[{"type": "顶"/"底", "raw_index", "price"}]，按时间排序。"""
+        return [
+            {"type": "顶" if t == TOP else "底", "raw_index": int(i), "price": float(p)}
+            for t, i, p in zip(self.fractal_type, self.fractal_index, self.fractal_price)
+        ]
+
+    def fractal_flags(self) -> np.ndarray:
+        """与原始 K 线等长的数组：顶分型极值处为 1，底分型为 -1，其余为 0（供策略过滤使用）。"""
+        flags = np.zeros(self.n_bars, dtype=np.int8)
+        flags[self.fractal_index] = self.fractal_type
+        return flags
+
+
+def _merge_inclusion(high: List[float], low: List[float], close: List[float], up: bool, gap_ratio: float):
+    """
+    单次遍历的包含处理，返回合并后的各列（Python list，调用方转为数组）。
+    整根 K 线位于前一根收盘价 gap_ratio 之外（向上跳空看最低价，向下跳空看最高价）时不参与合并。
+    """
+    mh, ml = [high[0]], [low[0]]
+    start, end = [0], [0]
+    hi_idx, lo_idx = [0], [0]
+    cur_h, cur_l = high[0], low[0]
+    for i in range(1, len(high)):
+        h, lo = high[i], low[i]
+        prev_close = close[i - 1]
+        gap = max(lo - prev_close, prev_close - h) / prev_close
+        if gap < gap_ratio and ((h <= cur_h and lo >= cur_l) or (h >= cur_h and lo <= cur_l)):
+            # 包含关系：上涨取高高，下跌取低低
+            if up:
+                if h > cur_h:
+                    cur_h = h
+                    hi_idx[-1] = i
+                if lo > cur_l:
+                    cur_l = lo
+                    lo_idx[-1] = i
+            else:
+                if h < cur_h:
+                    cur_h = h
+                    hi_idx[-1] = i
+                if lo < cur_l:
+                    cur_l = lo
+                    lo_idx[-1] = i
+            mh[-1], ml[-1], end[-1] = cur_h, cur_l, i
+            continue
+        # 非包含（或跳空保留）：新 K 线，方向由高点的相对位置决定
+        up = h > cur_h
+        cur_h, cur_l = h, lo
+        mh.append(h)
+        ml.append(lo)
+        start.append(i)
+        end.append(i)
+        hi_idx.append(i)
+        lo_idx.append(i)
+    return mh, ml, start, end, hi_idx, lo_idx
+
+
+def _filter_same_type(merged_pos: np.ndarray, price: np.ndarray, min_bars: int, min_move: float) -> np.ndarray:
+    """同类分型过滤：与上一个保留的分型间隔≥min_bars 根合并 K 线且波动≥min_move。"""
+    keep = np.zeros(len(merged_pos), dtype=bool)
+    last = -1
+    for k in range(len(merged_pos)):
+        if last < 0:
+            keep[k] = True
+            last = k
+            continue
+        if merged_pos[k] - merged_pos[last] < min_bars:
+            continue
+        if abs(price[k] - price[last]) / min(price[k], price[last]) >= min_move:
+            keep[k] = True
+            last = k
+    return keep
+
+
+def _build_strokes(types: np.ndarray, raw_index: np.ndarray, prices: np.ndarray,
+                   min_bars: int, min_move: float) -> List[Dict[str, Any]]:
+    def more_extreme(t, p, ref):
+        return (t == TOP and p > ref) or (t == BOTTOM and p < ref)
+
+    points: List[tuple] = []
+    pending = None  # 间隔或幅度未达标的反向分型：后续同类分型只有更极端时才替换它
+    queue = list(zip(types.tolist(), raw_index.tolist(), prices.tolist()))[::-1]
+    while queue:
+        t, i, p = queue.pop()
+        if points and points[-1][0] == t:
+            if not more_extreme(t, p, points[-1][2]):
+                continue
+            if pending is not None and len(points) > 1 and more_extreme(pending[0], pending[2], points[-2][2]):
+                # 笔终点后移会把比起点更极端的候选包进这一笔：上一笔其实延伸到了候选处，
+                # 退回两点后按时间顺序重放被退回的终点、候选和当前分型
+                end = points.pop()
+                points.pop()
+                queue += [(t, i, p), pending, end]
+                pending = None
+                continue
+            # 相邻同类分型取更极端者；之前暂存的候选不比笔起点极端，留在这一笔内即可
+            points[-1] = (t, i, p)
+            pending = None
+            continue
+        if pending is not None:
+            if not more_extreme(t, p, pending[2]):
+                continue
+            pending = None
+        if points:
+            _, prev_i, prev_p = points[-1]
+            lo, hi = (prev_p, p) if prev_p < p else (p, prev_p)
+            if i - prev_i < min_bars or (hi - lo) / lo < min_move:
+                pending = (t, i, p)
+                continue
+        points.append((t, i, p))
+    return [
+        {
+            "direction": "上涨" if b[0] == TOP else "下跌",
+            "start_index": a[1], "start_price": a[2],
+            "end_index": b[1], "end_price": b[2],
+            "high": max(a[2], b[2]), "low": min(a[2], b[2]),
+        }
+        for a, b in zip(points[:-1], points[1:])
+    ]
+
+
+def _build_pivots(strokes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    pivots: List[Dict[str, Any]] = []
+    current = None
+    i = 0
+    while i < len(strokes):
+        if current is not None:
+            s = strokes[i]
+            if s["low"] <= current["ZG"] and s["high"] >= current["ZD"]:
+                current["end_index"] = s["end_index"]
+                current["strokes"] += 1
+                i += 1
+                continue
+            current = None
+        if i + 3 > len(strokes):
+            break
+        window = strokes[i:i + 3]
+        zg = min(s["high"] for s in window)
+        zd = max(s["low"] for s in window)
+        if zg > zd:
+            current = {"ZG": zg, "ZD": zd, "start_index": window[0]["start_index"],
+                       "end_index": window[-1]["end_index"], "strokes": 3}
+            pivots.append(current)
+            i += 3
+        else:
+            i += 1
+    return pivots
+
+
+def analyze(high, low, open_, close, gap_ratio: float = GAP_KEEP_RATIO,
+            min_bars: int = FRACTAL_MIN_BARS, min_move: float = FRACTAL_MIN_MOVE) -> ChanResult:
+    """对按时间排序的 OHLC 数组做包含处理、分型、笔与中枢计算。"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    n = len(high)
+    empty_i = np.zeros(0, dtype=np.int64)
+    if n == 0:
+        return ChanResult(0, high, low, empty_i, empty_i, empty_i, empty_i,
+                          np.zeros(0, dtype=np.int8), empty_i, high[:0], [], [])
+
+    # 初始方向：前两根实体 K 线同阴同阳取其方向，一阴一阳以第二根为准
+    up = bool(close[1] > open_[1]) if n > 1 else True
+    merged = _merge_inclusion(high.tolist(), low.tolist(), np.asarray(close, dtype=np.float64).tolist(),
+                              up, gap_ratio)
+    mh, ml = np.array(merged[0]), np.array(merged[1])
+    start, end, hi_idx, lo_idx = (np.array(col, dtype=np.int64) for col in merged[2:])
+
+    types = np.zeros(0, dtype=np.int8)
+    raw_index = empty_i
+    prices = mh[:0]
+    if len(mh) >= 3:
+        mid_h, mid_l = mh[1:-1], ml[1:-1]
+        top = (mid_h > mh[:-2]) & (mid_h > mh[2:]) & (mid_l > ml[:-2]) & (mid_l > ml[2:])
+        bottom = (mid_l < ml[:-2]) & (mid_l < ml[2:]) & (mid_h < mh[:-2]) & (mid_h < mh[2:])
+        top_pos = np.flatnonzero(top) + 1
+        bottom_pos = np.flatnonzero(bottom) + 1
+        top_pos = top_pos[_filter_same_type(top_pos, mh[top_pos], min_bars, min_move)]
+        bottom_pos = bottom_pos[_filter_same_type(bottom_pos, ml[bottom_pos], min_bars, min_move)]
+
+        pos = np.concatenate([top_pos, bottom_pos])
+        types = np.concatenate([np.full(len(top_pos), TOP, dtype=np.int8),
+                                np.full(len(bottom_pos), BOTTOM, dtype=np.int8)])
+        raw_index = np.concatenate([hi_idx[top_pos], lo_idx[bottom_pos]])
+        prices = np.concatenate([mh[top_pos], ml[bottom_pos]])
+        order = np.argsort(pos, kind="stable")
+        types, raw_index, prices = types[order], raw_index[order], prices[order]
+
+    strokes = _build_strokes(types, raw_index, prices, min_bars, min_move)
+    return ChanResult(n, mh, ml, start, end, hi_idx, lo_idx, types, raw_index, prices,
+                      strokes, _build_pivots(strokes))
+
+
+def analyze_frame(data, **kwargs) -> ChanResult:
+    """从 DataFrame（OpenValue/HighValue/LowValue/CloseValue 列）或 OHLCVBars 计算缠论结构。"""
+    data = as_ohlcv_frame(data)
+    return analyze(data["HighValue"].to_numpy(np.float64), data["LowValue"].to_numpy(np.float64),
+                   data["OpenValue"].to_numpy(np.float64), data["CloseValue"].to_numpy(np.float64), **kwargs)
@@ -0,0 +1,142 @@
+"""
+后台图表渲染队列。
+
+simple_ma_strategy / plot_performance 的大图渲染与保存原本同步发生在 get_trading_signal 内，
+调用方即使只需要买卖信号也要等待绘图完成。RenderQueue 把图表任务（标的、所需数据列、信号列）
+提交到独立的进程池（Agg 后端）渲染，立即返回 Future：
+- 信号计算不再包含绘图耗时；
+- 邮件步骤在附加图片前调用 wait(symbol) 等待该标的的图表写完；
+- 进程池在第一次提交时才创建，工作进程只导入一次 sdd / matplotlib；
+  提交往往发生在任务图的工作线程或常驻服务里，多线程进程中 fork 可能因其他线程持有的
+  日志/IO 锁而死锁，所以工作进程用 spawn 启动；
+- 已完成的 Future 在下次提交时清理（结果记入各标的的图片路径），常驻服务反复刷新也不会无限增长。
+"""
+
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, wait as wait_futures
+from typing import Dict, List, Optional
+
+from config import CHART_RENDER_WORKERS
+
+# 各类图表实际用到的列，只把这些列序列化给工作进程
+_PRICE_COLUMNS = ['OpenValue', 'HighValue', 'LowValue', 'CloseValue', 'Volume']
+_PERFORMANCE_COLUMNS = _PRICE_COLUMNS + ['signal', 'total', 'drawdown']
+
+
+def _init_render_worker() -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _render_expect_signal(data, signals, symbol, short_window, long_window, volume_mavg_Value, pic_folder):
+    from sdd import plot_expect_signal
+
+    return plot_expect_signal(data, signals, symbol, short_window, long_window,
+                              volume_mavg_Value=volume_mavg_Value, plot_chart=1, pic_folder=pic_folder)
+
+
+def _render_performance(plot_df, symbol, benchmark_df, short_window, long_window,
+                        volume_mavg_Value, rsi_period, pic_folder):
+    from sdd import plot_performance
+
+    return plot_performance(plot_df, symbol, benchmark_df, short_window, long_window,
+                            volume_mavg_Value, rsi_period, plot_chart=1, pic_folder=pic_folder)
+
+
+class RenderQueue:
+    """图表渲染队列：按标的记录 Future，供邮件步骤等待。"""
+
+    def __init__(self, max_workers: int = CHART_RENDER_WORKERS):
+        self.max_workers = max(1, int(max_workers))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._futures: Dict[str, List[Future]] = {}
+        self._paths: Dict[str, Dict[str, None]] = {}   # 已清理的 Future 生成的图片路径（按标的去重）
+        self._lock = threading.Lock()
+
+    def _collect(self, symbol: str, future: Future) -> None:
+        """记录一个已完成 Future 的结果（调用方持有锁）；渲染失败只打印提示。"""
+        try:
+            path = future.result()
+        except Exception as exc:
+            print(f"[图表] 渲染失败: {exc}")
+            return
+        if path:
+            self._paths.setdefault(symbol, {})[path] = None
+
+    def _submit(self, symbol: str, fn, *args) -> Future:
+        symbol = str(symbol)
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_render_worker,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            future = self._pool.submit(fn, *args)
+            # 清理已完成的 Future，只保留仍在渲染的和本次提交的
+            for key, futures in self._futures.items():
+                finished = [f for f in futures if f.done()]
+                for done in finished:
+                    self._collect(key, done)
+                    futures.remove(done)
+            self._futures.setdefault(symbol, []).append(future)
+        return future
+
+    def submit_expect_signal(self, data, signals, symbol, short_window, long_window,
+                             volume_mavg_Value=10, pic_folder='pic') -> Future:
+        """提交预期信号图（K线 + 均线 + 买卖点 + 成交量）。"""
+        return self._submit(symbol, _render_expect_signal, data[_PRICE_COLUMNS], signals, symbol,
+                            int(short_window), int(long_window), int(volume_mavg_Value), pic_folder)
+
+    def submit_performance(self, plot_df, symbol, benchmark_df=None, short_window=5, long_window=21,
+                           volume_mavg_Value=10, rsi_period=13, pic_folder='pic') -> Future:
+        """提交绩效仪表盘。"""
+        columns = [c for c in _PERFORMANCE_COLUMNS if c in plot_df.columns]
+        return self._submit(symbol, _render_performance, plot_df[columns], symbol, benchmark_df,
+                            int(short_window), int(long_window), int(volume_mavg_Value), int(rsi_period),
+                            pic_folder)
+
+    def pending(self, symbol: Optional[str] = None) -> int:
+        with self._lock:
+            futures = self._futures.get(str(symbol), []) if symbol is not None else \
+                [f for fs in self._futures.values() for f in fs]
+        return sum(1 for f in futures if not f.done())
+
+    def wait(self, symbol: Optional[str] = None, timeout: Optional[float] = None) -> List[str]:
+        """
+        等待指定标的（None 为全部）的图表渲染完成，返回已生成的图片路径。
+        渲染失败只打印提示，不抛出（缺失的附件由邮件步骤自行跳过）。
+        """
+        with self._lock:
+            symbols = list(self._futures) if symbol is None else [str(symbol)]
+            futures = [(key, f) for key in symbols for f in self._futures.get(key, [])]
+        done, not_done = wait_futures([f for _, f in futures], timeout=timeout)
+        with self._lock:
+            for key, future in futures:
+                if future in done and future in self._futures.get(key, []):
+                    self._collect(key, future)
+                    self._futures[key].remove(future)
+            paths = [path for key in symbols for path in self._paths.get(key, {})]
+        if not_done:
+            print(f"[图表] {len(not_done)} 个图表在 {timeout}s 内未完成渲染")
+        return paths
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+_shared_queue: Optional[RenderQueue] = None
+_shared_lock = threading.Lock()
+
+
+def get_render_queue() -> RenderQueue:
+    """返回进程内共享的渲染队列（进程退出前等待未完成的图表写盘）。"""
+    global _shared_queue
+    if _shared_queue is None:
+        with _shared_lock:
+            if _shared_queue is None:
+                _shared_queue = RenderQueue()
+                atexit.register(_shared_queue.shutdown)
+    return _shared_queue
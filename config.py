@@ -39,6 +39,111 @@ def _load_env_file(env_path: Path) -> None:
 
 _load_env_file(BASE_DIR / ".env")
 
+# 本地缓存目录（行情快照等，可随时删除）
+CACHE_DIR = DATA_DIR / "_cache"
+
+# ------------------------------------------------------------------------
+# 行情快照缓存（fetch / signal / report / auto 各阶段共享）
+# ------------------------------------------------------------------------
+# 每个字段的有效期：数字为秒数；"close" 表示有效至下一个收盘时刻（15:00）
+QUOTE_CACHE_PATH = CACHE_DIR / "quote_snapshot.json"
+QUOTE_CACHE_TTLS = {
+    "quote": int(os.getenv("QUOTE_TTL_SECONDS", "30")),   # 实时行情
+    "daily": "close",                                      # 日线（截至下一个收盘）
+}
+# 过期后仍可先返回旧值、后台刷新的最长时间（秒）；超过则阻塞等待刷新
+QUOTE_CACHE_MAX_STALE = {
+    "quote": int(os.getenv("QUOTE_MAX_STALE_SECONDS", "600")),
+    "daily": 24 * 3600,
+}
+
+# ------------------------------------------------------------------------
+# HTTP 录制/回放（离线计时与回归测试）
+# ------------------------------------------------------------------------
+# live:   直连真实接口（默认）
+# record: 直连真实接口，同时把响应录制到 HTTP_FIXTURE_DIR
+# replay: 所有请求改发到本地桩服务器（python http_replay.py serve），由其按录制内容回放
+HTTP_MODE = os.getenv("HTTP_MODE", "live").strip().lower()
+HTTP_FIXTURE_DIR = Path(os.getenv("HTTP_FIXTURE_DIR", str(BASE_DIR / "fixtures" / "http")))
+HTTP_STUB_URL = os.getenv("HTTP_STUB_URL", "http://127.0.0.1:18080")
+# 计算录制键时忽略的易变查询参数（时间戳、JSONP 回调名等）
+HTTP_REPLAY_IGNORE_PARAMS = ("_", "cb", "callback")
+
+# ------------------------------------------------------------------------
+# 历史数据回补（python run.py backfill）
+# ------------------------------------------------------------------------
+BACKFILL_DIR = CACHE_DIR / "backfill"                                # 分块结果与断点清单
+BACKFILL_MAX_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))      # 并发分块数
+BACKFILL_RPS = float(os.getenv("BACKFILL_RPS", "2"))                # 全局请求速率上限（次/秒）
+# 每个分块覆盖的自然日数（日线按自然年对齐）；分钟线接口单次返回窗口有限，按周期取较小窗口
+BACKFILL_CHUNK_DAYS = {
+    "Day": 366,
+    "1": 5,
+    "5": 30,
+    "15": 60,
+    "30": 120,
+    "60": 240,
+    "120": 240,
+}
+# 相邻分块重叠的天数，接缝处由去重拼接
+BACKFILL_OVERLAP_DAYS = 1
+
+# ------------------------------------------------------------------------
+# 交易日历（沪深交易所，本地缓存，很少刷新）
+# ------------------------------------------------------------------------
+TRADE_CALENDAR_PATH = CACHE_DIR / "trade_calendar.json"
+TRADE_CALENDAR_REFRESH_DAYS = int(os.getenv("TRADE_CALENDAR_REFRESH_DAYS", "30"))
+# 每个标的最近一次完整回测的信号（休市/数据未更新时直接复用，不再回测），每个标的一个文件
+SIGNAL_CACHE_DIR = CACHE_DIR / "signals"
+
+# ------------------------------------------------------------------------
+# 进程内 CSV 数据帧缓存（sdd.load_etf_data / deepSeekAi.ETFDataLoader 共享）
+# ------------------------------------------------------------------------
+FRAME_CACHE_MAX_ENTRIES = int(os.getenv("FRAME_CACHE_MAX_ENTRIES", "32"))   # 0 表示不缓存
+
+# ------------------------------------------------------------------------
+# 常驻服务（python run.py serve；其他模式加 --server 作为客户端）
+# ------------------------------------------------------------------------
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "18765"))
+SERVICE_REFRESH_SECONDS = int(os.getenv("SERVICE_REFRESH_SECONDS", "600"))   # 0 表示不定时刷新
+SERVICE_CLIENT_TIMEOUT = float(os.getenv("SERVICE_CLIENT_TIMEOUT", "1800"))  # 客户端等待服务响应的秒数（report/auto 较慢）
+
+# ------------------------------------------------------------------------
+# 后台图表渲染（信号计算不等待绘图，邮件附图前再等待）
+# ------------------------------------------------------------------------
+CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", "2"))
+
+# ------------------------------------------------------------------------
+# DeepSeek 响应缓存（deepSeekAi.aiDeepSeekAnly / webhtml AI 摘要共享）
+# ------------------------------------------------------------------------
+AI_CACHE_DIR = CACHE_DIR / "ai"
+# "close" 表示有效至下一个收盘时刻（15:00）；数字为秒数；0 表示不缓存
+_ai_cache_ttl = os.getenv("AI_CACHE_TTL", "close").strip().lower()
+AI_CACHE_TTL = _ai_cache_ttl if _ai_cache_ttl == "close" else float(_ai_cache_ttl)
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "200"))
+AI_CACHE_MAX_BYTES = int(os.getenv("AI_CACHE_MAX_BYTES", str(20 * 1024 * 1024)))
+
+# auto 模式下各标的 AI 分析共用一个异步连接池，同时在途的请求数上限
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+# 流式（SSE）读取模型输出：读取超时只约束相邻数据块，报告段结束即停止读取，断线保留已收到的内容
+AI_STREAM = os.getenv("AI_STREAM", "1").strip().lower() not in ("0", "false", "no", "off")
+# 提示词模式：compact 为本地预计算指标/缠论结构的紧凑摘要（见 ai_features），full 为原始 80 行表格
+AI_PROMPT_MODE = os.getenv("AI_PROMPT_MODE", "compact").strip().lower()
+AI_COMPACT_TAIL_ROWS = int(os.getenv("AI_COMPACT_TAIL_ROWS", "10"))   # compact 模式附带的原始 K 线根数
+
+# ------------------------------------------------------------------------
+# 邮件附件优化（attachment_cache：缩放/调色板量化后的图片副本，按源文件哈希缓存）
+# ------------------------------------------------------------------------
+ATTACHMENT_CACHE_DIR = CACHE_DIR / "attachments"
+ATTACHMENT_CACHE_MAX_ENTRIES = int(os.getenv("ATTACHMENT_CACHE_MAX_ENTRIES", "100"))   # 源文件个数
+# 逐级降低的图片版本：(最大宽度, 调色板颜色数)，None 表示保持原宽度
+ATTACHMENT_RENDITIONS = ((None, 256), (1600, 256), (1200, 128), (800, 64))
+ATTACHMENT_FORMAT = os.getenv("ATTACHMENT_FORMAT", "png").strip().lower()          # png 或 webp
+# 每封信号邮件附件（base64 编码后）的总大小预算；0 表示附加原图
+MAIL_ATTACHMENT_BUDGET_BYTES = int(os.getenv("MAIL_ATTACHMENT_BUDGET_BYTES", str(3 * 1024 * 1024)))
+
+
 class ETFConfig:
     DEFAULT_PERIODS = ['5', '15', '30', '60', '120']
     dataPath = Path(DATA_DIR)
@@ -119,6 +224,24 @@ DEFAULT_RECIPIENTS = {
     "cc": ["wzq1314192567@outlook.com","550661468@qq.com"]
 }
 
+# ========================================================================
+# 发送方式
+# ========================================================================
+# 一次运行内的邮件复用同一个已登录的 SMTP 连接（mailFun.MailDispatcher）。
+# MAIL_DIGEST=1 时 auto 模式把所有标的的信号、AI 策略和图表合并为一封汇总邮件。
+MAIL_DIGEST = os.getenv("MAIL_DIGEST", "0").strip().lower() in ("1", "true", "yes", "on")
+MAIL_MAX_RETRIES = int(os.getenv("MAIL_MAX_RETRIES", "3"))
+MAIL_RETRY_DELAY_SECONDS = float(os.getenv("MAIL_RETRY_DELAY_SECONDS", "10"))
+
+# 发件箱（mail_outbox）：流水线只把邮件写入本地 SQLite 队列，由后台线程投递，失败按指数退避重试，
+# 进程重启后继续投递未发出的邮件。MAIL_OUTBOX=0 时恢复为直接发送。
+MAIL_OUTBOX = os.getenv("MAIL_OUTBOX", "1").strip().lower() not in ("0", "false", "no", "off")
+MAIL_OUTBOX_DIR = DATA_DIR / "_outbox"                                              # 队列库与附件快照
+MAIL_OUTBOX_DEDUPE_SECONDS = float(os.getenv("MAIL_OUTBOX_DEDUPE_SECONDS", "3600"))  # 相同通知的去重窗口
+MAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("MAIL_OUTBOX_MAX_ATTEMPTS", "8"))           # 超过后标记为 failed
+MAIL_OUTBOX_BACKOFF_SECONDS = (30.0, 1800.0)                                         # 首次重试间隔, 上限
+MAIL_OUTBOX_DRAIN_SECONDS = float(os.getenv("MAIL_OUTBOX_DRAIN_SECONDS", "120"))     # 退出前等待投递的最长时间
+
 # ========================================================================
 # 演示内容
 # ========================================================================
@@ -1,9 +1,14 @@
-import akshare as ak
 import pandas as pd
 import requests
 import json
 from tenacity import retry, stop_after_attempt, wait_exponential
 from config import ETFConfig
+from quote_cache import get_quote_cache
+from minute_bars import derive_periods, finest_period
+from lazy_import import lazy_import
+
+# akshare 导入较慢（约数百毫秒），首次调用接口时才导入
+ak = lazy_import("akshare")
 
 
 def _convert_code_to_sina(code: str) -> str:
@@ -97,6 +102,33 @@ def _sina_etf_daily_hist(code: str, start_date: str = None, end_date: str = None
         print(f"[新浪接口] {code} 历史数据获取失败: {e}")
         return pd.DataFrame()
 
+def _publish_daily_snapshot(code: str, df: pd.DataFrame) -> None:
+    """
+    将刚获取的日线最后一根K线写入行情快照缓存（有效至下一个收盘），
+    供同一次运行的报告阶段（getSpecificEtfChangePct 等）直接复用，避免重复请求。
+    """
+    if df is None or df.empty or "CloseValue" not in df.columns:
+        return
+    closes = pd.to_numeric(df["CloseValue"], errors="coerce").dropna()
+    if closes.empty:
+        return
+    price = float(closes.iloc[-1])
+    if "涨跌幅" in df.columns and pd.notna(df["涨跌幅"].iloc[-1]):
+        change_pct = float(df["涨跌幅"].iloc[-1])
+    elif len(closes) >= 2 and closes.iloc[-2] > 0:
+        change_pct = round((price / float(closes.iloc[-2]) - 1) * 100, 2)
+    else:
+        return
+    try:
+        get_quote_cache().put("etf", str(code), "daily", {
+            "change_pct": change_pct,
+            "price": price,
+            "date": str(df["DateTime"].iloc[-1])[:10],
+        })
+    except Exception as e:
+        print(f"[行情缓存] {code} 日线快照写入失败: {e}")
+
+
 class ETFFetcher:
     def __init__(self, config: ETFConfig):
         self.config = config
@@ -106,12 +138,12 @@ class ETFFetcher:
         # 设置时间范围
        
         try:
-            df = ak.fund_etf_hist_min_em(
+            df = self._fetch_etf_min_raw(
                 symbol=f"{self.config.stock_code}",
                 period=str(period),
-                adjust="",
                 start_date=f"{self.config.start_date}",
                 end_date=f"{self.config.end_time}",
+                adjust="",
             )
             #print(df.head())  # 打印返回的数据框
             return self._etf_min_format_data(df)
@@ -119,6 +151,31 @@ class ETFFetcher:
             print(f"[Error] {self.config.stock_code} {period}分钟数据获取失败: {str(e)}")
             return pd.DataFrame()
 
+    def fetch_minute_periods(self, periods=None):
+        """
+        获取多周期分时数据：只请求最细周期一次，其余周期在本地按交易时段重采样。
+        返回 {周期字符串: DataFrame}；最细周期获取失败时各周期均为空表。
+        """
+        periods = [str(p) for p in (periods or self.config.periods)]
+        base = finest_period(periods)
+        base_df = self.fetch_minute_data(base)
+        if base_df.empty:
+            return {p: pd.DataFrame() for p in periods}
+        print(f"[分钟数据] {self.config.stock_code} 以 {base} 分钟数据本地生成周期: {', '.join(periods)}")
+        return derive_periods(base_df, base, periods)
+
+    def _fetch_etf_min_raw(self, symbol, period, start_date, end_date, adjust):
+        """
+        东方财富分钟接口请求（无内置重试，由调用方控制重试逻辑）
+        """
+        return ak.fund_etf_hist_min_em(
+            symbol=symbol,
+            period=period,
+            adjust=adjust,
+            start_date=start_date,
+            end_date=end_date,
+        )
+
     def _fetch_etf_daily_raw(self, symbol, period, start_date, end_date, adjust):
         """
         东方财富接口请求（无内置重试，由调用方控制重试逻辑）
@@ -176,7 +233,9 @@ class ETFFetcher:
                 )
                 if df is not None and not df.empty:
                     print(f"[东方财富接口] {self.config.stock_code} 日线数据获取成功，共 {len(df)} 条")
-                    return self._process_raw_dataDaily(df)
+                    processed = self._process_raw_dataDaily(df)
+                    _publish_daily_snapshot(self.config.stock_code, processed)
+                    return processed
             except Exception as e:
                 print(f"[东方财富接口] {self.config.stock_code} 获取失败: {e}")
                 if attempt < max_retries - 1:
@@ -190,7 +249,9 @@ class ETFFetcher:
             df = _sina_etf_daily_hist(self.config.stock_code, start_date, end_date)
             if df is not None and not df.empty:
                 print(f"[新浪接口] {self.config.stock_code} 日线数据获取成功，共 {len(df)} 条")
-                return self._process_raw_dataDaily(df)
+                processed = self._process_raw_dataDaily(df)
+                _publish_daily_snapshot(self.config.stock_code, processed)
+                return processed
         except Exception as e:
             print(f"[新浪接口] {self.config.stock_code} 也失败: {e}")
         
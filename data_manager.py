@@ -1,8 +1,23 @@
+import json
 import os
+import threading
 import pandas as pd
 from pathlib import Path
 from config import ETFConfig
 
+
+def merge_by_datetime(existing_df, new_df, date_col='DateTime'):
+    """按时间列合并新旧数据：清理无效时间、去重并保留最新一条"""
+    existing_df = existing_df.copy()
+    new_df = new_df.copy()
+    existing_df[date_col] = pd.to_datetime(existing_df[date_col], errors='coerce')
+    new_df[date_col] = pd.to_datetime(new_df[date_col], errors='coerce')
+
+    merged = pd.concat([existing_df.dropna(subset=[date_col]), new_df.dropna(subset=[date_col])])
+    merged = merged.sort_values(date_col, kind='stable')
+    return merged.drop_duplicates(date_col, keep='last')
+
+
 class ETFStorage:
     def __init__(self, config: ETFConfig):
         self.config = config
@@ -17,6 +32,22 @@ class ETFStorage:
         return len(df)
 
 
+    @staticmethod
+    def last_datetime(filepath):
+        """只读取文件末尾，返回最后一行的 DateTime 字符串（文件不存在或为空时返回 None）"""
+        filepath = Path(filepath)
+        if not filepath.exists():
+            return None
+        with open(filepath, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - 4096))
+            lines = [line for line in f.read().decode('utf-8', errors='ignore').splitlines() if line.strip()]
+        if len(lines) < 2 and size <= 4096:
+            return None
+        last = lines[-1].split(',')[0].strip() if lines else ''
+        return last or None
+
     def _get_filepath(self, period):
         """生成文件路径"""
         symbol_dir = self.config.data_dir / self.config.stock_code
@@ -33,22 +64,152 @@ class ETFStorage:
 
     def _merge_dataframes(self, existing_df, new_df):
         """统一的数据合并方法"""
-        # 统一处理日期列
-        date_col = 'DateTime'
-        
-        # 转换日期格式
-        existing_df[date_col] = pd.to_datetime(existing_df[date_col], errors='coerce')
-        new_df[date_col] = pd.to_datetime(new_df[date_col], errors='coerce')
+        return merge_by_datetime(existing_df, new_df)
 
-        # 清理无效数据
-        existing_clean = existing_df.dropna(subset=[date_col])
-        new_clean = new_df.dropna(subset=[date_col])
 
-        # 合并数据集
-        merged = pd.concat([existing_clean, new_clean])
-        
-        # 去重并保留最新数据
-        merged = merged.sort_values(date_col)
-        merged = merged.drop_duplicates(date_col, keep='last')
+class ETFMinuteStore:
+    """
+    分钟K线分区存储：按 代码/周期/月份 拆分为二进制文件，并维护一个小清单记录每个分区的时间范围。
+
+    目录结构:
+        stock_data/{code}/minute/{period}/YYYY-MM.pkl
+        stock_data/{code}/minute/{period}/manifest.json
+            {"partitions": {"2024-01": {"file": "2024-01.pkl", "start": "...", "end": "...", "rows": 1152}}}
+
+    - load 只读取与查询区间重叠的分区；
+    - append 只重写新数据所在的月份（通常只有当月）；
+    - 首次写入时若存在旧版单文件 CSV（{code}_{period}.csv），自动迁移。
+    """
+
+    MANIFEST_NAME = "manifest.json"
+
+    def __init__(self, base_dir=None):
+        self.base_dir = Path(base_dir or ETFConfig.dataPath)
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # 路径与清单
+    # ------------------------------------------------------------------
+    def _partition_dir(self, symbol, period):
+        return self.base_dir / str(symbol) / "minute" / str(period)
+
+    def _legacy_csv(self, symbol, period):
+        return self.base_dir / str(symbol) / f"{symbol}_{period}.csv"
+
+    def _manifest_path(self, symbol, period):
+        return self._partition_dir(symbol, period) / self.MANIFEST_NAME
 
-        return merged
\ No newline at end of file
+    def load_manifest(self, symbol, period):
+        """读取分区清单；不存在或损坏时返回空清单"""
+        path = self._manifest_path(symbol, period)
+        if not path.exists():
+            return {"partitions": {}}
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            return {"partitions": {}}
+
+    def _save_manifest(self, symbol, period, manifest):
+        part_dir = self._partition_dir(symbol, period)
+        part_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = part_dir / f"{self.MANIFEST_NAME}.{os.getpid()}.tmp"
+        tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, part_dir / self.MANIFEST_NAME)
+
+    def _read_partition(self, symbol, period, meta):
+        path = self._partition_dir(symbol, period) / meta["file"]
+        if not path.exists():
+            return pd.DataFrame()
+        return pd.read_pickle(path)
+
+    def _write_partition(self, symbol, period, month, df):
+        part_dir = self._partition_dir(symbol, period)
+        part_dir.mkdir(parents=True, exist_ok=True)
+        filename = f"{month}.pkl"
+        tmp_path = part_dir / f"{filename}.{os.getpid()}.tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, part_dir / filename)
+        return {
+            "file": filename,
+            "start": df['DateTime'].iloc[0].strftime("%Y-%m-%d %H:%M:%S"),
+            "end": df['DateTime'].iloc[-1].strftime("%Y-%m-%d %H:%M:%S"),
+            "rows": int(len(df)),
+        }
+
+    # ------------------------------------------------------------------
+    # 读写
+    # ------------------------------------------------------------------
+    def append(self, df, symbol, period):
+        """
+        写入分钟数据，只重写受影响的月份分区。
+        返回新增行数（按时间去重后，已存在的时间点视为更新而非新增）。
+        """
+        if df is None or df.empty:
+            return 0
+
+        with self._lock:
+            if not self._manifest_path(symbol, period).exists() and self._legacy_csv(symbol, period).exists():
+                self.migrate_csv(symbol, period)
+            manifest = self.load_manifest(symbol, period)
+
+            new_df = df.copy()
+            new_df['DateTime'] = pd.to_datetime(new_df['DateTime'], errors='coerce')
+            new_df = new_df.dropna(subset=['DateTime'])
+            months = new_df['DateTime'].dt.strftime("%Y-%m")
+
+            added = 0
+            for month, chunk in new_df.groupby(months, sort=True):
+                meta = manifest["partitions"].get(month)
+                existing = self._read_partition(symbol, period, meta) if meta else chunk.iloc[:0]
+                before = len(existing)
+                merged = merge_by_datetime(existing, chunk).reset_index(drop=True)
+                manifest["partitions"][month] = self._write_partition(symbol, period, month, merged)
+                added += len(merged) - before
+
+            self._save_manifest(symbol, period, manifest)
+            return added
+
+    def load(self, symbol, period, start=None, end=None):
+        """读取 [start, end] 区间内的分钟数据，只打开时间范围重叠的分区"""
+        start_ts = pd.Timestamp(start) if start is not None else None
+        end_ts = pd.Timestamp(end) if end is not None else None
+        # 只给出日期的结束时间视为包含当天全部K线
+        if end_ts is not None and isinstance(end, str) and len(end.strip()) <= 10:
+            end_ts = end_ts + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+
+        manifest = self.load_manifest(symbol, period)
+        frames = []
+        for month in sorted(manifest["partitions"]):
+            meta = manifest["partitions"][month]
+            if start_ts is not None and pd.Timestamp(meta["end"]) < start_ts:
+                continue
+            if end_ts is not None and pd.Timestamp(meta["start"]) > end_ts:
+                continue
+            frames.append(self._read_partition(symbol, period, meta))
+
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        mask = pd.Series(True, index=df.index)
+        if start_ts is not None:
+            mask &= df['DateTime'] >= start_ts
+        if end_ts is not None:
+            mask &= df['DateTime'] <= end_ts
+        return df[mask].reset_index(drop=True)
+
+    def migrate_csv(self, symbol, period, csv_path=None, remove=False):
+        """将旧版单文件 CSV 迁移为月度分区；返回迁移行数"""
+        csv_path = Path(csv_path) if csv_path else self._legacy_csv(symbol, period)
+        if not csv_path.exists():
+            return 0
+        legacy_df = pd.read_csv(csv_path, parse_dates=['DateTime'])
+        with self._lock:
+            # 先写出清单文件，避免 append 内再次触发迁移
+            if not self._manifest_path(symbol, period).exists():
+                self._save_manifest(symbol, period, {"partitions": {}})
+            count = self.append(legacy_df, symbol, period)
+        print(f"[分区存储] {symbol} {period} 分钟 CSV 已迁移 {count} 条 -> {self._partition_dir(symbol, period)}")
+        if remove:
+            csv_path.unlink()
+        return count
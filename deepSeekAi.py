@@ -9,19 +9,30 @@
     3、将步骤1的数据，组装好后调用步骤2的R1模型，获取结果，并输出结果
 '''
 
+import asyncio
 import os
 import sys
+import threading
+from concurrent.futures import Future
 import pandas as pd
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any
 import httpx
 from pydantic import BaseModel, Field
 from tenacity import retry, stop_after_attempt, wait_exponential
 from dotenv import load_dotenv
+from bars import OHLCVBars, as_ohlcv_frame
+from frame_cache import get_frame_cache
+from ai_cache import cached_label, get_ai_cache, request_key
+from config import AI_COMPACT_TAIL_ROWS, AI_MAX_CONCURRENCY, AI_PROMPT_MODE, AI_STREAM
+from sse_stream import SSE_DONE, StreamAccumulator, parse_sse_line
 
 # 加载环境变量
 load_dotenv()
 
+# <策略输出> 段（建议操作/仓位建议）在报告之前输出，流式读取时该标记出现即可提取仓位策略
+STRATEGY_SECTION_END = "</策略输出>"
+
 class DeepSeekConfig(BaseModel):
     """深度求索API配置"""
     api_key: str = Field(..., description="API密钥")
@@ -31,8 +42,13 @@ class DeepSeekConfig(BaseModel):
     max_tokens: int = 1024*160  # 与官方示例一致
     temperature: float = 0
     top_p: float = 0
+    stream: bool = Field(AI_STREAM, description="流式读取（SSE），见 sse_stream")
+
 
 
+def _parse_ai_csv(file_path) -> pd.DataFrame:
+    return pd.read_csv(file_path, parse_dates=['DateTime'])
+
 
 class ETFDataLoader:
     def __init__(self):
@@ -41,109 +57,147 @@ class ETFDataLoader:
     def load_etf_data(
         self,
         file_path: str,
-        required_columns: list = ["DateTime", "OpenValue", "CloseValue", "HighValue", "LowValue", "Volume", "ChangeRate"]
-    ) -> pd.DataFrame:
+        required_columns: list = ["DateTime", "OpenValue", "CloseValue", "HighValue", "LowValue", "Volume", "ChangeRate"],
+        compact: bool = False
+    ):
         """
         加载ETF数据
         :param file_path: 完整文件路径 如"D:/data/588000_Day.csv"
+        :param compact: 为 True 时返回紧凑的 OHLCVBars（analyze_data 可直接接受）
         """
         path_obj = Path(file_path)
 
         if not path_obj.exists():
             raise FileNotFoundError(f"数据文件不存在: {path_obj}")
 
-        df = pd.read_csv(path_obj, parse_dates=['DateTime'])
+        # 解析结果经进程内缓存共享（文件修改后自动失效）
+        df = get_frame_cache().load(path_obj, "ai", _parse_ai_csv)
 
         # 验证必要列
         missing_cols = [col for col in required_columns if col not in df.columns]
         if missing_cols:
             raise ValueError(f"数据文件缺少必要列: {missing_cols}")
 
+        if compact:
+            return OHLCVBars.from_frame(df[required_columns], symbol=path_obj.parent.name)
         return df[required_columns]
 
-class DeepSeekAnalyzer:
-    def __init__(self, config: DeepSeekConfig):
-        self.config = config
-        # 优化超时设置：分层超时策略
-        self.client = httpx.Client(
-            timeout=httpx.Timeout(
-                connect=10.0,      # 连接超时：10秒
-                read=400.0,        # 读取超时：300秒
-                write=30.0,        # 写入超时：30秒
-                pool=60.0          # 连接池超时：60秒
-            ),
-            verify=False,
-            limits=httpx.Limits(
-                max_keepalive_connections=5,
-                max_connections=10
-            )
-        )
 
-    @retry(
-        stop=stop_after_attempt(2),  # 增加到3次重试
-        wait=wait_exponential(multiplier=2, min=4, max=30),  # 指数退避：4-30秒
-        reraise=True
+def _http_timeout() -> httpx.Timeout:
+    # 优化超时设置：分层超时策略
+    return httpx.Timeout(
+        connect=10.0,      # 连接超时：10秒
+        read=400.0,        # 读取超时：300秒
+        write=30.0,        # 写入超时：30秒
+        pool=60.0          # 连接池超时：60秒
     )
-    def analyze_data(self, df: pd.DataFrame, user_prompt: str) -> Dict[str, str]:
-        """
-        同步版本的数据分析方法
-        :return: 包含内容和推理内容的字典
-        """
-        try:
-            data_sample = df.tail(80)
-            data_str = data_sample.to_markdown()
-            data_summary = f"数据时间范围：{df['DateTime'].min()} 至 {df['DateTime'].max()}"
-            
-            # 仅打印最新的5条数据供调试参考
-            print(f"样本数据(仅展示最新5条)：\n{df.tail(5).to_markdown()}")
-            
-            print("------------process_response 开始--------------------")
-            print(f"开始调用DeepSeek API，超时设置：连接10s，读取300s")
 
-            response = self.client.post(
-                f"{self.config.base_url}/chat/completions",
-                headers={"Authorization": f"Bearer {self.config.api_key}"},
-                json={
-                    "messages": [
-                        {"role": "system", "content": self.config.system_prompt},
-                        {"role": "user", "content": f"{user_prompt}\n{data_summary}\n样本数据：\n{data_str}"}
-                    ],
-                    "model": self.config.model,
-                    "max_tokens": self.config.max_tokens,
-                    "temperature": self.config.temperature,
-                    "top_p": self.config.top_p,
-                    "stream": False,
-                    "response_format": {"type": "text"},
-                    "stop": ["</分析结束>"]
-                }
-            )
-            response.raise_for_status()
 
-            response_data = response.json()
-            print("API调用成功，开始处理响应...")
+class _DeepSeekBase:
+    """同步/异步分析器共用的请求组装、缓存与响应处理。"""
 
-            temp = self._process_response(response_data)
-            print("------------_process_response 完成--------------------")
-
-            return temp
+    def __init__(self, config: DeepSeekConfig):
+        self.config = config
 
-        except httpx.ConnectTimeout:
+    def _prepare(self, df, user_prompt: str, tail_rows: int = 80):
+        """返回 (请求体, 缓存键)；tail_rows 为随提示词发送的最新原始 K 线根数。"""
+        df = as_ohlcv_frame(df, datetime_column=True)  # 兼容紧凑的 OHLCVBars
+        data_sample = df.tail(tail_rows)
+        data_str = data_sample.to_markdown()
+        data_summary = f"数据时间范围：{df['DateTime'].min()} 至 {df['DateTime'].max()}"
+
+        # 仅打印最新的5条数据供调试参考
+        print(f"样本数据(仅展示最新5条)：\n{df.tail(5).to_markdown()}")
+
+        body = {
+            "messages": [
+                {"role": "system", "content": self.config.system_prompt},
+                {"role": "user", "content": f"{user_prompt}\n{data_summary}\n样本数据：\n{data_str}"}
+            ],
+            "model": self.config.model,
+            "max_tokens": self.config.max_tokens,
+            "temperature": self.config.temperature,
+            "top_p": self.config.top_p,
+            "stream": self.config.stream,
+            "response_format": {"type": "text"},
+            "stop": ["</分析结束>"]
+        }
+        # 模型、提示词、数据行与采样参数完全相同时直接复用缓存的响应
+        cache_key = request_key(
+            model=self.config.model,
+            system_prompt=self.config.system_prompt,
+            user_prompt=user_prompt,
+            data=f"{data_summary}\n{data_str}",
+            temperature=self.config.temperature,
+            top_p=self.config.top_p,
+        )
+        return body, cache_key
+
+    @staticmethod
+    def _cached(cache_key: str) -> Optional[dict]:
+        cached = get_ai_cache().get(cache_key)
+        if cached is None:
+            return None
+        print("命中AI响应缓存，跳过DeepSeek API调用")
+        return dict(cached["response"], cached=True, cached_at=cached["created_at"])
+
+    def _finish(self, response_data: dict, cache_key: str) -> dict:
+        print("API调用成功，开始处理响应...")
+        temp = self._process_response(response_data)
+        print("------------_process_response 完成--------------------")
+        return self._store(temp, cache_key)
+
+    def _store(self, temp: dict, cache_key: str) -> dict:
+        if temp["is_complete"]:
+            get_ai_cache().put(cache_key, temp, meta={"model": self.config.model})
+        return temp
+
+    @staticmethod
+    def _accumulator(extracted: dict, on_strategy: Optional[Callable] = None) -> StreamAccumulator:
+        """
+        报告是输出的最后一段，</分析报告> 出现后不再等待模型的收尾内容；
+        <策略输出> 在报告之前，段一结束就提取仓位策略写入 extracted["strategy"] 并回调 on_strategy，
+        之后连接中断也不会丢失。
+        """
+        def strategy_closed(text: str) -> None:
+            extracted["strategy"] = extract_position_strategy(text)
+            print(f"策略输出段已结束，提前提取仓位策略：{extracted['strategy']}")
+            if on_strategy is not None:
+                on_strategy(extracted["strategy"])
+
+        return StreamAccumulator(stop_markers=("</分析结束>",), section_end="</分析报告>",
+                                 section_callbacks={STRATEGY_SECTION_END: strategy_closed})
+
+    def _finish_stream(self, acc: StreamAccumulator, cache_key: str, extracted: dict) -> dict:
+        temp = acc.result()
+        temp["strategy"] = extracted.get("strategy")
+        print(f"流式读取结束：{acc.chunks}块，提前结束={acc.stopped_early}，完整={temp['is_complete']}")
+        return self._store(temp, cache_key)
+
+    @staticmethod
+    def _interrupted(acc: StreamAccumulator, exc: Exception) -> None:
+        """读取中途断开：已有内容时保留部分结果，否则按普通请求错误处理。"""
+        if not acc.content:
+            raise exc
+        print(f"流式读取中断（已接收{len(acc.content)}字）：{exc}")
+        acc.interrupt(exc)
+
+    @staticmethod
+    def _error_result(exc: Exception) -> dict:
+        if isinstance(exc, httpx.ConnectTimeout):
             print("连接超时：无法连接到DeepSeek API服务器")
             return {"content": "连接超时：无法连接到API服务器，请检查网络连接", "reasoning_content": "网络连接问题", "is_complete": False}
-        except httpx.ReadTimeout:
+        if isinstance(exc, httpx.ReadTimeout):
             print("读取超时：API响应时间过长")
             return {"content": "读取超时：API响应时间过长，建议简化请求内容", "reasoning_content": "响应超时", "is_complete": False}
-        except httpx.HTTPStatusError as e:
-            print(f"HTTP状态错误：{e.response.status_code} - {e.response.text}")
-            return {"content": f"API请求失败: {e.response.status_code} {e.response.text}", "reasoning_content": "HTTP错误", "is_complete": False}
-        except httpx.RequestError as e:
-            print(f"请求错误：{str(e)}")
-            return {"content": f"网络请求错误: {str(e)}", "reasoning_content": "网络问题", "is_complete": False}
-        except Exception as e:
-            print(f"未知错误：{str(e)}")
-            return {"content": f"分析失败: {str(e)}", "reasoning_content": "系统错误", "is_complete": False}
-        finally:
-            self.client.close()
+        if isinstance(exc, httpx.HTTPStatusError):
+            print(f"HTTP状态错误：{exc.response.status_code} - {exc.response.text}")
+            return {"content": f"API请求失败: {exc.response.status_code} {exc.response.text}", "reasoning_content": "HTTP错误", "is_complete": False}
+        if isinstance(exc, httpx.RequestError):
+            print(f"请求错误：{str(exc)}")
+            return {"content": f"网络请求错误: {str(exc)}", "reasoning_content": "网络问题", "is_complete": False}
+        print(f"未知错误：{str(exc)}")
+        return {"content": f"分析失败: {str(exc)}", "reasoning_content": "系统错误", "is_complete": False}
 
     def _process_response(self, response_data: dict) -> dict:
         """改进响应处理"""
@@ -170,10 +224,219 @@ class DeepSeekAnalyzer:
             "content": content,
             "reasoning": message.get("reasoning_content", "无详细推理"),
             "is_complete": completion_status[0],
-            "usage": response_data.get("usage", {})
+            "usage": response_data.get("usage", {}),
+            "strategy": strategy_from_content(content),
         }
 
 
+class DeepSeekAnalyzer(_DeepSeekBase):
+    def __init__(self, config: DeepSeekConfig):
+        super().__init__(config)
+        # 连接池在分析器生命周期内复用，用完调用 close()（或使用 with 语句）
+        self.client = httpx.Client(
+            timeout=_http_timeout(),
+            verify=False,
+            limits=httpx.Limits(
+                max_keepalive_connections=5,
+                max_connections=10
+            )
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self.client.close()
+
+    @retry(
+        stop=stop_after_attempt(2),  # 增加到3次重试
+        wait=wait_exponential(multiplier=2, min=4, max=30),  # 指数退避：4-30秒
+        reraise=True
+    )
+    def analyze_data(self, df: pd.DataFrame, user_prompt: str, tail_rows: int = 80,
+                     on_strategy: Optional[Callable] = None) -> Dict[str, str]:
+        """
+        同步版本的数据分析方法
+        :param tail_rows: 随提示词发送的最新原始 K 线根数
+        :param on_strategy: 流式读取时 <策略输出> 段一结束即以 (建议操作, 仓位) 回调
+        :return: 包含内容、推理内容与仓位策略(strategy)的字典
+        """
+        try:
+            body, cache_key = self._prepare(df, user_prompt, tail_rows)
+            cached = self._cached(cache_key)
+            if cached is not None:
+                return cached
+
+            print("------------process_response 开始--------------------")
+            print(f"开始调用DeepSeek API，超时设置：连接10s，读取300s")
+
+            if self.config.stream:
+                return self._stream(body, cache_key, on_strategy)
+
+            response = self.client.post(
+                f"{self.config.base_url}/chat/completions",
+                headers={"Authorization": f"Bearer {self.config.api_key}"},
+                json=body
+            )
+            response.raise_for_status()
+            return self._finish(response.json(), cache_key)
+        except Exception as e:
+            return self._error_result(e)
+
+    def _stream(self, body: dict, cache_key: str, on_strategy: Optional[Callable] = None) -> dict:
+        extracted: dict = {}
+        acc = self._accumulator(extracted, on_strategy)
+        with self.client.stream(
+            "POST",
+            f"{self.config.base_url}/chat/completions",
+            headers={"Authorization": f"Bearer {self.config.api_key}"},
+            json=body
+        ) as response:
+            if response.is_error:
+                response.read()
+            response.raise_for_status()
+            try:
+                for line in response.iter_lines():
+                    data = parse_sse_line(line)
+                    if data is None:
+                        continue
+                    if data == SSE_DONE or acc.feed_json(data):
+                        break
+            except httpx.TransportError as exc:
+                self._interrupted(acc, exc)
+        return self._finish_stream(acc, cache_key, extracted)
+
+
+class AsyncDeepSeekAnalyzer(_DeepSeekBase):
+    """
+    异步分析器：多个标的共用一个长连接的 httpx.AsyncClient，
+    max_concurrency 限制同时在途的请求数（其余请求排队等待信号量）。
+    客户端在首次请求时于当前事件循环中创建，用完调用 aclose()。
+    """
+
+    def __init__(self, config: DeepSeekConfig, max_concurrency: int = AI_MAX_CONCURRENCY):
+        super().__init__(config)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=_http_timeout(),
+                verify=False,
+                limits=httpx.Limits(
+                    max_keepalive_connections=self.max_concurrency,
+                    max_connections=self.max_concurrency
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @retry(
+        stop=stop_after_attempt(2),
+        wait=wait_exponential(multiplier=2, min=4, max=30),
+        reraise=True
+    )
+    async def analyze_data(self, df: pd.DataFrame, user_prompt: str, tail_rows: int = 80,
+                           on_strategy: Optional[Callable] = None) -> Dict[str, str]:
+        """异步版本的数据分析方法，参数与返回结构同 DeepSeekAnalyzer.analyze_data。"""
+        try:
+            body, cache_key = self._prepare(df, user_prompt, tail_rows)
+            cached = self._cached(cache_key)
+            if cached is not None:
+                return cached
+
+            client = self._ensure_client()
+            async with self._semaphore:
+                print(f"开始调用DeepSeek API（异步，并发上限{self.max_concurrency}）")
+                if self.config.stream:
+                    return await self._stream(client, body, cache_key, on_strategy)
+                response = await client.post(
+                    f"{self.config.base_url}/chat/completions",
+                    headers={"Authorization": f"Bearer {self.config.api_key}"},
+                    json=body
+                )
+            response.raise_for_status()
+            return self._finish(response.json(), cache_key)
+        except Exception as e:
+            return self._error_result(e)
+
+    async def _stream(self, client: httpx.AsyncClient, body: dict, cache_key: str,
+                      on_strategy: Optional[Callable] = None) -> dict:
+        extracted: dict = {}
+        acc = self._accumulator(extracted, on_strategy)
+        async with client.stream(
+            "POST",
+            f"{self.config.base_url}/chat/completions",
+            headers={"Authorization": f"Bearer {self.config.api_key}"},
+            json=body
+        ) as response:
+            if response.is_error:
+                await response.aread()
+            response.raise_for_status()
+            try:
+                async for line in response.aiter_lines():
+                    data = parse_sse_line(line)
+                    if data is None:
+                        continue
+                    if data == SSE_DONE or acc.feed_json(data):
+                        break
+            except httpx.TransportError as exc:
+                self._interrupted(acc, exc)
+        return self._finish_stream(acc, cache_key, extracted)
+
+
+class AsyncAnalysisRunner:
+    """
+    在后台线程的事件循环上并发执行多个标的的 AI 分析。
+    同步代码（如 run.py 的任务图）通过 submit 提交协程，拿到 concurrent.futures.Future；
+    所有请求共用一个 AsyncDeepSeekAnalyzer（同一个连接池与并发上限）。
+    """
+
+    def __init__(self, config: Optional[DeepSeekConfig] = None, max_concurrency: int = AI_MAX_CONCURRENCY):
+        self.analyzer = AsyncDeepSeekAnalyzer(config or analysis_config(), max_concurrency=max_concurrency)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="ai-async", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro_factory) -> Future:
+        """coro_factory(analyzer) 返回协程；立即返回其结果的 Future。"""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro_factory(self.analyzer), loop)
+
+    def analyze(self, code: str) -> Future:
+        """提交 aiDeepSeekAnly 的异步版本，Future 结果为分析报告文本。"""
+        return self.submit(lambda analyzer: aiDeepSeekAnlyAsync(code, analyzer))
+
+    def close(self) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.analyzer.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
 # 使用示例
 def extract_analysis_report(content: str) -> str:
     """
@@ -206,6 +469,14 @@ def extract_analysis_report(content: str) -> str:
         return content[start_pos:].strip()
 
 
+def strategy_from_content(content: str):
+    """<策略输出> 段已完整时从中提取 (建议操作, 仓位)，否则返回 None。"""
+    idx = (content or "").find(STRATEGY_SECTION_END)
+    if idx == -1:
+        return None
+    return extract_position_strategy(content[:idx])
+
+
 def extract_position_strategy(ai_response):
     """从AI响应中提取建议操作和仓位"""
     import re
@@ -220,14 +491,20 @@ def extract_position_strategy(ai_response):
     
     return action, position
 
-def aiDeepSeekAnly(code):
-    # 1. 配置参数
-    config = DeepSeekConfig(
+def analysis_config() -> DeepSeekConfig:
+    """aiDeepSeekAnly 使用的模型配置（同步与异步分析器共用）。"""
+    return DeepSeekConfig(
         api_key=os.getenv("DEEPSEEK_API_KEY") or "",
         system_prompt="你是一位严谨的ETF量化分析师和交易员,根据用户提供的行情数据给出核心分析和2~5天的建议,默认成功率大于66%，言辞犀利，语言精简"
     )
 
-    # 2. 加载数据
+
+def build_analysis_request(code, mode: Optional[str] = None):
+    """
+    加载日线数据并组装分析提示词，返回 (df, user_prompt, tail_rows)；数据加载失败返回 None。
+    :param mode: "compact"（本地预计算特征，见 ai_features）或 "full"（原始 80 行表格），默认 AI_PROMPT_MODE
+    """
+    # 加载数据
     loader = ETFDataLoader()
     # 使用相对路径，基于脚本所在目录
     script_dir = Path(__file__).parent
@@ -238,15 +515,21 @@ def aiDeepSeekAnly(code):
         print(f"数据加载成功，共{len(df)}条记录")
     except FileNotFoundError:
         print(f"错误：找不到数据文件 {dataPath}")
-        return ""
+        return None
     except Exception as e:
         print(f"数据加载失败：{str(e)}")
-        return ""
+        return None
 
-    # 3. 创建分析器
-    analyzer = DeepSeekAnalyzer(config)
+    user_prompt, tail_rows = build_user_prompt(df, mode)
+    return df, user_prompt, tail_rows
+
+
+def build_user_prompt(df, mode: Optional[str] = None):
+    """返回 (user_prompt, tail_rows)，mode 含义同 build_analysis_request。"""
+    if (mode or AI_PROMPT_MODE) == "compact":
+        from ai_features import build_compact_prompt
+        return build_compact_prompt(df, AI_COMPACT_TAIL_ROWS), AI_COMPACT_TAIL_ROWS
 
-    # 4. 执行分析
     data_summary = f"数据时间范围：{df['DateTime'].min()} 至 {df['DateTime'].max()}"
 
     user_prompt = f"""
@@ -341,38 +624,83 @@ def aiDeepSeekAnly(code):
             风控提示：XXX
         </分析报告>   
     """
+    return user_prompt, 80
+
+
+def finish_analysis(code, result, elapsed_time) -> str:
+    """把 analyze_data 的返回整理为邮件中使用的分析报告；不完整的结果返回空串。"""
+    if not result['is_complete']:
+        if result.get("partial"):
+            # 流式读取中途断线：保留已收到的报告内容（末尾带中断提示）
+            print(f"{code}连接中断，使用已接收的部分分析结果")
+            return extract_analysis_report(result["content"]) or result["content"]
+        print(f"{code}分析结果不完整: {result.get('reasoning_content', '未知')}")
+        return ""
+
+    print(f"DeepSeek API调用成功！")
+    print(f"⏱总耗时：{elapsed_time:.2f}秒")
+
+    if 'usage' in result and result['usage']:
+        print(f"Token消耗：输入{result['usage'].get('prompt_tokens', 'N/A')}，输出{result['usage'].get('completion_tokens', 'N/A')}")
+
+    analysis_report = extract_analysis_report(result["content"]) or result["content"]
+    if analysis_report:
+        print(f"{code}分析完成")
+
+    if result.get("cached") and analysis_report:
+        # 邮件中标注为缓存结果，避免误以为是本次实时生成
+        analysis_report = f"{cached_label(result.get('cached_at'))}\n{analysis_report}"
+    return analysis_report
+
+
+def _analysis_output(report: str, strategy, with_strategy: bool):
+    # 缓存命中时 strategy 经 JSON 往返为 list，统一为 (建议操作, 仓位)
+    if not with_strategy:
+        return report
+    return report, tuple(strategy) if strategy else None
+
+
+def aiDeepSeekAnly(code, with_strategy: bool = False):
+    """
+    返回分析报告文本；with_strategy=True 时返回 (报告, 仓位策略)，
+    仓位策略在 <策略输出> 段结束时即已提取，报告段中途断线也不受影响，未取得时为 None。
+    """
+    request = build_analysis_request(code)
+    if request is None:
+        return _analysis_output("", None, with_strategy)
+    df, user_prompt, tail_rows = request
 
     import time
     start_time = time.time()
     
     try:
-        result = analyzer.analyze_data(df, user_prompt)
-        
-        if result['is_complete']:
-            end_time = time.time()
-            elapsed_time = end_time - start_time
-            
-            print(f"DeepSeek API调用成功！")
-            print(f"⏱总耗时：{elapsed_time:.2f}秒")
-            
-            if 'usage' in result and result['usage']:
-                print(f"Token消耗：输入{result['usage'].get('prompt_tokens', 'N/A')}，输出{result['usage'].get('completion_tokens', 'N/A')}")
-            
-            analysis_report = extract_analysis_report(result["content"])
-            
-            if analysis_report:
-                print(f"{code}分析完成")
-                return analysis_report
-            else:
-                return result["content"]
-        else:
-            print(f"{code}分析结果不完整: {result.get('reasoning_content', '未知')}")
-            return ""
-            
+        with DeepSeekAnalyzer(analysis_config()) as analyzer:
+            result = analyzer.analyze_data(df, user_prompt, tail_rows)
+        report = finish_analysis(code, result, time.time() - start_time)
+        return _analysis_output(report, result.get("strategy"), with_strategy)
     except Exception as e:
         print(f"{code}分析过程中发生异常：{str(e)}")
-        return ""
+        return _analysis_output("", None, with_strategy)
+
 
+async def aiDeepSeekAnlyAsync(code, analyzer: "AsyncDeepSeekAnalyzer", with_strategy: bool = False):
+    """aiDeepSeekAnly 的异步版本：多个标的共用同一个 AsyncDeepSeekAnalyzer 并发请求。"""
+    import time
+
+    # 读取 CSV 与组装提示词放到线程中，不阻塞事件循环上的其他请求
+    request = await asyncio.to_thread(build_analysis_request, code)
+    if request is None:
+        return _analysis_output("", None, with_strategy)
+    df, user_prompt, tail_rows = request
+
+    start_time = time.time()
+    try:
+        result = await analyzer.analyze_data(df, user_prompt, tail_rows)
+        report = finish_analysis(code, result, time.time() - start_time)
+        return _analysis_output(report, result.get("strategy"), with_strategy)
+    except Exception as e:
+        print(f"{code}分析过程中发生异常：{str(e)}")
+        return _analysis_output("", None, with_strategy)
 
 if __name__ == "__main__":
     if len(sys.argv) > 1:
@@ -0,0 +1,121 @@
+"""
+AI 提示词对比：full（80 行 markdown 表格，模型自行计算指标）vs compact（本地预计算特征摘要）。
+
+报告每种模式：
+  - 实际发送的 user 消息字符数与估算 token 数（中文按 1 字≈0.6 token，其余按 4 字符≈1 token）
+  - 本地组装提示词耗时（compact 含指标与缠论结构计算）
+  - --live 时实际调用接口（关闭 AI 缓存），记录端到端耗时与接口返回的 prompt/completion tokens
+
+用法:
+  python experiments/bench_ai_prompt.py [--code 159843 | --csv path/to/xxx_Day.csv] [--rows 1200] [--live]
+未指定数据时使用合成随机游走日线。
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_CJK = re.compile(r"[　-〿一-鿿＀-￯]")
+
+
+def estimate_tokens(text):
+    cjk = len(_CJK.findall(text))
+    return int(cjk * 0.6 + (len(text) - cjk) / 4)
+
+
+def synthetic_frame(rows, seed=7):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2020-01-02", periods=rows)
+    close = np.round(1.2 * np.exp(np.cumsum(rng.normal(0, 0.012, rows))), 3)
+    open_ = np.round(close * (1 + rng.normal(0, 0.004, rows)), 3)
+    high = np.round(np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.005, rows))), 3)
+    low = np.round(np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.005, rows))), 3)
+    volume = rng.integers(1_000_000, 80_000_000, rows)
+    change = np.round(np.r_[0.0, np.diff(close) / close[:-1] * 100], 2)
+    return pd.DataFrame({"DateTime": dates, "OpenValue": open_, "CloseValue": close, "HighValue": high,
+                         "LowValue": low, "Volume": volume, "ChangeRate": change})
+
+
+def load_frame(args):
+    from deepSeekAi import ETFDataLoader
+
+    if args.csv:
+        return ETFDataLoader().load_etf_data(file_path=args.csv)
+    if args.code:
+        path = os.path.join(ROOT, "stock_data", args.code, f"{args.code}_Day.csv")
+        return ETFDataLoader().load_etf_data(file_path=path)
+    return synthetic_frame(args.rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--code")
+    parser.add_argument("--csv")
+    parser.add_argument("--rows", type=int, default=1200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="实际调用 DeepSeek 接口（需 DEEPSEEK_API_KEY）")
+    args = parser.parse_args()
+
+    import contextlib
+    import io
+
+    import ai_cache
+    from deepSeekAi import DeepSeekAnalyzer, analysis_config, build_user_prompt, finish_analysis
+
+    if args.live:
+        # 对比真实耗时，不使用缓存结果
+        ai_cache._shared_cache = ai_cache.AIResponseCache(ttl=0)
+
+    df = load_frame(args)
+    config = analysis_config()
+    print(f"数据: {len(df)} 根日线 ({df['DateTime'].min()} ~ {df['DateTime'].max()})")
+
+    rows = []
+    for mode in ("full", "compact"):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            user_prompt, tail_rows = build_user_prompt(df, mode)
+        build_ms = (time.perf_counter() - started) / args.repeat * 1000
+
+        with contextlib.redirect_stdout(io.StringIO()), DeepSeekAnalyzer(config) as analyzer:
+            body, _ = analyzer._prepare(df, user_prompt, tail_rows)
+        message = body["messages"][1]["content"]
+        row = {"mode": mode, "chars": len(message), "tokens": estimate_tokens(message), "build_ms": build_ms}
+
+        if args.live:
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                with DeepSeekAnalyzer(config) as analyzer:
+                    result = analyzer.analyze_data(df, user_prompt, tail_rows)
+                report = finish_analysis(mode, result, 0)
+            row["live_s"] = time.perf_counter() - started
+            row["usage"] = result.get("usage") or {}
+            row["complete"] = result.get("is_complete")
+            row["report_chars"] = len(report)
+        rows.append(row)
+
+    print(f"{'模式':<8}{'字符':>8}{'估算token':>10}{'组装ms':>9}")
+    for row in rows:
+        print(f"{row['mode']:<8}{row['chars']:>8}{row['tokens']:>10}{row['build_ms']:>9.1f}")
+    full, compact = rows
+    print(f"compact / full: 字符 {compact['chars'] / full['chars']:.1%}，估算token {compact['tokens'] / full['tokens']:.1%}")
+
+    if args.live:
+        print("\n实际调用:")
+        for row in rows:
+            usage = row["usage"]
+            print(f"  {row['mode']:<8} 耗时 {row['live_s']:.1f}s  prompt_tokens={usage.get('prompt_tokens', '-')} "
+                  f"completion_tokens={usage.get('completion_tokens', '-')}  完整={row['complete']}  "
+                  f"报告{row['report_chars']}字")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+紧凑 OHLCV 表示的内存对比（多标的参数寻优场景）。
+
+before: 每个任务携带 float64 DataFrame（旧写法，数据随每个任务序列化进工作进程）
+after : 进程池 initializer 只传一次紧凑 OHLCVBars，任务中数据位置为 None
+
+每种模式在独立子进程中运行，报告：
+  - 单标的内存占用（DataFrame vs OHLCVBars）
+  - 每个任务的序列化字节数
+  - 父进程 / 工作进程峰值 RSS（ru_maxrss）
+  - 两种模式的寻优结果是否完全一致
+
+用法: python experiments/bench_bars_memory.py [--symbols 4] [--rows 2500] [--combos 12] [--procs 2]
+"""
+
+import argparse
+import json
+import os
+import pickle
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _make_symbol_csv(path, rows, seed):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2012-01-04", periods=rows)
+    close = np.round(np.maximum(0.3, 1.5 + np.cumsum(rng.normal(0, 0.01, rows))), 3)
+    open_ = np.round(close * (1 + rng.normal(0, 0.003, rows)), 3)
+    high = np.round(np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, rows))), 3)
+    low = np.round(np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, rows))), 3)
+    volume = rng.integers(1_000_000, 80_000_000, rows)
+    pd.DataFrame({
+        "DateTime": dates.strftime("%Y-%m-%d"), "OpenValue": open_, "CloseValue": close,
+        "HighValue": high, "LowValue": low, "Volume": volume,
+        "ChangeRate": np.round(rng.uniform(0.1, 5, rows), 2),
+    }).to_csv(path, index=False)
+
+
+def _param_grid(count):
+    grid = []
+    for i in range(count):
+        grid.append({
+            "short_window": 3 + i % 5, "long_window": 12 + i % 7, "volume_mavg_Value": 10,
+            "MaRateUp": 1.2 + 0.1 * (i % 3), "VolumeSellRate": 4.0, "rsi_period": 13,
+            "rsiValueThd": 30, "rsiRateUp": 1.5, "divergence_threshold": 0.06,
+        })
+    return grid
+
+
+def run_mode(mode, files, combos, procs):
+    import multiprocessing
+    import sdd
+
+    results = {}
+    task_bytes = 0
+    for path in files:
+        symbol = os.path.basename(path).split("_")[0]
+        windows = [("2016-01-01", "2021-12-31")]
+        if mode == "before":
+            data = sdd.load_etf_data(path)
+            tasks = [(p, data, symbol, windows) for p in _param_grid(combos)]
+            pool_kwargs = {}
+        else:
+            bars = sdd.load_etf_data(path, compact=True)
+            tasks = [(p, None, symbol, windows) for p in _param_grid(combos)]
+            pool_kwargs = {"initializer": sdd._init_worker_data, "initargs": (bars,)}
+        task_bytes = len(pickle.dumps(tasks[0]))
+        with multiprocessing.Pool(processes=procs, **pool_kwargs) as pool:
+            out = pool.map(sdd._find_params_worker, tasks)
+        results[symbol] = [None if r is None else [r["total_return"], r["sharpe_ratio"], r["max_drawdown"]] for r in out]
+
+    return {
+        "task_bytes": task_bytes,
+        "parent_maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "children_maxrss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=2500)
+    parser.add_argument("--combos", type=int, default=12)
+    parser.add_argument("--procs", type=int, default=2)
+    parser.add_argument("--mode", choices=["before", "after"])
+    parser.add_argument("--files", nargs="*")
+    args = parser.parse_args()
+
+    if args.mode:
+        payload = run_mode(args.mode, args.files, args.combos, args.procs)
+        print("BENCH_JSON=" + json.dumps(payload))
+        return
+
+    tmp = tempfile.mkdtemp(prefix="bars_bench_")
+    files = []
+    for i in range(args.symbols):
+        path = os.path.join(tmp, f"{510000 + i}_Day.csv")
+        _make_symbol_csv(path, args.rows, seed=i)
+        files.append(path)
+
+    import sdd
+    frame = sdd.load_etf_data(files[0])
+    bars = sdd.load_etf_data(files[0], compact=True)
+    print(f"单标的 {args.rows} 行: DataFrame {frame.memory_usage(deep=True).sum() / 1024:.1f} KB, "
+          f"OHLCVBars {bars.nbytes / 1024:.1f} KB  dtypes={bars.dtypes}")
+    print(f"还原一致: {bars.to_frame().equals(frame[bars.to_frame().columns])}")
+
+    reports = {}
+    for mode in ("before", "after"):
+        started = time.perf_counter()
+        cmd = [sys.executable, os.path.abspath(__file__), "--mode", mode, "--combos", str(args.combos),
+               "--procs", str(args.procs), "--files", *files]
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        line = [l for l in out.splitlines() if l.startswith("BENCH_JSON=")][-1]
+        reports[mode] = json.loads(line[len("BENCH_JSON="):])
+        reports[mode]["seconds"] = time.perf_counter() - started
+
+    print(f"\n{'mode':<8}{'task bytes':>12}{'parent RSS MB':>15}{'worker RSS MB':>15}{'seconds':>10}")
+    for mode, rep in reports.items():
+        print(f"{mode:<8}{rep['task_bytes']:>12}{rep['parent_maxrss_kb'] / 1024:>15.1f}"
+              f"{rep['children_maxrss_kb'] / 1024:>15.1f}{rep['seconds']:>10.1f}")
+    same = reports["before"]["results"] == reports["after"]["results"]
+    print(f"\n寻优结果一致: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+缠论结构计算对比：chan_engine.analyze（数组、单次遍历）vs experiments/K-topDown.py::process_klines
+（逐行 iloc 读取、loc 追加 DataFrame）。
+
+报告两者耗时、合并后 K 线数与顶/底分型数。两者规则并不完全一致：process_klines 的包含判断
+只要高点或低点一侧被包含即合并，chan_engine 使用标准的双向包含；因此计数会有差异，
+这里只比较耗时量级。旧实现在大数据量上极慢，默认只取前 --legacy-rows 根。
+
+用法:
+  python experiments/bench_chan_engine.py [--rows 20000] [--repeat 5] [--legacy-rows 3000] [--skip-legacy]
+  python experiments/bench_chan_engine.py --code 159843    # 使用 stock_data 中的日线
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_ai_prompt import synthetic_frame  # noqa: E402
+
+
+def load_legacy():
+    # 文件名含连字符，不能直接 import
+    path = os.path.join(ROOT, "experiments", "K-topDown.py")
+    spec = importlib.util.spec_from_file_location("k_topdown", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.process_klines
+
+
+def load_frame(args):
+    if args.code:
+        from deepSeekAi import ETFDataLoader
+
+        path = os.path.join(ROOT, "stock_data", args.code, f"{args.code}_Day.csv")
+        return ETFDataLoader().load_etf_data(file_path=path)
+    return synthetic_frame(args.rows)
+
+
+def timed(func, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--code")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--legacy-rows", type=int, default=3000, help="旧实现只处理前 N 根（0 表示全部）")
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    import chan_engine
+
+    df = load_frame(args)
+    print(f"数据: {len(df)} 根 K 线")
+
+    rows = []
+    seconds, result = timed(lambda: chan_engine.analyze_frame(df), args.repeat)
+    tops = int((result.fractal_type == chan_engine.TOP).sum())
+    rows.append(("chan_engine", len(df), seconds, result.merged_bars, tops, len(result.fractal_type) - tops))
+    print(f"  笔 {len(result.strokes)} 条，中枢 {len(result.pivots)} 个")
+
+    if not args.skip_legacy:
+        process_klines = load_legacy()
+        legacy_df = df.iloc[:args.legacy_rows] if args.legacy_rows else df
+        seconds, (merged, legacy_tops, legacy_bottoms) = timed(lambda: process_klines(legacy_df), 1)
+        rows.append(("process_klines", len(legacy_df), seconds, len(merged), len(legacy_tops), len(legacy_bottoms)))
+        # 同样规模下的新实现，便于直接对比
+        subset = legacy_df.reset_index(drop=True)
+        seconds, result = timed(lambda: chan_engine.analyze_frame(subset), args.repeat)
+        tops = int((result.fractal_type == chan_engine.TOP).sum())
+        rows.append(("chan_engine", len(subset), seconds, result.merged_bars, tops, len(result.fractal_type) - tops))
+
+    print(f"{'实现':<16}{'K线':>8}{'耗时ms':>12}{'每千根ms':>10}{'合并后':>8}{'顶':>6}{'底':>6}")
+    for name, n, seconds, merged, tops, bottoms in rows:
+        print(f"{name:<16}{n:>8}{seconds * 1000:>12.1f}{seconds * 1000 / n * 1000:>10.2f}{merged:>8}{tops:>6}{bottoms:>6}")
+    if len(rows) == 3:
+        print(f"同规模加速: {rows[1][2] / rows[2][2]:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
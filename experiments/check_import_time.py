@@ -0,0 +1,86 @@
+"""
+冷启动导入预算检查（基于 python -X importtime）。
+
+检查项：
+  list-codes : python run.py --list-codes       不应导入 pandas/numpy/matplotlib/akshare
+  signal     : run.py signal 计算前的导入链       不应导入 matplotlib/akshare/yfinance/httpx/pydantic
+每项同时检查导入总耗时（各顶层模块 cumulative 之和，微秒）不超过预算。
+超出预算或导入了禁止的模块时以退出码 1 结束，可直接用于 CI。
+
+用法: python experiments/check_import_time.py [--list-codes-ms 150] [--signal-ms 1500] [--top 10]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECKS = {
+    "list-codes": {
+        "argv": [os.path.join(ROOT, "run.py"), "--list-codes"],
+        "forbidden": ["pandas", "numpy", "matplotlib", "akshare"],
+    },
+    "signal": {
+        # run.py signal 在真正计算前只会导入 run 与 autoProcess
+        "argv": ["-c", "import run, autoProcess"],
+        "forbidden": ["matplotlib", "akshare", "yfinance", "httpx", "pydantic", "deepSeekAi"],
+    },
+}
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 [(模块名, 自身微秒, 累计微秒, 层级)]。"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # 模块名前有一个空格，之后每一层嵌套缩进两个空格
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), level))
+    return rows
+
+
+def run_check(name, check, budget_ms, top):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    cmd = [sys.executable, "-X", "importtime", *check["argv"]]
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, env=env)
+    rows = parse_importtime(proc.stderr)
+    modules = {r[0] for r in rows}
+    top_level = [r for r in rows if r[3] == 0]
+    total_ms = sum(r[2] for r in top_level) / 1000
+
+    problems = []
+    if proc.returncode != 0:
+        problems.append(f"进程退出码 {proc.returncode}: {proc.stderr.strip().splitlines()[-1:]}")
+    leaked = [m for m in check["forbidden"] if m in modules]
+    if leaked:
+        problems.append(f"导入了应延迟的模块: {', '.join(leaked)}")
+    if total_ms > budget_ms:
+        problems.append(f"导入耗时 {total_ms:.0f} ms 超出预算 {budget_ms} ms")
+
+    print(f"[{name}] 导入耗时 {total_ms:.0f} ms (预算 {budget_ms} ms)，共 {len(modules)} 个模块")
+    for mod, _, cumulative, _ in sorted(top_level, key=lambda r: r[2], reverse=True)[:top]:
+        print(f"    {cumulative / 1000:8.1f} ms  {mod}")
+    for problem in problems:
+        print(f"  FAIL: {problem}")
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--list-codes-ms", type=float, default=150)
+    parser.add_argument("--signal-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    budgets = {"list-codes": args.list_codes_ms, "signal": args.signal_ms}
+    ok = all([run_check(name, check, budgets[name], args.top) for name, check in CHECKS.items()])
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+进程内 CSV 数据帧缓存（按 路径 + mtime + 文件大小 失效）。
+
+一次 run.py all 中，同一个 {symbol}_Day.csv 会被 get_trading_signal、strategyFunc
+以及 deepSeekAi.ETFDataLoader 反复解析。这里提供一个共享的 LRU 缓存：
+- 键为 (解析后的绝对路径, 加载方式)，条目记录文件的 st_mtime_ns 与 st_size，
+  文件被重写（抓取/回补）后自动失效重新解析；
+- 命中时返回深拷贝：requirements 允许 pandas 2.x，其默认未开启 Copy-on-Write，
+  浅拷贝会让调用方的原地修改写坏缓存；拷贝仍远快于重新解析 CSV；
+- 统计命中/未命中/失效/淘汰次数，供运行摘要输出。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from config import FRAME_CACHE_MAX_ENTRIES
+
+
+class FrameCache:
+    """按文件状态失效的 LRU DataFrame 缓存（线程安全）。"""
+
+    def __init__(self, max_entries: int = FRAME_CACHE_MAX_ENTRIES):
+        self.max_entries = max(0, int(max_entries))
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def load(self, path, kind: str, parser: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+        """
+        返回 parser(path) 的结果，文件未变化时直接取缓存。
+        :param kind: 加载方式标识（不同解析逻辑的结果分别缓存）
+        """
+        real_path = os.path.realpath(path)
+        st = os.stat(real_path)  # 文件不存在时抛出 FileNotFoundError，与直接读取一致
+        key = (real_path, kind)
+        signature = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                cached = entry[1]
+            else:
+                cached = None
+                if entry is not None:
+                    self._stats["invalidations"] += 1
+                self._stats["misses"] += 1
+        if cached is not None:
+            # 缓存中的帧只读，拷贝放在锁外
+            return cached.copy(deep=True)
+
+        frame = parser(real_path)
+        if self.max_entries == 0:
+            return frame
+
+        with self._lock:
+            self._entries[key] = (signature, frame)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return frame.copy(deep=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        return stats
+
+
+_shared_cache: Optional[FrameCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_frame_cache() -> FrameCache:
+    """返回进程内共享的数据帧缓存。"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = FrameCache()
+    return _shared_cache
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+HTTP 录制/回放层与本地桩服务器（离线计时、回归测试用）。
+
+工作方式（由 config.HTTP_MODE 控制，入口处调用 install()）：
+  live    不做任何处理，直连真实接口。
+  record  直连真实接口，同时把每个响应录制为 fixture 文件（HTTP_FIXTURE_DIR/<host>/<key>.json）。
+  replay  所有请求改发到本地桩服务器 HTTP_STUB_URL，桩服务器按录制内容回放，
+          并可配置延迟、错误率与限流，用于确定性地对比抓取并发/回退策略的耗时。
+
+覆盖范围：
+  - requests（新浪接口、akshare 东方财富接口、报告 AI 摘要）：patch requests.Session.send
+  - httpx（DeepSeekAnalyzer）：patch httpx.HTTPTransport / AsyncHTTPTransport
+  - yfinance 新版本使用 curl_cffi 会话，不经过以上两层，暂不覆盖。
+
+桩服务器启动示例：
+  python http_replay.py serve --port 18080 --latency 0.2 --jitter 0.05 --error-rate 0.05 --rps 5
+  HTTP_MODE=replay python run.py report --no-mail
+统计接口：GET http://127.0.0.1:18080/__stats__
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import HTTP_MODE, HTTP_FIXTURE_DIR, HTTP_STUB_URL, HTTP_REPLAY_IGNORE_PARAMS
+
+# 录制时去掉的响应头：body 已解压、长度由回放方重新计算
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+_KEY_HEADER = "X-Replay-Key"
+_URL_HEADER = "X-Replay-Url"
+
+_installed_mode: Optional[str] = None
+
+
+# ============================================================
+# 录制键与 fixture 读写
+# ============================================================
+def canonical_url(url: str) -> str:
+    """去掉易变参数并对查询参数排序，得到稳定的 URL。"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k not in HTTP_REPLAY_IGNORE_PARAMS]
+    query.sort()
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+def request_key(method: str, url: str, body: Optional[bytes]) -> str:
+    """根据 方法 + 规范化 URL + 请求体 计算录制键。"""
+    digest = hashlib.sha1()
+    digest.update(method.upper().encode("utf-8"))
+    digest.update(b"\n")
+    digest.update(canonical_url(url).encode("utf-8"))
+    digest.update(b"\n")
+    if body:
+        digest.update(body if isinstance(body, bytes) else str(body).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def fixture_path(url: str, key: str, fixture_dir: Optional[Path] = None) -> Path:
+    host = urlsplit(url).netloc.lower().replace(":", "_") or "unknown"
+    return Path(fixture_dir or HTTP_FIXTURE_DIR) / host / f"{key}.json"
+
+
+def save_fixture(method: str, url: str, key: str, status: int, headers: Dict[str, str],
+                 body: bytes, elapsed: float) -> Path:
+    path = fixture_path(url, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "request": {"method": method.upper(), "url": canonical_url(url)},
+        "status": int(status),
+        "headers": {k: v for k, v in headers.items() if k.lower() not in _DROP_HEADERS},
+        "body_b64": base64.b64encode(body or b"").decode("ascii"),
+        "elapsed": round(float(elapsed), 4),
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=1), encoding="utf-8")
+    return path
+
+
+def _find_fixture(key: str, fixture_dir: Path) -> Optional[Dict[str, Any]]:
+    for path in fixture_dir.glob(f"*/{key}.json"):
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            return None
+    return None
+
+
+def _stub_target(key: str) -> str:
+    return f"{HTTP_STUB_URL.rstrip('/')}/fixtures/{key}"
+
+
+def _is_stub_url(url: str) -> bool:
+    """发往桩服务器自身的请求（如 /__stats__）不做改写。"""
+    return urlsplit(url).netloc == urlsplit(HTTP_STUB_URL).netloc
+
+
+# ============================================================
+# requests 适配
+# ============================================================
+def _install_requests(mode: str) -> None:
+    import requests
+
+    original_send = requests.Session.send
+
+    def send(self, request, **kwargs):
+        if _is_stub_url(request.url):
+            return original_send(self, request, **kwargs)
+        key = request_key(request.method, request.url, request.body)
+        if mode == "replay":
+            replay_request = request.copy()
+            replay_request.headers[_KEY_HEADER] = key
+            replay_request.headers[_URL_HEADER] = request.url
+            replay_request.url = _stub_target(key)
+            kwargs["proxies"] = {"http": None, "https": None}
+            return original_send(self, replay_request, **kwargs)
+
+        start = time.perf_counter()
+        response = original_send(self, request, **kwargs)
+        try:
+            save_fixture(request.method, request.url, key, response.status_code,
+                         dict(response.headers), response.content, time.perf_counter() - start)
+        except Exception as e:
+            print(f"[HTTP录制] 保存失败 {request.url}: {e}")
+        return response
+
+    requests.Session.send = send
+
+
+# ============================================================
+# httpx 适配（同步 + 异步）
+# ============================================================
+def _install_httpx(mode: str) -> None:
+    try:
+        import httpx
+    except ImportError:
+        return
+
+    def _rewrite(request) -> str:
+        key = request_key(request.method, str(request.url), request.content)
+        if mode == "replay":
+            request.headers[_KEY_HEADER] = key
+            request.headers[_URL_HEADER] = str(request.url)
+            request.url = httpx.URL(_stub_target(key))
+            request.headers["Host"] = request.url.netloc.decode("ascii")
+        return key
+
+    def _recorded(request, key, response, body, start):
+        try:
+            save_fixture(request.method, str(request.url), key, response.status_code,
+                         dict(response.headers), body, time.perf_counter() - start)
+        except Exception as e:
+            print(f"[HTTP录制] 保存失败 {request.url}: {e}")
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _DROP_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=body,
+                              request=request, extensions=response.extensions)
+
+    original_sync = httpx.HTTPTransport.handle_request
+    original_async = httpx.AsyncHTTPTransport.handle_async_request
+
+    def handle_request(self, request):
+        if _is_stub_url(str(request.url)):
+            return original_sync(self, request)
+        original_url = str(request.url)
+        key = _rewrite(request)
+        if mode == "replay":
+            return original_sync(self, request)
+        start = time.perf_counter()
+        response = original_sync(self, request)
+        body = response.read()
+        request.url = httpx.URL(original_url)
+        return _recorded(request, key, response, body, start)
+
+    async def handle_async_request(self, request):
+        if _is_stub_url(str(request.url)):
+            return await original_async(self, request)
+        original_url = str(request.url)
+        key = _rewrite(request)
+        if mode == "replay":
+            return await original_async(self, request)
+        start = time.perf_counter()
+        response = await original_async(self, request)
+        body = await response.aread()
+        request.url = httpx.URL(original_url)
+        return _recorded(request, key, response, body, start)
+
+    httpx.HTTPTransport.handle_request = handle_request
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+
+
+def install(mode: Optional[str] = None) -> str:
+    """
+    按 config.HTTP_MODE（或传入的 mode）安装录制/回放层，重复调用无副作用。
+    返回实际生效的模式。
+    """
+    global _installed_mode
+    mode = (mode or HTTP_MODE or "live").lower()
+    if mode not in ("live", "record", "replay"):
+        print(f"[HTTP录制] 未知 HTTP_MODE={mode}，按 live 处理")
+        mode = "live"
+    if _installed_mode is not None or mode == "live":
+        return _installed_mode or mode
+
+    _install_requests(mode)
+    _install_httpx(mode)
+    _installed_mode = mode
+    target = HTTP_STUB_URL if mode == "replay" else HTTP_FIXTURE_DIR
+    print(f"[HTTP录制] 已启用 {mode} 模式 -> {target}")
+    return mode
+
+
+# ============================================================
+# 本地桩服务器
+# ============================================================
+class StubBehavior:
+    """桩服务器行为：延迟、错误率与限流（令牌桶），支持固定随机种子。"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, use_recorded_latency: bool = False,
+                 error_rate: float = 0.0, error_status: int = 502, rps: float = 0.0,
+                 burst: int = 1, throttle_mode: str = "reject", seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.use_recorded_latency = use_recorded_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rps = rps
+        self.burst = max(1, burst)
+        self.throttle_mode = throttle_mode
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self.stats = {"requests": 0, "served": 0, "missing": 0, "errors": 0, "throttled": 0,
+                      "by_host": {}}
+
+    def _take_token(self) -> float:
+        """取一个令牌；返回需要等待的秒数（0 表示可立即处理）。"""
+        if self.rps <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rps)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            wait = (1 - self._tokens) / self.rps
+            if self.throttle_mode == "delay":
+                self._tokens -= 1
+            return wait
+
+    def decide(self, fixture: Optional[Dict[str, Any]], original_url: str) -> Tuple[str, float]:
+        """返回 (动作, 延迟秒数)，动作为 serve / missing / error / throttled。"""
+        with self._lock:
+            self.stats["requests"] += 1
+            host = urlsplit(original_url).netloc or "unknown"
+            self.stats["by_host"][host] = self.stats["by_host"].get(host, 0) + 1
+            roll = self._rng.random()
+            jitter = self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+
+        wait = self._take_token()
+        if wait > 0 and self.throttle_mode == "reject":
+            self._count("throttled")
+            return "throttled", 0.0
+
+        delay = max(0.0, self.latency + jitter) + wait
+        if self.use_recorded_latency and fixture:
+            delay += float(fixture.get("elapsed", 0.0))
+        if fixture is None:
+            self._count("missing")
+            return "missing", delay
+        if roll < self.error_rate:
+            self._count("errors")
+            return "error", delay
+        self._count("served")
+        return "serve", delay
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+
+def make_handler(behavior: StubBehavior, fixture_dir: Path):
+    class ReplayHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):  # 安静模式，统计见 /__stats__
+            return
+
+        def _send(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+            self.send_response(status)
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _handle(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+
+            if self.path.startswith("/__stats__"):
+                body = json.dumps(behavior.stats, ensure_ascii=False).encode("utf-8")
+                return self._send(200, body, {"Content-Type": "application/json"})
+
+            key = self.path.rsplit("/", 1)[-1].split("?", 1)[0]
+            original_url = self.headers.get(_URL_HEADER, "")
+            fixture = _find_fixture(key, fixture_dir)
+            action, delay = behavior.decide(fixture, original_url)
+            if delay > 0:
+                time.sleep(delay)
+
+            if action == "throttled":
+                return self._send(429, b'{"error": "throttled"}', {"Content-Type": "application/json",
+                                                                   "Retry-After": "1"})
+            if action == "missing":
+                msg = json.dumps({"error": "fixture not found", "key": key, "url": original_url})
+                return self._send(404, msg.encode("utf-8"), {"Content-Type": "application/json"})
+            if action == "error":
+                return self._send(behavior.error_status, b'{"error": "injected"}',
+                                  {"Content-Type": "application/json"})
+
+            body = base64.b64decode(fixture.get("body_b64", ""))
+            return self._send(int(fixture.get("status", 200)), body, fixture.get("headers", {}))
+
+        do_GET = _handle
+        do_POST = _handle
+        do_PUT = _handle
+        do_DELETE = _handle
+
+    return ReplayHandler
+
+
+def serve(host: str = "127.0.0.1", port: int = 18080, fixture_dir: Optional[Path] = None,
+          behavior: Optional[StubBehavior] = None) -> ThreadingHTTPServer:
+    """创建桩服务器（调用方负责 serve_forever / shutdown）。"""
+    fixture_dir = Path(fixture_dir or HTTP_FIXTURE_DIR)
+    server = ThreadingHTTPServer((host, port), make_handler(behavior or StubBehavior(), fixture_dir))
+    server.daemon_threads = True
+    return server
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="HTTP record/replay stub server.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="Start the local replay stub server")
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=int(urlsplit(HTTP_STUB_URL).port or 18080))
+    p_serve.add_argument("--fixtures", default=str(HTTP_FIXTURE_DIR), help="Fixture directory")
+    p_serve.add_argument("--latency", type=float, default=0.0, help="Base latency in seconds")
+    p_serve.add_argument("--jitter", type=float, default=0.0, help="Uniform latency jitter in seconds")
+    p_serve.add_argument("--recorded-latency", action="store_true", help="Add the recorded upstream latency")
+    p_serve.add_argument("--error-rate", type=float, default=0.0, help="Probability of an injected error")
+    p_serve.add_argument("--error-status", type=int, default=502)
+    p_serve.add_argument("--rps", type=float, default=0.0, help="Requests per second limit (0 = unlimited)")
+    p_serve.add_argument("--burst", type=int, default=1, help="Token bucket size for --rps")
+    p_serve.add_argument("--throttle-mode", choices=["reject", "delay"], default="reject",
+                         help="reject with 429 or delay when over the limit")
+    p_serve.add_argument("--seed", type=int, default=None, help="Random seed for deterministic runs")
+
+    p_list = sub.add_parser("list", help="List recorded fixtures")
+    p_list.add_argument("--fixtures", default=str(HTTP_FIXTURE_DIR))
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for path in sorted(Path(args.fixtures).glob("*/*.json")):
+            data = json.loads(path.read_text(encoding="utf-8"))
+            req = data.get("request", {})
+            print(f"{path.parent.name}/{path.stem[:10]}  {data.get('status')}  "
+                  f"{data.get('elapsed', 0):.2f}s  {req.get('method')} {req.get('url')}")
+        return 0
+
+    behavior = StubBehavior(
+        latency=args.latency, jitter=args.jitter, use_recorded_latency=args.recorded_latency,
+        error_rate=args.error_rate, error_status=args.error_status, rps=args.rps,
+        burst=args.burst, throttle_mode=args.throttle_mode, seed=args.seed,
+    )
+    server = serve(args.host, args.port, Path(args.fixtures), behavior)
+    print(f"桩服务器已启动: http://{args.host}:{args.port}  fixtures={args.fixtures}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(behavior.stats, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
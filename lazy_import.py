@@ -0,0 +1,64 @@
+"""
+重量级依赖的延迟导入（缩短 run.py / autoProcess / 多进程工作进程的启动时间）。
+
+lazy_import("akshare") 返回一个模块代理，首次访问属性时才真正 import；
+optional=True 时若模块未安装则直接返回 None（保留原有 `ak is None` 的判断写法），
+判断只查找模块规格，不执行导入。
+"""
+
+import importlib
+import importlib.util
+import threading
+from typing import Any, Callable, Optional
+
+
+class LazyModule:
+    """模块代理：首次访问属性时导入目标模块，并可执行一次初始化回调。"""
+
+    def __init__(self, name: str, on_load: Optional[Callable[[Any], None]] = None):
+        object.__setattr__(self, "_lazy_name", name)
+        object.__setattr__(self, "_lazy_module", None)
+        object.__setattr__(self, "_lazy_on_load", on_load)
+        object.__setattr__(self, "_lazy_lock", threading.RLock())
+
+    def _load(self):
+        module = self._lazy_module
+        if module is not None:
+            return module
+        with self._lazy_lock:
+            if self._lazy_module is None:
+                module = importlib.import_module(self._lazy_name)
+                # 先登记模块再执行回调，回调内部可以通过代理访问模块
+                object.__setattr__(self, "_lazy_module", module)
+                if self._lazy_on_load is not None:
+                    self._lazy_on_load(module)
+            return self._lazy_module
+
+    @property
+    def loaded(self) -> bool:
+        return self._lazy_module is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value) -> None:
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module {self._lazy_name!r} ({state})>"
+
+
+def lazy_import(name: str, optional: bool = False,
+                on_load: Optional[Callable[[Any], None]] = None) -> Optional[LazyModule]:
+    """返回延迟导入的模块代理；optional=True 且模块未安装时返回 None。"""
+    if optional:
+        try:
+            if importlib.util.find_spec(name) is None:
+                return None
+        except (ImportError, ValueError):
+            return None
+    return LazyModule(name, on_load=on_load)
@@ -13,12 +13,14 @@
 
 import smtplib
 import os
+import threading
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
 from email.mime.base import MIMEBase
 from email import encoders
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 # 从配置文件中导入配置信息
 try:
@@ -27,9 +29,84 @@ except ImportError:
     import config
 
 
+def build_message(
+    sender_email: str,
+    recipient_emails: List[str],
+    subject: str,
+    body_text: str,
+    image_paths: Optional[List[str]] = None,
+    cc_emails: Optional[List[str]] = None,
+    size_budget_bytes: Optional[int] = None
+) -> MIMEMultipart:
+    """
+    组装邮件：纯文本正文 + 附件（图片按 MIMEImage，其余按 application/octet-stream）。
+    不存在的附件路径只打印警告并跳过。
+    size_budget_bytes: 附件（base64 编码后）的总大小预算；给出时图片改用 attachment_cache 中
+    缩放/量化后的版本以满足预算，不给则附加原图。
+    """
+    if image_paths and size_budget_bytes:
+        from attachment_cache import fit_attachments
+
+        image_paths = fit_attachments(list(image_paths), size_budget_bytes)
+
+    message = MIMEMultipart()
+    message['From'] = sender_email
+    message['To'] = ", ".join(recipient_emails)
+    message['Subject'] = subject
+
+    if cc_emails:
+        message['Cc'] = ", ".join(cc_emails)
+
+    message.attach(MIMEText(body_text, 'plain', 'utf-8'))
+
+    for image_path in image_paths or []:
+        if not os.path.exists(image_path):
+            print(f"警告：附件文件路径不存在 -> {image_path}")
+            continue
+
+        try:
+            with open(image_path, 'rb') as f:
+                file_name = os.path.basename(image_path)
+
+                # 根据文件扩展名选择合适的MIME类型
+                if file_name.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')):
+                    part = MIMEImage(f.read(), name=file_name)
+                    part.add_header('Content-Disposition', f'attachment; filename="{file_name}"')
+                else:
+                    # 对于非图片文件（如CSV），使用通用的 application/octet-stream
+                    part = MIMEBase('application', 'octet-stream')
+                    part.set_payload(f.read())
+                    encoders.encode_base64(part)
+                    part.add_header('Content-Disposition', f'attachment; filename="{file_name}"')
+
+                message.attach(part)
+        except Exception as e:
+            print(f"错误：附加文件 {image_path} 时发生错误 -> {e}")
+    return message
+
+
+def _close_quietly(server) -> None:
+    """安全地关闭连接，避免 quit() 失败导致资源泄漏。"""
+    try:
+        server.quit()
+    except Exception:
+        # 如果 quit() 失败，尝试强制关闭底层 socket
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+def _print_auth_hint() -> None:
+    print("错误：SMTP认证失败。请检查：")
+    print("1. 邮箱地址和密码/授权码是否正确。")
+    print("2. 如果使用Gmail等，是否开启了2FA并使用了【应用专用密码】。")
+
+
 class EmailSender:
     """
     一个灵活的邮件发送类，支持通过配置切换不同的SMTP服务商。
+    send() 每次独立建立连接；一次运行内发送多封邮件请使用 MailDispatcher 复用连接。
     """
     def __init__(self, provider_name: str):
         """
@@ -43,6 +120,7 @@ class EmailSender:
         provider_config = config.SMTP_CONFIGS[provider_name]
         self.smtp_server = provider_config["server"]
         self.smtp_port = provider_config["port"]
+        self.use_ssl = provider_config.get("use_ssl", False)
         
         self.sender_email = config.SENDER_CREDENTIALS["email"]
         self.sender_password = config.SENDER_CREDENTIALS["password"]
@@ -50,81 +128,53 @@ class EmailSender:
         print(f"邮件发送器已初始化，使用 {provider_name.upper()} 服务。")
         print(f"发件人: {self.sender_email}")
 
+    def connect(self, timeout: float = 30):
+        """建立连接（SSL 或 STARTTLS）并登录，返回 smtplib 连接对象。"""
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=timeout)
+        else:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=timeout)
+        try:
+            if not self.use_ssl:
+                server.starttls()
+            # 设置调试级别（生产环境可设为0）
+            server.set_debuglevel(0)
+            server.login(self.sender_email, self.sender_password)
+        except Exception:
+            _close_quietly(server)
+            raise
+        return server
+
     def send(
         self,
         recipient_emails: List[str],
         subject: str,
         body_text: str,
         image_paths: Optional[List[str]] = None,
-        cc_emails: Optional[List[str]] = None
+        cc_emails: Optional[List[str]] = None,
+        size_budget_bytes: Optional[int] = None
     ) -> bool:
         """
         发送一封邮件给一个或多个收件人。
+        size_budget_bytes: 附件总大小预算（字节，按 base64 编码后计），见 build_message。
         """
         if not recipient_emails:
             print("错误：收件人列表不能为空。")
             return False
 
-        message = MIMEMultipart()
-        message['From'] = self.sender_email
-        message['To'] = ", ".join(recipient_emails)
-        message['Subject'] = subject
-
-        if cc_emails:
-            message['Cc'] = ", ".join(cc_emails)
-        
+        message = build_message(self.sender_email, recipient_emails, subject, body_text,
+                                image_paths, cc_emails, size_budget_bytes)
         all_recipients = recipient_emails + (cc_emails or [])
 
-        message.attach(MIMEText(body_text, 'plain', 'utf-8'))
-
-        if image_paths:
-            for image_path in image_paths:
-                if not os.path.exists(image_path):
-                    print(f"警告：附件文件路径不存在 -> {image_path}")
-                    continue
-                
-                try:
-                    with open(image_path, 'rb') as f:
-                        file_name = os.path.basename(image_path)
-                        
-                        # 根据文件扩展名选择合适的MIME类型
-                        if file_name.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-                            part = MIMEImage(f.read(), name=file_name)
-                            part.add_header('Content-Disposition', f'attachment; filename="{file_name}"')
-                        else:
-                            # 对于非图片文件（如CSV），使用通用的 application/octet-stream
-                            part = MIMEBase('application', 'octet-stream')
-                            part.set_payload(f.read())
-                            encoders.encode_base64(part)
-                            part.add_header('Content-Disposition', f'attachment; filename="{file_name}"')
-                        
-                        message.attach(part)
-                except Exception as e:
-                    print(f"错误：附加文件 {image_path} 时发生错误 -> {e}")
-
         server = None
         try:
-            # 根据配置选择是否使用SSL，设置超时时间
-            timeout = 30  # 30秒超时
-            
-            if config.SMTP_CONFIGS.get(config.ACTIVE_SMTP_PROVIDER, {}).get('use_ssl', False):
-                server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=timeout)
-            else:
-                server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=timeout)
-                server.starttls()
-            
-            # 设置调试级别（生产环境可设为0）
-            server.set_debuglevel(0)
-            
-            server.login(self.sender_email, self.sender_password)
+            server = self.connect()
             server.sendmail(self.sender_email, all_recipients, message.as_string())
             
             print(f"邮件已成功发送至: {', '.join(all_recipients)}")
             return True
         except smtplib.SMTPAuthenticationError:
-            print("错误：SMTP认证失败。请检查：")
-            print("1. 邮箱地址和密码/授权码是否正确。")
-            print("2. 如果使用Gmail等，是否开启了2FA并使用了【应用专用密码】。")
+            _print_auth_hint()
             return False
         except smtplib.SMTPServerDisconnected as e:
             print(f"错误：SMTP服务器断开连接 -> {e}")
@@ -139,16 +189,114 @@ class EmailSender:
             print(f"错误：发送邮件时发生未知错误 -> {e}")
             return False
         finally:
-            # 安全地关闭连接，避免 quit() 失败导致资源泄漏
             if server:
+                _close_quietly(server)
+
+
+class MailDispatcher:
+    """
+    一次运行内复用同一个已登录的 SMTP 连接发送多封邮件。
+
+    原来每封邮件都要 TLS 握手 + 登录 + quit，十个标的就是十次握手；这里首次发送时建立连接，
+    之后的邮件直接 sendmail。连接失效（服务器空闲断开、网络重置）时丢弃并重新连接：
+    复用的旧连接失败立即重连重试，新建的连接失败才等待 retry_delay 秒。
+    认证失败和收件人被拒不重试。线程安全（并发的发送按顺序使用同一连接）。
+
+        with MailDispatcher() as mailer:
+            mailer.send(to, subject, body, attachments, cc)
+    """
+
+    def __init__(self, provider_name: Optional[str] = None,
+                 max_retries: Optional[int] = None, retry_delay: Optional[float] = None):
+        self.sender = EmailSender(provider_name or config.ACTIVE_SMTP_PROVIDER)
+        self.max_retries = max(1, max_retries if max_retries is not None else config.MAIL_MAX_RETRIES)
+        self.retry_delay = retry_delay if retry_delay is not None else config.MAIL_RETRY_DELAY_SECONDS
+        self._server = None
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.sent = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+
+    def __enter__(self) -> "MailDispatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _drop(self) -> None:
+        server, self._server = self._server, None
+        if server is not None:
+            _close_quietly(server)
+
+    def send(
+        self,
+        recipient_emails: List[str],
+        subject: str,
+        body_text: str,
+        image_paths: Optional[List[str]] = None,
+        cc_emails: Optional[List[str]] = None,
+        dedupe_key: Optional[str] = None,
+        size_budget_bytes: Optional[int] = None
+    ) -> bool:
+        """
+        发送一封邮件，成功返回 True；重试用尽仍失败返回 False（不抛出），原因记录在 last_error。
+        dedupe_key 仅为与 mail_outbox.MailOutbox.send 接口一致，立即发送时不使用。
+        size_budget_bytes: 附件总大小预算，见 build_message。
+        """
+        if not recipient_emails:
+            print("错误：收件人列表不能为空。")
+            return False
+
+        sender_email = self.sender.sender_email
+        message = build_message(sender_email, recipient_emails, subject, body_text, image_paths, cc_emails,
+                                size_budget_bytes)
+        payload = message.as_string()
+        all_recipients = recipient_emails + (cc_emails or [])
+
+        with self._lock:
+            attempt = 0
+            while attempt < self.max_retries:
+                reused = self._server is not None
                 try:
-                    server.quit()
-                except Exception:
-                    # 如果 quit() 失败，尝试强制关闭底层 socket
-                    try:
-                        server.close()
-                    except Exception:
-                        pass
+                    if not reused:
+                        self._server = self.sender.connect()
+                        self.connections += 1
+                    self._server.sendmail(sender_email, all_recipients, payload)
+                    self.sent += 1
+                    self.last_error = None
+                    print(f"邮件已成功发送至: {', '.join(all_recipients)}")
+                    return True
+                except smtplib.SMTPAuthenticationError:
+                    self._drop()
+                    self.last_error = "SMTP认证失败"
+                    _print_auth_hint()
+                    break
+                except smtplib.SMTPRecipientsRefused as e:
+                    self.last_error = f"收件人被拒绝: {e.recipients}"
+                    print(f"错误：收件人被拒绝 -> {e.recipients}")
+                    break
+                except (smtplib.SMTPException, OSError) as e:
+                    self._drop()
+                    self.last_error = str(e) or type(e).__name__
+                    if reused:
+                        # 复用的连接已被服务器关闭，立即重连，不计入重试次数
+                        print(f"SMTP 连接已失效，重新连接 -> {e}")
+                        continue
+                    attempt += 1
+                    print(f"错误：发送邮件失败 (尝试 {attempt}/{self.max_retries}) -> {e}")
+                if attempt < self.max_retries:
+                    print(f"将在 {self.retry_delay:g} 秒后重试...")
+                    time.sleep(self.retry_delay)
+            self.failed += 1
+            return False
+
+    def close(self) -> None:
+        with self._lock:
+            self._drop()
+
+    def stats(self) -> Dict[str, int]:
+        return {"connections": self.connections, "sent": self.sent, "failed": self.failed}
 
 
 def create_demo_image(path: str):
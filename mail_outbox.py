@@ -0,0 +1,484 @@
+"""
+持久化发件箱：邮件先写入本地 SQLite 队列，由后台线程投递。
+
+notify_by_email / notify_error 原来在流水线节点里直接连 SMTP 发送，失败还要原地 sleep 重试，
+SMTP 慢或不可用时拖住后面的所有步骤。发件箱把"发邮件"变成一次本地写入：
+- 入队：正文、收件人与附件快照（复制到 MAIL_OUTBOX_DIR/files，避免下次运行覆盖 pic 下的图片）
+  写入 outbox.sqlite3，立即返回；
+- 投递：后台线程取到期的邮件，复用一个 MailDispatcher 连接逐封发送；失败按指数退避
+  （MAIL_OUTBOX_BACKOFF_SECONDS）重新排期，超过 MAIL_OUTBOX_MAX_ATTEMPTS 次标记为 failed；
+- 重启续投：未发出的邮件留在库里，下次任何进程启动发件箱（或 python mail_outbox.py deliver）继续投递；
+  投递中途崩溃遗留的 sending 状态超时后回到 pending；
+- 去重：相同去重键（默认为主题+正文+收件人的哈希）在 MAIL_OUTBOX_DEDUPE_SECONDS 内只入队一次；
+- 指标：队列深度、最早待发邮件的等待时间、投递次数、失败重试、入队到送达的延迟。
+
+与 MailDispatcher 提供同名的 send() 接口，调用方可以直接替换。
+
+命令行：
+  python mail_outbox.py status             # 队列深度、各状态数量、最近的邮件
+  python mail_outbox.py deliver            # 投递所有到期邮件后退出
+  python mail_outbox.py retry              # 把 failed 的邮件重新放回队列
+  python mail_outbox.py purge --days 30    # 删除 30 天前已发送/已放弃的记录及其附件快照
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from config import (
+    MAIL_OUTBOX_BACKOFF_SECONDS,
+    MAIL_OUTBOX_DEDUPE_SECONDS,
+    MAIL_OUTBOX_DIR,
+    MAIL_OUTBOX_DRAIN_SECONDS,
+    MAIL_OUTBOX_MAX_ATTEMPTS,
+)
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+CLAIM_TIMEOUT = 600          # sending 状态超过该秒数视为投递进程已崩溃，重新排队
+IDLE_POLL_SECONDS = 60       # 队列为空时的最长等待（入队会立即唤醒）
+BATCH_SIZE = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedupe_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    sent_at REAL,
+    last_error TEXT,
+    subject TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS outbox_dedupe ON outbox (dedupe_key, created_at);
+"""
+
+
+def notification_key(*parts: Any) -> str:
+    """由任意可 JSON 序列化的内容计算去重键。"""
+    canonical = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _default_dispatcher():
+    from mailFun import MailDispatcher
+
+    # 重试由发件箱按退避排期负责，单次投递只尝试一次
+    return MailDispatcher(max_retries=1)
+
+
+class MailOutbox:
+    """SQLite 发件箱 + 后台投递线程。"""
+
+    def __init__(self, directory: Optional[Path] = None,
+                 dispatcher_factory: Callable[[], Any] = _default_dispatcher,
+                 dedupe_seconds: float = MAIL_OUTBOX_DEDUPE_SECONDS,
+                 max_attempts: int = MAIL_OUTBOX_MAX_ATTEMPTS,
+                 backoff: tuple = MAIL_OUTBOX_BACKOFF_SECONDS):
+        self.directory = Path(directory or MAIL_OUTBOX_DIR)
+        self.db_path = self.directory / "outbox.sqlite3"
+        self.files_dir = self.directory / "files"
+        self.dispatcher_factory = dispatcher_factory
+        self.dedupe_seconds = float(dedupe_seconds)
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_base, self.backoff_max = (float(v) for v in backoff)
+
+        self._dispatcher = None
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._metrics = {"enqueued": 0, "deduped": 0, "delivered": 0, "retries": 0, "dead": 0}
+        self._latencies: List[float] = []
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # 自动提交；需要原子性的地方显式 BEGIN IMMEDIATE（多进程共用同一队列）
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ------------------------------------------------------------------
+    # 入队
+    # ------------------------------------------------------------------
+    def _snapshot(self, paths: List[str]) -> List[str]:
+        if not paths:
+            return []
+        target = self.files_dir / uuid.uuid4().hex
+        copied = []
+        for path in paths:
+            source = Path(path)
+            if not source.exists():
+                print(f"警告：附件文件路径不存在 -> {path}")
+                continue
+            target.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, target / source.name)
+            copied.append(str(target / source.name))
+        return copied
+
+    def _is_duplicate(self, conn: sqlite3.Connection, key: str, now: float) -> bool:
+        if self.dedupe_seconds <= 0:
+            return False
+        row = conn.execute(
+            "SELECT 1 FROM outbox WHERE dedupe_key = ? AND created_at >= ? AND status != ? LIMIT 1",
+            (key, now - self.dedupe_seconds, FAILED),
+        ).fetchone()
+        return row is not None
+
+    def enqueue(self, recipient_emails: List[str], subject: str, body_text: str,
+                image_paths: Optional[List[str]] = None, cc_emails: Optional[List[str]] = None,
+                dedupe_key: Optional[str] = None, size_budget_bytes: Optional[int] = None) -> Optional[int]:
+        """
+        写入队列并唤醒投递线程，返回邮件 id；去重窗口内已有相同通知时返回 None。
+        size_budget_bytes 给出时入队前即按预算换成优化后的图片（队列中只保存小图）。
+        """
+        key = dedupe_key or notification_key(subject, body_text, recipient_emails, cc_emails or [])
+        now = time.time()
+        with closing(self._connect()) as conn:
+            if self._is_duplicate(conn, key, now):
+                with self._lock:
+                    self._metrics["deduped"] += 1
+                print(f"[发件箱] 相同通知已在队列/已发送，跳过: {subject}")
+                return None
+
+        image_paths = list(image_paths or [])
+        if image_paths and size_budget_bytes:
+            from attachment_cache import fit_attachments
+
+            image_paths = fit_attachments(image_paths, size_budget_bytes)
+        attachments = self._snapshot(image_paths)
+        message = {"to": list(recipient_emails), "cc": list(cc_emails or []), "subject": subject,
+                   "body": body_text, "attachments": attachments}
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if self._is_duplicate(conn, key, now):
+                # 其他进程刚刚入队了同一通知
+                conn.execute("ROLLBACK")
+                self._remove_files(attachments)
+                with self._lock:
+                    self._metrics["deduped"] += 1
+                return None
+            cursor = conn.execute(
+                "INSERT INTO outbox (dedupe_key, status, created_at, next_attempt_at, subject, message) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, PENDING, now, now, subject, json.dumps(message, ensure_ascii=False)),
+            )
+            conn.execute("COMMIT")
+            message_id = cursor.lastrowid
+
+        with self._lock:
+            self._metrics["enqueued"] += 1
+        print(f"[发件箱] 已入队 #{message_id}: {subject}（{len(attachments)} 个附件）")
+        self.start()
+        self._wake.set()
+        return message_id
+
+    def send(self, recipient_emails: List[str], subject: str, body_text: str,
+             image_paths: Optional[List[str]] = None, cc_emails: Optional[List[str]] = None,
+             dedupe_key: Optional[str] = None, size_budget_bytes: Optional[int] = None) -> bool:
+        """与 MailDispatcher.send 同名的接口：入队（或被去重）即返回 True。"""
+        if not recipient_emails:
+            print("错误：收件人列表不能为空。")
+            return False
+        self.enqueue(recipient_emails, subject, body_text, image_paths, cc_emails, dedupe_key, size_budget_bytes)
+        return True
+
+    # ------------------------------------------------------------------
+    # 投递
+    # ------------------------------------------------------------------
+    def _claim_due(self, limit: int = BATCH_SIZE) -> List[sqlite3.Row]:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE outbox SET status = ? WHERE status = ? AND claimed_at < ?",
+                         (PENDING, SENDING, now - CLAIM_TIMEOUT))
+            rows = conn.execute(
+                "SELECT * FROM outbox WHERE status = ? AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at, id LIMIT ?",
+                (PENDING, now, limit),
+            ).fetchall()
+            conn.executemany("UPDATE outbox SET status = ?, claimed_at = ? WHERE id = ?",
+                             [(SENDING, now, row["id"]) for row in rows])
+            conn.execute("COMMIT")
+        return rows
+
+    def _next_due_in(self) -> float:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?", (PENDING,)).fetchone()
+        if row[0] is None:
+            return IDLE_POLL_SECONDS
+        return min(IDLE_POLL_SECONDS, max(0.0, row[0] - time.time()))
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+
+    def _deliver(self, row: sqlite3.Row) -> bool:
+        message = json.loads(row["message"])
+        error = None
+        try:
+            if self._dispatcher is None:
+                self._dispatcher = self.dispatcher_factory()
+            ok = self._dispatcher.send(message["to"], message["subject"], message["body"],
+                                       message["attachments"], message["cc"])
+            if not ok:
+                error = getattr(self._dispatcher, "last_error", None) or "发送失败"
+        except Exception as exc:
+            error = str(exc) or type(exc).__name__
+
+        now = time.time()
+        attempts = row["attempts"] + 1
+        with closing(self._connect()) as conn:
+            if error is None:
+                conn.execute("UPDATE outbox SET status = ?, attempts = ?, sent_at = ?, last_error = NULL "
+                             "WHERE id = ?", (SENT, attempts, now, row["id"]))
+            elif attempts >= self.max_attempts:
+                conn.execute("UPDATE outbox SET status = ?, attempts = ?, last_error = ? WHERE id = ?",
+                             (FAILED, attempts, error, row["id"]))
+            else:
+                conn.execute("UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? "
+                             "WHERE id = ?", (PENDING, attempts, now + self._backoff(attempts), error, row["id"]))
+
+        with self._lock:
+            if error is None:
+                self._metrics["delivered"] += 1
+                self._latencies.append(now - row["created_at"])
+            elif attempts >= self.max_attempts:
+                self._metrics["dead"] += 1
+            else:
+                self._metrics["retries"] += 1
+        if error is None:
+            self._remove_files(message["attachments"])
+            print(f"[发件箱] #{row['id']} 已送达（入队后 {now - row['created_at']:.1f}s）")
+        elif attempts >= self.max_attempts:
+            print(f"[发件箱] #{row['id']} 投递失败 {attempts} 次，已放弃: {error}")
+        else:
+            print(f"[发件箱] #{row['id']} 投递失败（第 {attempts} 次），{self._backoff(attempts):.0f}s 后重试: {error}")
+        return error is None
+
+    def deliver_due(self) -> int:
+        """投递当前所有到期的邮件（在调用线程中），返回本次处理的封数。"""
+        handled = 0
+        while not self._stop.is_set():
+            rows = self._claim_due()
+            if not rows:
+                break
+            for row in rows:
+                self._deliver(row)
+                handled += 1
+        return handled
+
+    def _release_connection(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.deliver_due()
+                wait = self._next_due_in()
+            except Exception as exc:
+                print(f"[发件箱] 投递线程异常: {exc}")
+                wait = IDLE_POLL_SECONDS
+            if wait > 0:
+                # 队列空闲时释放 SMTP 连接，下次投递再重新连接
+                self._release_connection()
+                self._wake.wait(wait)
+            self._wake.clear()
+        self._release_connection()
+
+    def start(self) -> None:
+        """启动后台投递线程（已启动则忽略）；启动时会接着投递之前进程遗留的邮件。"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="mail-outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 30) -> None:
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def flush(self, timeout: float = MAIL_OUTBOX_DRAIN_SECONDS) -> bool:
+        """等待队列清空（pending/sending 为 0），超时返回 False；未送达的邮件留在库中下次继续。"""
+        self.start()
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.depth() == 0:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.2)
+
+    # ------------------------------------------------------------------
+    # 维护与指标
+    # ------------------------------------------------------------------
+    def _remove_files(self, attachments: List[str]) -> None:
+        folders = {Path(path).parent for path in attachments}
+        for folder in folders:
+            if folder.parent == self.files_dir:
+                shutil.rmtree(folder, ignore_errors=True)
+
+    def depth(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM outbox WHERE status IN (?, ?)", (PENDING, SENDING)).fetchone()[0]
+
+    def retry_failed(self) -> int:
+        """把 failed 的邮件重新排队（重置尝试次数），返回数量。"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute("UPDATE outbox SET status = ?, attempts = 0, next_attempt_at = ? WHERE status = ?",
+                                  (PENDING, time.time(), FAILED))
+        self._wake.set()
+        return cursor.rowcount
+
+    def purge(self, days: float = 30) -> int:
+        """
+        删除 days 天前已发送或已放弃（failed）的记录及其附件快照，返回记录数。
+        failed 的邮件投递成功前不会删快照，这里一并清理；库中已无记录引用的过期快照目录
+        （如之前删除的记录遗留的）也会删除。
+        """
+        cutoff = time.time() - days * 86400
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, message FROM outbox WHERE (status = ? AND sent_at < ?) OR (status = ? AND created_at < ?)",
+                (SENT, cutoff, FAILED, cutoff),
+            ).fetchall()
+            conn.executemany("DELETE FROM outbox WHERE id = ?", [(row["id"],) for row in rows])
+            referenced = {Path(path).parent for (message,) in conn.execute("SELECT message FROM outbox")
+                          for path in json.loads(message)["attachments"]}
+            conn.execute("COMMIT")
+
+        for row in rows:
+            self._remove_files(json.loads(row["message"])["attachments"])
+        if self.files_dir.exists():
+            # 只删过期的目录：刚生成快照、尚未写入记录的入队不受影响
+            for folder in self.files_dir.iterdir():
+                if folder.is_dir() and folder not in referenced and folder.stat().st_mtime < cutoff:
+                    shutil.rmtree(folder, ignore_errors=True)
+        return len(rows)
+
+    def recent(self, limit: int = 10) -> List[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT id, status, created_at, sent_at, attempts, last_error, subject "
+                                "FROM outbox ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """队列指标：各状态数量、深度、最早待发邮件等待秒数，以及本进程的投递计数与延迟。"""
+        with closing(self._connect()) as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+            oldest = conn.execute("SELECT MIN(created_at) FROM outbox WHERE status IN (?, ?)",
+                                  (PENDING, SENDING)).fetchone()[0]
+        with self._lock:
+            metrics = dict(self._metrics)
+            latencies = list(self._latencies)
+        result: Dict[str, Any] = {
+            "depth": counts.get(PENDING, 0) + counts.get(SENDING, 0),
+            "failed_total": counts.get(FAILED, 0),
+            "sent_total": counts.get(SENT, 0),
+            "oldest_pending_seconds": round(time.time() - oldest, 1) if oldest else 0,
+        }
+        result.update(metrics)
+        if latencies:
+            result["latency_avg_seconds"] = round(sum(latencies) / len(latencies), 2)
+            result["latency_max_seconds"] = round(max(latencies), 2)
+        if self._dispatcher is not None:
+            result["connections"] = self._dispatcher.connections
+        return result
+
+
+_shared_outbox: Optional[MailOutbox] = None
+_shared_lock = threading.Lock()
+
+
+def get_mail_outbox() -> MailOutbox:
+    """返回进程内共享的发件箱（启动投递线程，并在进程退出前尽量投递完队列）。"""
+    global _shared_outbox
+    if _shared_outbox is None:
+        with _shared_lock:
+            if _shared_outbox is None:
+                _shared_outbox = MailOutbox()
+                _shared_outbox.start()
+                atexit.register(drain_shared_outbox)
+    return _shared_outbox
+
+
+def drain_shared_outbox(timeout: float = MAIL_OUTBOX_DRAIN_SECONDS) -> Optional[Dict[str, Any]]:
+    """
+    等待共享发件箱投递完毕（最多 timeout 秒）后停止投递线程，返回指标；本进程未使用发件箱时返回 None。
+    超时未送达的邮件保留在队列中，由下次运行或 `python mail_outbox.py deliver` 继续投递。
+    """
+    global _shared_outbox
+    with _shared_lock:
+        outbox, _shared_outbox = _shared_outbox, None
+    if outbox is None:
+        return None
+    if not outbox.flush(timeout):
+        print(f"[发件箱] {timeout:g}s 内未投递完，剩余 {outbox.depth()} 封留待下次运行")
+    outbox.stop()
+    return outbox.stats()
+
+
+def _format_time(ts: Optional[float]) -> str:
+    return datetime.fromtimestamp(ts).strftime("%m-%d %H:%M:%S") if ts else "-"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Persistent mail outbox.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_status = sub.add_parser("status", help="Show queue depth and recent messages")
+    p_status.add_argument("--limit", type=int, default=10)
+    p_deliver = sub.add_parser("deliver", help="Deliver due messages, waiting up to --timeout seconds")
+    p_deliver.add_argument("--timeout", type=float, default=MAIL_OUTBOX_DRAIN_SECONDS)
+    sub.add_parser("retry", help="Requeue failed messages")
+    p_purge = sub.add_parser("purge", help="Delete sent/failed records and attachment snapshots older than --days")
+    p_purge.add_argument("--days", type=float, default=30)
+    args = parser.parse_args()
+
+    outbox = MailOutbox()
+    if args.command == "status":
+        print(json.dumps(outbox.stats(), ensure_ascii=False, indent=2))
+        for row in outbox.recent(args.limit):
+            print(f"#{row['id']:<5} {row['status']:<8} 入队 {_format_time(row['created_at'])} "
+                  f"送达 {_format_time(row['sent_at'])} 尝试 {row['attempts']}  {row['subject']}"
+                  + (f"  ({row['last_error']})" if row["last_error"] else ""))
+    elif args.command == "deliver":
+        done = outbox.flush(args.timeout)
+        outbox.stop()
+        print(json.dumps(outbox.stats(), ensure_ascii=False, indent=2))
+        return 0 if done else 1
+    elif args.command == "retry":
+        print(f"已重新排队 {outbox.retry_failed()} 封")
+    elif args.command == "purge":
+        print(f"已删除 {outbox.purge(args.days)} 条记录")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,7 +1,22 @@
 import time
 from data_fetcher import ETFFetcher
-from data_manager import ETFStorage
+from data_manager import ETFStorage, ETFMinuteStore
 from config import ETFConfig
+from trade_calendar import get_trade_calendar
+
+
+def saveMinuteData(fetcher, periods, minute_store=None):
+    """获取并保存多周期分钟数据（最细周期请求一次，其余周期由其本地聚合；按月分区存储）"""
+    minute_store = minute_store or ETFMinuteStore(fetcher.config.data_dir)
+    code = fetcher.config.stock_code
+    saved = {}
+    for period, df in fetcher.fetch_minute_periods(periods).items():
+        if df.empty:
+            print(f"未获取到 {code} {period} 分钟数据")
+            continue
+        saved[period] = minute_store.append(df, code, period)
+        print(f"成功保存 {period} 分钟数据，新增 {saved[period]} 条")
+    return saved
 
 
 '''ETF 5 15 30 60 min, Day 周期数据获取'''
@@ -17,24 +32,20 @@ def ETFTest(code):
     fetcher = ETFFetcher(config)
     storage = ETFStorage(config)
     
-    # 遍历所有周期 - min
-    # for period in config.periods:
-    #     print(f"正在获取 {period} 分钟数据...")
-    #     df = fetcher.fetch_minute_data(period)
-    #     
-    #     if not df.empty:
-    #         filepath = storage._get_filepath(period)
-    #         print(f"path is {filepath}")
-    #         new_count = storage.saveDataToFile(df, filepath)
-    #         print(f"成功保存 {period} 分钟数据，新增 {new_count} 条")
-    #     else:
-    #         print(f"未获取到 {config.stock_code} {period} 分钟数据")
+    # 分钟数据（按需开启）：只抓取最细周期一次，其余周期本地重采样
+    # saveMinuteData(fetcher, config.periods)
     
-    # daily 数据
+    # daily 数据：本地日线已是最新（休市日、收盘后已抓取过）时跳过请求
+    filepath = storage._get_filepath("Day")
+    last_date = storage.last_datetime(filepath)
+    fetched_at = filepath.stat().st_mtime if filepath.exists() else None
+    if get_trade_calendar().is_data_current(last_date, fetched_at=fetched_at):
+        print(f"{config.stock_code} 日线数据已是最新（截至 {last_date[:10]}），跳过获取")
+        return True
+
     daily_df = fetcher.get_etf_dailyNew()
     # 处理数据保存
     if not daily_df.empty:
-        filepath = storage._get_filepath("Day")
         print(f"path is {filepath}")
         cnt = storage.saveDataToFile(daily_df, filepath)
         print(f"成功保存日线数据，新增 {cnt} 条")
@@ -0,0 +1,154 @@
+"""
+分钟K线本地重采样。
+
+只抓取最细周期（如 5 分钟）一次，其余周期（15/30/60/120 分钟）在本地由其聚合得到，
+避免对同一代码、同一区间按周期重复请求，也保证各周期数据互相一致。
+
+A 股交易时段：09:30-11:30、13:00-15:00，共 240 分钟。
+东方财富分钟K线以“结束时刻”标注（如 5 分钟线 09:35 ... 11:30、13:05 ... 15:00），
+这里按“交易分钟序号”分桶，保证聚合不会跨越午休：
+    上午: m = 当日分钟数 - 09:30      (1 ~ 120)
+    下午: m = 120 + 当日分钟数 - 13:00 (121 ~ 240)
+    桶号 = ceil(m / P)，标签为桶的结束时刻（同样以结束时刻标注）。
+例如 60 分钟线标签为 10:30 / 11:30 / 14:00 / 15:00，120 分钟线为 11:30 / 15:00。
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+MORNING_OPEN = 9 * 60 + 30     # 09:30
+MORNING_CLOSE = 11 * 60 + 30   # 11:30
+AFTERNOON_OPEN = 13 * 60       # 13:00
+SESSION_MINUTES = 240
+
+# 聚合规则：first / max / min / last / sum；未列出的列不保留
+_AGG_RULES = {
+    "OpenValue": "first",
+    "HighValue": "max",
+    "LowValue": "min",
+    "CloseValue": "last",
+    "Volume": "sum",
+    "amount": "sum",
+    "ChangeRate": "sum",
+}
+
+
+def session_minutes(times: pd.Series) -> np.ndarray:
+    """返回每根K线的交易分钟序号（上午 1~120，下午 121~240）。"""
+    minute_of_day = (times.dt.hour * 60 + times.dt.minute).to_numpy()
+    return np.where(
+        minute_of_day <= MORNING_CLOSE,
+        minute_of_day - MORNING_OPEN,
+        SESSION_MINUTES // 2 + minute_of_day - AFTERNOON_OPEN,
+    )
+
+
+def _bucket_end_minute_of_day(end_minutes: np.ndarray) -> np.ndarray:
+    """把桶结束的交易分钟序号换算回当日分钟数（11:30 之后接 13:00）。"""
+    half = SESSION_MINUTES // 2
+    return np.where(end_minutes <= half, MORNING_OPEN + end_minutes, AFTERNOON_OPEN + end_minutes - half)
+
+
+def resample_minute_bars(df: pd.DataFrame, period: int, base_period: Optional[int] = None) -> pd.DataFrame:
+    """
+    将细周期分钟K线聚合为 period 分钟K线（向量化，按交易时段对齐）。
+
+    参数:
+        df: 已统一格式的分钟数据（DateTime/OpenValue/CloseValue/HighValue/LowValue/Volume...）
+        period: 目标周期（分钟）
+        base_period: 源数据周期（分钟），用于校验；为 None 时不校验
+    返回:
+        与 ETFFetcher._etf_min_format_data 相同列顺序的 DataFrame；
+        涨跌幅/涨跌额/振幅按聚合后的收盘价重新计算。
+    """
+    period = int(period)
+    if df is None or df.empty:
+        return pd.DataFrame(columns=df.columns if df is not None else None)
+    if base_period is not None:
+        base_period = int(base_period)
+        if period < base_period or period % base_period:
+            raise ValueError(f"{period} 分钟无法由 {base_period} 分钟数据聚合")
+        if period == base_period:
+            return df.copy()
+
+    frame = df.copy()
+    frame["DateTime"] = pd.to_datetime(frame["DateTime"], errors="coerce")
+    frame = frame.dropna(subset=["DateTime"]).sort_values("DateTime", kind="stable").reset_index(drop=True)
+    if frame.empty:
+        return frame
+
+    times = frame["DateTime"]
+    # 09:30 集合竞价那根并入第一个桶
+    minutes = np.clip(session_minutes(times), 1, SESSION_MINUTES)
+    buckets = np.ceil(minutes / period).astype(np.int64)
+    days = times.dt.normalize().to_numpy().astype("datetime64[D]").astype(np.int64)
+    keys = days * 1000 + buckets
+
+    # 数据已按时间排序，同一 (日期, 桶) 必然连续：用 reduceat 代替 groupby
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(frame)] - 1
+
+    out: Dict[str, np.ndarray] = {}
+    end_minutes = np.minimum(buckets[starts] * period, SESSION_MINUTES)
+    label_minutes = _bucket_end_minute_of_day(end_minutes)
+    out["DateTime"] = (
+        days[starts].astype("datetime64[D]").astype("datetime64[m]") + label_minutes.astype("timedelta64[m]")
+    )
+
+    for col, how in _AGG_RULES.items():
+        if col not in frame.columns:
+            continue
+        values = pd.to_numeric(frame[col], errors="coerce").to_numpy(dtype=float)
+        if how == "first":
+            out[col] = values[starts]
+        elif how == "last":
+            out[col] = values[ends]
+        elif how == "max":
+            out[col] = np.fmax.reduceat(values, starts)
+        elif how == "min":
+            out[col] = np.fmin.reduceat(values, starts)
+        else:
+            out[col] = np.add.reduceat(np.nan_to_num(values), starts)
+
+    result = pd.DataFrame(out)
+
+    # 涨跌相关字段需以上一根聚合K线的收盘为基准重新计算
+    if "CloseValue" in result.columns:
+        prev_close = result["CloseValue"].shift(1)
+        if "涨跌额" in frame.columns and len(result):
+            first_change = pd.to_numeric(frame["涨跌额"], errors="coerce").iloc[0]
+            first_close = pd.to_numeric(frame["CloseValue"], errors="coerce").iloc[0]
+            prev_close.iloc[0] = first_close - first_change
+        if "涨跌幅" in frame.columns:
+            result["涨跌幅"] = ((result["CloseValue"] / prev_close - 1) * 100).round(2)
+        if "涨跌额" in frame.columns:
+            result["涨跌额"] = (result["CloseValue"] - prev_close).round(4)
+        if "振幅" in frame.columns and {"HighValue", "LowValue"} <= set(result.columns):
+            result["振幅"] = ((result["HighValue"] - result["LowValue"]) / prev_close * 100).round(2)
+
+    base_columns = ['DateTime', 'OpenValue', 'CloseValue', 'HighValue', 'LowValue', 'Volume', 'ChangeRate']
+    ordered = [c for c in base_columns if c in result.columns]
+    ordered += [c for c in frame.columns if c in result.columns and c not in ordered]
+    return result[ordered]
+
+
+def derive_periods(base_df: pd.DataFrame, base_period: int, periods: Iterable) -> Dict[str, pd.DataFrame]:
+    """由最细周期数据派生出全部周期：返回 {周期字符串: DataFrame}。"""
+    derived: Dict[str, pd.DataFrame] = {}
+    for period in periods:
+        derived[str(period)] = resample_minute_bars(base_df, int(period), base_period=int(base_period))
+    return derived
+
+
+def finest_period(periods: Iterable) -> int:
+    """返回周期列表中的最细周期，并校验其余周期都能由它聚合得到。"""
+    values: List[int] = sorted({int(p) for p in periods})
+    if not values:
+        raise ValueError("周期列表为空")
+    base = values[0]
+    bad = [p for p in values if p % base]
+    if bad:
+        raise ValueError(f"周期 {bad} 不是 {base} 分钟的整数倍，无法本地聚合")
+    return base
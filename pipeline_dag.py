@@ -0,0 +1,233 @@
+"""
+轻量任务依赖图调度器（run.py 各模式的执行引擎）。
+
+- 每个节点是一个无参函数加上依赖节点名；依赖全部成功后节点才会被提交；
+- 互不依赖的节点在线程池中并发执行（max_workers 限制并发数）；
+- 节点可声明互斥资源（如 "matplotlib"），持有同名资源的节点串行执行；
+- 节点失败时其所有下游节点标记为 skipped，其余分支照常执行；
+- detached 节点的函数只负责提交，返回 concurrent.futures.Future，等待期间不占用线程池
+  （如在后台事件循环上并发的 AI 请求），Future 完成时节点才算结束；
+- 运行结束后给出每个节点的起止时间与耗时，以及关键路径（端到端耗时的下限）。
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+PENDING = "pending"
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class Task:
+    """依赖图中的一个节点。"""
+
+    __slots__ = ("name", "func", "deps", "resource", "detached", "status", "result", "error",
+                 "started", "finished")
+
+    def __init__(self, name: str, func: Callable[[], Any], deps: Iterable[str] = (),
+                 resource: Optional[str] = None, detached: bool = False):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.resource = resource
+        self.detached = detached
+        self.status = PENDING
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+class DagScheduler:
+    """按依赖关系并发执行 Task。"""
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max(1, int(max_workers))
+        self.tasks: Dict[str, Task] = {}
+        self._resources: Dict[str, threading.Lock] = {}
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    def add(self, name: str, func: Callable[[], Any], deps: Iterable[str] = (),
+            resource: Optional[str] = None, detached: bool = False) -> Task:
+        if name in self.tasks:
+            raise ValueError(f"节点重复: {name}")
+        if detached and resource:
+            raise ValueError(f"detached 节点不支持互斥资源: {name}")
+        task = Task(name, func, deps, resource, detached)
+        self.tasks[name] = task
+        if resource and resource not in self._resources:
+            self._resources[resource] = threading.Lock()
+        return task
+
+    def result(self, name: str, default: Any = None) -> Any:
+        task = self.tasks.get(name)
+        return task.result if task is not None and task.status == OK else default
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+    def _check(self) -> None:
+        for task in self.tasks.values():
+            missing = [d for d in task.deps if d not in self.tasks]
+            if missing:
+                raise ValueError(f"节点 {task.name} 依赖不存在: {missing}")
+        # Kahn 拓扑排序检测环
+        indegree = {name: len(task.deps) for name, task in self.tasks.items()}
+        children = self._children()
+        queue = [name for name, n in indegree.items() if n == 0]
+        visited = 0
+        while queue:
+            name = queue.pop()
+            visited += 1
+            for child in children[name]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    queue.append(child)
+        if visited != len(self.tasks):
+            raise ValueError("任务依赖图存在环")
+
+    def _children(self) -> Dict[str, List[str]]:
+        children: Dict[str, List[str]] = {name: [] for name in self.tasks}
+        for task in self.tasks.values():
+            for dep in task.deps:
+                children[dep].append(task.name)
+        return children
+
+    def _execute(self, task: Task) -> None:
+        lock = self._resources.get(task.resource) if task.resource else None
+        if lock is not None:
+            lock.acquire()
+        task.started = time.perf_counter()
+        try:
+            task.result = task.func()
+            task.status = OK
+        except Exception as exc:
+            task.error = exc
+            task.status = FAILED
+            print(f"[调度] 节点 {task.name} 失败: {exc}")
+        finally:
+            task.finished = time.perf_counter()
+            if lock is not None:
+                lock.release()
+
+    def _start_detached(self, task: Task) -> Future:
+        """在调度线程中调用提交函数，返回其 Future（提交失败时返回已失败的 Future）。"""
+        task.started = time.perf_counter()
+        try:
+            future = task.func()
+        except Exception as exc:
+            future = Future()
+            future.set_exception(exc)
+        return future
+
+    def _finish_detached(self, task: Task, future: Future) -> None:
+        task.finished = time.perf_counter()
+        try:
+            task.result = future.result()
+            task.status = OK
+        except Exception as exc:
+            task.error = exc
+            task.status = FAILED
+            print(f"[调度] 节点 {task.name} 失败: {exc}")
+
+    def _skip_downstream(self, name: str, children: Dict[str, List[str]]) -> None:
+        stack = list(children[name])
+        while stack:
+            child = self.tasks[stack.pop()]
+            if child.status == PENDING:
+                child.status = SKIPPED
+                stack.extend(children[child.name])
+
+    def run(self) -> Dict[str, Task]:
+        """执行全部节点，返回 {节点名: Task}。单个节点失败不会抛出。"""
+        self._check()
+        children = self._children()
+        remaining = {name: len(task.deps) for name, task in self.tasks.items()}
+        self._started_at = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dag") as pool:
+            running = {}
+            ready = [name for name, n in remaining.items() if n == 0]
+            while ready or running:
+                for name in ready:
+                    task = self.tasks[name]
+                    if task.detached:
+                        running[self._start_detached(task)] = name
+                    else:
+                        running[pool.submit(self._execute, task)] = name
+                ready = []
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = self.tasks[running.pop(future)]
+                    if task.detached:
+                        self._finish_detached(task, future)
+                    if task.status != OK:
+                        self._skip_downstream(task.name, children)
+                        continue
+                    for child in children[task.name]:
+                        remaining[child] -= 1
+                        if remaining[child] == 0 and self.tasks[child].status == PENDING:
+                            ready.append(child)
+
+        self._finished_at = time.perf_counter()
+        return self.tasks
+
+    # ------------------------------------------------------------------
+    # 计时
+    # ------------------------------------------------------------------
+    def critical_path(self) -> List[str]:
+        """按实际耗时计算的最长依赖链（只考虑已执行的节点）。"""
+        best: Dict[str, float] = {}
+        prev: Dict[str, Optional[str]] = {}
+
+        def visit(name: str) -> float:
+            if name in best:
+                return best[name]
+            task = self.tasks[name]
+            parent, parent_cost = None, 0.0
+            for dep in task.deps:
+                cost = visit(dep)
+                if cost > parent_cost:
+                    parent, parent_cost = dep, cost
+            best[name] = parent_cost + task.seconds
+            prev[name] = parent
+            return best[name]
+
+        executed = [name for name, task in self.tasks.items() if task.started is not None]
+        if not executed:
+            return []
+        tail = max(executed, key=visit)
+        path = []
+        while tail is not None:
+            path.append(tail)
+            tail = prev[tail]
+        return path[::-1]
+
+    def timings(self) -> Dict[str, Any]:
+        origin = self._started_at or 0.0
+        nodes = []
+        for task in self.tasks.values():
+            entry = {"name": task.name, "status": task.status, "seconds": round(task.seconds, 3)}
+            if task.started is not None:
+                entry["start"] = round(task.started - origin, 3)
+            if task.error is not None:
+                entry["error"] = str(task.error)
+            nodes.append(entry)
+        path = self.critical_path()
+        wall = (self._finished_at or origin) - origin
+        return {
+            "wall_seconds": round(wall, 3),
+            "critical_path": path,
+            "critical_path_seconds": round(sum(self.tasks[n].seconds for n in path), 3),
+            "nodes": nodes,
+        }
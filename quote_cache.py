@@ -0,0 +1,251 @@
+"""
+行情快照缓存（进程内 + 磁盘），供 fetch / signal / report / auto 各阶段共享。
+
+- 键: (数据源, 代码, 字段)，如 ("etf", "159843", "quote")
+- 每个字段有独立有效期（见 config.QUOTE_CACHE_TTLS）：
+    quote  实时行情，秒级有效
+    daily  日线快照，有效至下一个交易日收盘时刻（15:00）；报告阶段只在当前交易日已收盘、
+           且快照为收盘后写入的当天数据时才用它代替实时行情
+- stale-while-revalidate：过期但仍在容忍期内的值先直接返回，同时后台刷新；
+  只有无值或超出容忍期时才阻塞等待刷新，保证各阶段不为非必需的刷新而等待。
+- 磁盘文件为 JSON，写入时与磁盘已有内容合并，多进程/多阶段可互相读取；
+  读-合并-替换在同目录 .lock 文件的跨进程锁内完成，并发写入不会互相丢失条目。
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import QUOTE_CACHE_PATH, QUOTE_CACHE_TTLS, QUOTE_CACHE_MAX_STALE
+from trade_calendar import get_trade_calendar
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+BEIJING_TZ = timezone(timedelta(hours=8))
+MARKET_CLOSE_HOUR = 15
+
+
+def next_market_close(ts: float) -> float:
+    """返回时间戳 ts 之后的下一个收盘时刻（北京时间 15:00，跳过休市日）的时间戳。"""
+    moment = datetime.fromtimestamp(ts, BEIJING_TZ)
+    close = moment.replace(hour=MARKET_CLOSE_HOUR, minute=0, second=0, microsecond=0)
+    if moment >= close:
+        close += timedelta(days=1)
+    try:
+        next_day = get_trade_calendar().next_trading_day(close.date(), inclusive=True)
+        close = close.replace(year=next_day.year, month=next_day.month, day=next_day.day)
+    except Exception:
+        while close.weekday() >= 5:
+            close += timedelta(days=1)
+    return close.timestamp()
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """跨进程独占锁（POSIX flock / Windows msvcrt），退出时释放。"""
+    with open(path, "a+b") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            while True:
+                try:
+                    # LK_LOCK 重试约 10 秒后抛 OSError，继续等待
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class QuoteSnapshotCache:
+    """按 (source, code, field) 缓存行情快照，支持分字段 TTL 与后台刷新。"""
+
+    def __init__(self, cache_path: Optional[Path] = None,
+                 field_ttls: Optional[Dict[str, Any]] = None,
+                 max_stale: Optional[Dict[str, int]] = None):
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.field_ttls = dict(field_ttls or QUOTE_CACHE_TTLS)
+        self.max_stale = dict(max_stale or QUOTE_CACHE_MAX_STALE)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._refreshing = set()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+
+    # ------------------------------------------------------------------
+    # 基础读写
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _key(source: str, code: str, field: str) -> str:
+        return f"{source}|{code}|{field}"
+
+    def _expires_at(self, field: str, fetched_at: float) -> float:
+        ttl = self.field_ttls.get(field, 0)
+        if ttl == "close":
+            return next_market_close(fetched_at)
+        return fetched_at + float(ttl)
+
+    def _read_disk(self) -> Dict[str, Dict[str, Any]]:
+        if not self.cache_path or not self.cache_path.exists():
+            return {}
+        try:
+            return json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except Exception:
+            # 缓存损坏时忽略，不阻断主流程
+            return {}
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                for key, entry in self._read_disk().items():
+                    self._entries.setdefault(key, entry)
+                self._loaded = True
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]) -> None:
+        if not self.cache_path:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # 读-合并-替换期间持有跨进程锁，否则两个进程读到同一旧文件，后替换的会丢掉先写入的条目
+            with _file_lock(self.cache_path.with_suffix(self.cache_path.suffix + ".lock")):
+                merged = self._read_disk()
+                # 以较新的值为准，避免覆盖其他进程刚写入的快照
+                current = merged.get(key)
+                if current is None or current.get("fetched_at", 0) <= entry["fetched_at"]:
+                    merged[key] = entry
+                now = time.time()
+                merged = {
+                    k: v for k, v in merged.items()
+                    if v.get("expires_at", 0) + self.max_stale.get(k.rsplit("|", 1)[-1], 0) > now
+                }
+                tmp_path = self.cache_path.with_suffix(f".{os.getpid()}.tmp")
+                tmp_path.write_text(json.dumps(merged, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"[行情缓存] 写入磁盘失败: {e}")
+
+    def put(self, source: str, code: str, field: str, value: Any, fetched_at: Optional[float] = None) -> None:
+        """写入一条快照（value 需可 JSON 序列化）。"""
+        self._ensure_loaded()
+        fetched_at = fetched_at or time.time()
+        entry = {
+            "value": value,
+            "fetched_at": fetched_at,
+            "expires_at": self._expires_at(field, fetched_at),
+        }
+        key = self._key(source, code, field)
+        with self._lock:
+            self._entries[key] = entry
+            self._write_disk(key, entry)
+
+    def peek_entry(self, source: str, code: str, field: str) -> Optional[Dict[str, Any]]:
+        """只读查询，返回原始条目 {"value", "fetched_at", "expires_at"} 或 None。"""
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(self._key(source, code, field))
+            if entry is None:
+                # 其他进程可能刚写入，回读一次磁盘
+                disk_entry = self._read_disk().get(self._key(source, code, field))
+                if disk_entry is not None:
+                    self._entries[self._key(source, code, field)] = disk_entry
+                    entry = disk_entry
+        return entry
+
+    def peek(self, source: str, code: str, field: str) -> Optional[Tuple[Any, bool]]:
+        """只读查询，不触发刷新。返回 (值, 是否未过期) 或 None。"""
+        entry = self.peek_entry(source, code, field)
+        if entry is None:
+            return None
+        return entry["value"], time.time() < entry["expires_at"]
+
+    # ------------------------------------------------------------------
+    # stale-while-revalidate 读取
+    # ------------------------------------------------------------------
+    def _refresh(self, source: str, code: str, field: str, loader: Callable[[], Any]) -> Any:
+        self.stats["refreshes"] += 1
+        value = loader()
+        if value is not None:
+            self.put(source, code, field, value)
+        return value
+
+    def _refresh_in_background(self, source: str, code: str, field: str, loader: Callable[[], Any]) -> None:
+        key = self._key(source, code, field)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def _run():
+            try:
+                self._refresh(source, code, field, loader)
+            except Exception as e:
+                print(f"[行情缓存] 后台刷新 {key} 失败: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=_run, name=f"quote-refresh-{key}", daemon=True).start()
+
+    def get(self, source: str, code: str, field: str, loader: Callable[[], Any], allow_stale: bool = True) -> Any:
+        """
+        读取快照：
+        - 未过期: 直接返回；
+        - 已过期但在容忍期内且 allow_stale: 返回旧值并后台刷新；
+        - 其他情况: 阻塞调用 loader 刷新；刷新失败时退回旧值（若有）。
+        loader 返回 None 表示获取失败（不写入缓存）。
+        """
+        found = self.peek(source, code, field)
+        if found is not None:
+            value, fresh = found
+            if fresh:
+                self.stats["hits"] += 1
+                return value
+            entry = self._entries.get(self._key(source, code, field), {})
+            stale_for = time.time() - entry.get("expires_at", 0)
+            if allow_stale and stale_for <= self.max_stale.get(field, 0):
+                self.stats["stale_hits"] += 1
+                self._refresh_in_background(source, code, field, loader)
+                return value
+
+        self.stats["misses"] += 1
+        try:
+            value = self._refresh(source, code, field, loader)
+        except Exception as e:
+            print(f"[行情缓存] 刷新 {source}|{code}|{field} 失败: {e}")
+            value = None
+        if value is None and found is not None:
+            return found[0]
+        return value
+
+
+_shared_cache: Optional[QuoteSnapshotCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_quote_cache() -> QuoteSnapshotCache:
+    """返回进程内共享的行情快照缓存（首次调用时创建）。"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = QuoteSnapshotCache(cache_path=QUOTE_CACHE_PATH)
+    return _shared_cache
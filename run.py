@@ -3,18 +3,27 @@
 统一任务运行入口 (报告生成/信号计算/自动任务).
 
 模式 (mode):
-  all       运行所有任务 (获取数据 -> 信号计算 -> 生成报告)
-  report    仅生成 HTML 报告并发送邮件
+  all       运行所有任务 (获取数据 -> 信号计算，与报告生成并发执行)
+  report    仅生成 HTML 报告 (加 --mail 发送邮件)
   signal    仅计算交易信号
   fetch     仅获取最新行情数据
   auto      运行自动化交易处理流程 (包含 AI 深度分析)
+  backfill  分块并行回补历史数据 (支持断点续传)
+  serve     常驻服务：预热数据与模块，定时刷新，通过本机 HTTP 提供 JSON 接口
 
 常用示例:
-  ./venv/bin/python run.py report                     # 生成 HTML 报表并发送邮件
+  ./venv/bin/python run.py report --mail              # 生成 HTML 报表并发送邮件
   ./venv/bin/python run.py signal --codes 159843      # 计算指定代码的交易信号
   ./venv/bin/python run.py auto --codes 512820.SH     # 运行 AI 深度分析及自动化流程
+  ./venv/bin/python run.py auto --mail-digest         # 所有代码合并为一封汇总邮件
   ./venv/bin/python run.py all --no-ai --no-mail      # 运行全部任务，但禁用 AI 和邮件
   ./venv/bin/python run.py --list-codes               # 查看 strategy_params.json 中的代码列表
+  ./venv/bin/python run.py signal --jobs 4            # 4 个进程并行计算信号（抓取与计算流水线）
+  ./venv/bin/python run.py all --max-workers 6        # 任务依赖图最多 6 个节点并发，摘要含各节点耗时
+  ./venv/bin/python run.py serve                      # 启动常驻服务 (默认 127.0.0.1:18765)
+  ./venv/bin/python run.py signal --server            # 作为薄客户端向常驻服务请求信号
+  ./venv/bin/python run.py backfill --codes 159843 --start 2015-01-01             # 回补日线历史
+  ./venv/bin/python run.py backfill --codes 159843 --start 2024-01-01 --period 5  # 回补 5 分钟线
   
   ./venv/bin/python run.py auto --codes 512820.SH --no-mail-auto --format json
 
@@ -24,11 +33,21 @@
   --codes           指定代码，多个用逗号分隔 (如 159843,512820.SH)
   --no-fetch        跳过数据抓取，直接使用本地缓存数据
   --no-ai           禁用 HTML 报告中的 AI 市场总结
-  --no-mail         禁用 HTML 报告的邮件发送
+  --mail            发送 HTML 报告邮件 (report/all 模式，默认不发送；仍受 settings.SEND_MAIL 控制)
+  --no-mail         禁用 HTML 报告的邮件发送 (优先于 --mail)
   --no-mail-auto    禁用自动化流程 (auto 模式) 的邮件发送
+  --mail-digest     auto 模式把所有代码的信号、AI 策略与图表合并为一封汇总邮件 (默认取 MAIL_DIGEST)
   --format          输出格式: text (默认) 或 json (适合机器人集成)
   --summary-file    将运行结果摘要保存到指定文件
   --list-codes      列出当前配置的所有监控代码并退出
+  --start/--end     回补区间 (backfill 模式，默认 config.START_TIME 至今天)
+  --period          回补周期: Day (默认) 或分钟周期 1/5/15/30/60/120
+  --jobs            并发数 (backfill 模式为并发分块数；signal/all/auto 模式为并行计算信号的进程数)
+  --max-workers     all/report/signal/auto 模式任务依赖图的最大并发节点数 (默认 4)
+  --server          交给常驻服务执行；
+  --server-url URL  常驻服务地址，指定即启用 --server (默认环境变量 RUN_SERVER_URL 或 http://SERVICE_HOST:SERVICE_PORT)；
+                    服务未启动 (连接被拒绝) 时回退本地执行，HTTP 错误或超时 (SERVICE_CLIENT_TIMEOUT) 直接报错
+  --port            serve 模式监听端口
 """
 
 from __future__ import annotations
@@ -37,6 +56,7 @@ import argparse
 import json
 import os
 import sys
+import time
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -113,88 +133,308 @@ def _default_codes_for_mode(mode: str) -> List[str]:
     return [_normalize_code(c) for c in _load_strategy_codes()]
 
 
-def run_fetch(codes: List[str]) -> Dict[str, bool]:
-    if not codes:
-        return {}
+def _fetch_one(code: str) -> bool:
     from main import ETFTest
 
-    results: Dict[str, bool] = {}
-    for code in codes:
-        try:
-            results[code] = bool(ETFTest(code))
-        except Exception:
-            results[code] = False
-    return results
+    try:
+        return bool(ETFTest(code))
+    except Exception:
+        return False
+
+
+def run_fetch(codes: List[str]) -> Dict[str, bool]:
+    return {code: _fetch_one(code) for code in codes}
+
+
+def _signal_entry(code: str, result: Tuple[str, str, str], fetch_ok: Optional[bool]) -> Dict[str, str]:
+    _type, text, reason = result
+    return {"code": code, "signal": text, "reason": reason, "fetch_ok": fetch_ok}
+
 
+def _signal_error(code: str, exc: BaseException, fetch_ok: Optional[bool]) -> Dict[str, str]:
+    return {"code": code, "signal": "error", "reason": f"signal failed: {exc}", "fetch_ok": fetch_ok}
 
-def run_signal(codes: List[str], fetch_first: bool) -> List[Dict[str, str]]:
+
+def _init_signal_worker() -> None:
+    # 工作进程只保存图片，不弹窗
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _signal_worker(code: str) -> Tuple[str, str, str]:
+    """进程池任务：单个代码的信号计算（加载数据 + 回测 + 保存图表）。"""
     from autoProcess import get_trading_signal
 
-    fetch_results: Dict[str, bool] = {}
-    if fetch_first:
-        fetch_results = run_fetch(codes)
+    return tuple(get_trading_signal(code))
 
-    signals: List[Dict[str, str]] = []
-    for code in codes:
-        try:
-            _type, text, reason = get_trading_signal(code)
-            signals.append({
-                "code": code,
-                "signal": text,
-                "reason": reason,
-                "fetch_ok": fetch_results.get(code) if fetch_first else None,
-            })
-        except Exception as exc:
-            signals.append({
-                "code": code,
-                "signal": "error",
-                "reason": f"signal failed: {exc}",
-                "fetch_ok": fetch_results.get(code) if fetch_first else None,
-            })
-    return signals
-
-
-def run_auto(codes: List[str], send_email: bool) -> List[Dict[str, str]]:
-    from autoProcess import run_trading_strategy
-
-    results: List[Dict[str, str]] = []
-    for code in codes:
-        try:
-            result = run_trading_strategy(code, send_email=send_email)
-            if isinstance(result, dict):
-                results.append(result)
+
+def _auto_entry(code: str, dag) -> Dict[str, str]:
+    fetch = dag.tasks[f"fetch:{code}"]
+    if fetch.status != "ok":
+        return {"code": code, "status": "error", "error": str(fetch.error or fetch.status)}
+    signal = dag.result(f"signal:{code}")
+    ai_info, strategy_info = dag.result(f"ai:{code}", ("aiResultInfo not ok", ""))
+    if signal is None:
+        return {"code": code, "status": "error", "error": str(dag.tasks[f"signal:{code}"].error)}
+    return {
+        "code": code,
+        "status": "ok",
+        "signal": signal[1],
+        "signal_reason": signal[2],
+        "ai_strategy": strategy_info,
+        "ai_analysis": ai_info,
+    }
+
+
+def run_pipeline(mode: str, codes: List[str], fetch_first: bool = True, no_ai: bool = False,
+                 no_mail: bool = False, send_email_auto: bool = True, jobs: Optional[int] = None,
+                 max_workers: int = 4, mail_digest: Optional[bool] = None, mail_report: bool = False) -> Dict:
+    """
+    以任务依赖图执行 all/report/signal/auto 模式：
+      report:fetch -> report:ai -> report:render -> mail   (mail 仅在 mail_report 时添加)
+      fetch:code -> signal:code                      (signal/all)
+      fetch:code -> signal:code, ai:code -> mail:code (auto)
+      signal:* -> charts                              (后台图表渲染完成)
+    互不依赖的节点并发执行；auto 模式的 ai:code 为 detached 节点，全部标的的 AI 请求
+    在共享的异步连接池上同时发出（受 AI_MAX_CONCURRENCY 限制）。返回摘要各段及每个节点的耗时。
+    本次运行的所有邮件共用一个 SMTP 连接；mail_digest（默认 config.MAIL_DIGEST）为真时
+    auto 模式不再逐个标的发信，任务图结束后把全部标的合并为一封汇总邮件。
+    """
+    from pipeline_dag import DagScheduler
+
+    dag = DagScheduler(max_workers=max_workers)
+    # 早于本次运行的图表/CSV 是之前运行遗留的，邮件不附加
+    started_at = time.time()
+    mailer = None
+    signal_pool = None
+    if mode in ("signal", "all", "auto") and jobs and jobs > 1 and len(codes) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        signal_pool = ProcessPoolExecutor(max_workers=min(jobs, len(codes)), initializer=_init_signal_worker)
+
+    # 线程内计算信号时图表交给后台渲染进程，信号节点不等待绘图，也不在线程中使用 pyplot
+    render_queue = None
+    if signal_pool is None and mode in ("signal", "all", "auto") and codes:
+        from chart_render import RenderQueue
+        render_queue = RenderQueue()
+
+    def signal_node(code: str):
+        if signal_pool is not None:
+            return lambda: signal_pool.submit(_signal_worker, code).result()
+        from autoProcess import get_trading_signal
+        return lambda: tuple(get_trading_signal(code, render_queue=render_queue))
+
+    if mode in ("report", "all"):
+        from webhtml.config import settings
+        from webhtml.reporter.generator import render_report, render_stats, save_report, backup_raw_data
+        from webhtml.reporter.mailer import build_report_mail, send_report_mail
+        from webhtml.data_handler.fetcher import fetch_all_data
+        from webhtml.data_handler.history_store import load_trend_history
+        from webhtml.analysis.calculator import build_report_view
+        from webhtml.analysis.ai_summary import generate_ai_summary
+
+        # no_ai / no_mail 只作用于本次运行，不改写 settings（常驻服务中会影响之后的请求）
+        use_ai = bool(settings.USE_DEEPSEEK) and not no_ai
+        # 报告邮件需显式 --mail 开启（与原 run_report 一致，cron 中的 report/all 默认不发信）
+        send_mail = mail_report and bool(settings.SEND_MAIL) and not no_mail
+
+        def report_fetch():
+            raw = fetch_all_data()
+            return build_report_view(raw, history=load_trend_history(raw.get("date")))
+
+        def report_render():
+            view = dag.result("report:fetch")
+            view["ai_summary"] = dag.result("report:ai")
+            backup_raw_data(view.get("_raw", {}))
+            return save_report(render_report(view))
+
+        def report_mail():
+            subject, body = build_report_mail(dag.result("report:fetch"))
+            return send_report_mail(subject=subject, body=body, html_path=dag.result("report:render"),
+                                    dispatcher=mailer, enabled=send_mail)
+
+        dag.add("report:fetch", report_fetch)
+        dag.add("report:ai", lambda: generate_ai_summary(dag.result("report:fetch"), use_ai=use_ai),
+                deps=["report:fetch"])
+        dag.add("report:render", report_render, deps=["report:ai"])
+        if send_mail:
+            mailer = _mail_dispatcher()
+            dag.add("mail", report_mail, deps=["report:render"])
+
+    if mode in ("signal", "all"):
+        for code in codes:
+            deps = []
+            if fetch_first:
+                dag.add(f"fetch:{code}", lambda code=code: _fetch_one(code))
+                deps = [f"fetch:{code}"]
+            dag.add(f"signal:{code}", signal_node(code), deps=deps)
+
+    # auto 模式各标的的 AI 请求在同一个异步连接池上并发（不占用任务图的线程）
+    ai_runner = None
+    if mode == "auto" and codes:
+        from deepSeekAi import AsyncAnalysisRunner
+        ai_runner = AsyncAnalysisRunner()
+
+    digest = False
+    if mode == "auto":
+        from autoProcess import fetch_latest_data, submit_ai_analysis, notify_by_email, notify_digest
+
+        if send_email_auto and codes:
+            from config import MAIL_DIGEST
+
+            digest = MAIL_DIGEST if mail_digest is None else mail_digest
+            mailer = _mail_dispatcher()
+
+        def auto_fetch(code: str):
+            error = fetch_latest_data(code, send_email=send_email_auto)
+            if error:
+                raise RuntimeError(error)
+            return True
+
+        def auto_mail(code: str):
+            _type, signal_text, signal_reason = dag.result(f"signal:{code}")
+            ai_info, strategy_info = dag.result(f"ai:{code}")
+            return notify_by_email(code, signal_text, signal_reason, ai_info, strategy_info,
+                                   render_queue=render_queue, dispatcher=mailer, charts_since=started_at)
+
+        for code in codes:
+            dag.add(f"fetch:{code}", lambda code=code: auto_fetch(code))
+            dag.add(f"signal:{code}", signal_node(code), deps=[f"fetch:{code}"])
+            dag.add(f"ai:{code}", lambda code=code: submit_ai_analysis(code, ai_runner),
+                    deps=[f"fetch:{code}"], detached=True)
+            if send_email_auto and not digest:
+                dag.add(f"mail:{code}", lambda code=code: auto_mail(code),
+                        deps=[f"signal:{code}", f"ai:{code}"])
+
+    if render_queue is not None:
+        # 所有信号节点之后等待剩余图表写盘（计入耗时明细，但不阻塞各信号节点）
+        dag.add("charts", lambda: len(render_queue.wait()),
+                deps=[name for name in dag.tasks if name.startswith("signal:")])
+
+    digest_sent = None
+    digest_seconds = 0.0
+    try:
+        dag.run()
+        if digest:
+            # 汇总邮件需要全部标的的结果（含失败的），放在任务图之后发送
+            started = time.perf_counter()
+            digest_sent = notify_digest([_auto_entry(code, dag) for code in codes],
+                                        render_queue=render_queue, dispatcher=mailer,
+                                        charts_since=started_at)
+            digest_seconds = time.perf_counter() - started
+    finally:
+        # 共享发件箱在进程退出前统一投递（drain_shared_outbox），这里只关闭本次运行的直连
+        if mailer is not None and hasattr(mailer, "close"):
+            mailer.close()
+        if signal_pool is not None:
+            signal_pool.shutdown()
+        if render_queue is not None:
+            render_queue.shutdown()
+        if ai_runner is not None:
+            ai_runner.close()
+
+    result: Dict = {"timings": dag.timings()}
+    if "report:fetch" in dag.tasks:
+        view = dag.result("report:fetch") or {}
+        result["report"] = {
+            "report_date": str(view.get("report_date") or ""),
+            "report_path": str(dag.result("report:render") or ""),
+            "ai_summary": str(dag.result("report:ai") or ""),
+        }
+        if dag.tasks["report:render"].status == "ok":
+            result["report"]["render_ms"] = render_stats()["last_render_ms"]
+        if "mail" in dag.tasks:
+            result["report"]["mail_sent"] = bool(dag.result("mail"))
+        failed = [n for n in ("report:fetch", "report:ai", "report:render") if dag.tasks[n].status == "failed"]
+        if failed:
+            result["report"]["error"] = f"{failed[0]}: {dag.tasks[failed[0]].error}"
+    if mode in ("signal", "all"):
+        signals = []
+        for code in codes:
+            fetch_ok = dag.result(f"fetch:{code}") if fetch_first else None
+            task = dag.tasks[f"signal:{code}"]
+            if task.status == "ok":
+                signals.append(_signal_entry(code, task.result, fetch_ok))
             else:
-                results.append({"code": code, "status": "ok"})
-        except Exception as exc:
-            results.append({"code": code, "status": f"error: {exc}"})
-    return results
+                signals.append(_signal_error(code, task.error or task.status, fetch_ok))
+        result["signals"] = signals
+    if mode == "auto":
+        result["auto"] = [_auto_entry(code, dag) for code in codes]
+    if mailer is not None:
+        result["mail"] = mailer.stats()
+        if digest_sent is not None:
+            result["mail"].update(digest=bool(digest_sent), digest_seconds=round(digest_seconds, 3))
+    return result
 
 
-def run_report(no_ai: bool, no_mail: bool) -> Dict[str, str]:
-    from webhtml.config import settings
-    from webhtml.reporter.generator import render_report, save_report, backup_raw_data
-    from webhtml.data_handler.fetcher import fetch_all_data
-    from webhtml.analysis.calculator import build_report_view
-    from webhtml.analysis.ai_summary import generate_ai_summary
+def _mail_dispatcher():
+    """本次运行的发信对象：启用发件箱时为进程共享的 MailOutbox（后台投递），否则为 MailDispatcher。"""
+    from config import MAIL_OUTBOX
 
-    if no_ai:
-        settings.USE_DEEPSEEK = 0
-    if no_mail:
-        settings.SEND_MAIL = 0
+    if MAIL_OUTBOX:
+        from mail_outbox import get_mail_outbox
 
-    raw = fetch_all_data()
-    view = build_report_view(raw)
-    view["ai_summary"] = generate_ai_summary(view)
+        return get_mail_outbox()
+    from mailFun import MailDispatcher
 
-    backup_raw_data(view.get("_raw", {}))
-    html = render_report(view)
-    output_path = save_report(html)
+    return MailDispatcher()
 
-    return {
-        "report_date": str(view.get("report_date") or ""),
-        "report_path": str(output_path),
-        "ai_summary": str(view.get("ai_summary") or ""),
+
+def run_backfill(codes: List[str], start: Optional[str], end: Optional[str],
+                 period: str, jobs: Optional[int]) -> List[Dict]:
+    from backfill import backfill_codes
+
+    return backfill_codes(codes, start=start, end=end, period=period, max_workers=jobs)
+
+
+def _default_server_url() -> str:
+    from config import SERVICE_HOST, SERVICE_PORT
+
+    return f"http://{SERVICE_HOST}:{SERVICE_PORT}"
+
+
+def _run_via_server(url: str, args: argparse.Namespace, codes: List[str]) -> Optional[Dict]:
+    """交给常驻服务执行；服务未监听（连接被拒绝）时返回 None 由本地执行，其余错误向上抛出。"""
+    from urllib.error import HTTPError, URLError
+    from service import call_service
+
+    request = {
+        "mode": args.mode,
+        "codes": codes,
+        "no_fetch": args.no_fetch,
+        "no_ai": args.no_ai,
+        "no_mail": args.no_mail,
+        "no_mail_auto": args.no_mail_auto,
+        "jobs": args.jobs,
+        "max_workers": args.max_workers,
+        "mail_digest": args.mail_digest,
+        "mail": args.mail,
     }
+    try:
+        return call_service(url, "/run", request)
+    except URLError as exc:
+        # 只有服务没在监听时才回退本地执行；HTTP 错误或超时时服务可能已在抓取/发信，
+        # 本地再跑一遍会重复抓取、重复发邮件，交给调用方报错
+        if isinstance(exc, HTTPError) or not isinstance(exc.reason, ConnectionRefusedError):
+            raise
+        print(f"[client] service unavailable at {url} ({exc.reason}), running locally", file=sys.stderr)
+        return None
+
+
+def run_serve(codes: List[str], port: Optional[int]) -> int:
+    from config import SERVICE_HOST, SERVICE_PORT
+    from service import serve
+
+    port = port or SERVICE_PORT
+    server, service = serve(codes, host=SERVICE_HOST, port=port)
+    print(f"服务已启动: http://{SERVICE_HOST}:{port}  codes={','.join(codes)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+    return 0
 
 
 def _emit_summary(payload: Dict, fmt: str, summary_file: Optional[str]) -> None:
@@ -210,6 +450,8 @@ def _emit_summary(payload: Dict, fmt: str, summary_file: Optional[str]) -> None:
             lines.append(f"report_date: {report.get('report_date','')}")
             lines.append(f"report_path: {report.get('report_path','')}")
             lines.append(f"ai_summary: {report.get('ai_summary','')}")
+            if "render_ms" in report:
+                lines.append(f"render_ms: {report['render_ms']}")
         if payload.get("signals"):
             lines.append("signals:")
             for item in payload["signals"]:
@@ -218,6 +460,38 @@ def _emit_summary(payload: Dict, fmt: str, summary_file: Optional[str]) -> None:
             lines.append("auto:")
             for item in payload["auto"]:
                 lines.append(f"{item.get('code','')}: {item.get('status','')}")
+        if payload.get("backfill"):
+            lines.append("backfill:")
+            for item in payload["backfill"]:
+                lines.append(
+                    f"{item.get('code','')} {item.get('period','')}: {item.get('status','')} | "
+                    f"rows={item.get('rows', 0)} chunks={item.get('chunks', 0)} "
+                    f"failed={item.get('failed_chunks', 0)} {item.get('seconds', 0)}s"
+                )
+        if payload.get("timings"):
+            timings = payload["timings"]
+            lines.append(
+                f"timings: wall={timings.get('wall_seconds', 0)}s "
+                f"critical_path={timings.get('critical_path_seconds', 0)}s "
+                f"({' -> '.join(timings.get('critical_path', []))})"
+            )
+            for node in timings.get("nodes", []):
+                lines.append(f"  {node.get('name','')}: {node.get('status','')} {node.get('seconds', 0)}s")
+        if payload.get("frame_cache"):
+            stats = payload["frame_cache"]
+            lines.append(
+                f"frame_cache: hits={stats.get('hits', 0)} misses={stats.get('misses', 0)} "
+                f"invalidations={stats.get('invalidations', 0)} entries={stats.get('entries', 0)}"
+            )
+        if payload.get("mail"):
+            stats = payload["mail"]
+            lines.append("mail: " + " ".join(f"{key}={value}" for key, value in stats.items()))
+        if payload.get("ai_cache"):
+            stats = payload["ai_cache"]
+            lines.append(
+                f"ai_cache: hits={stats.get('hits', 0)} misses={stats.get('misses', 0)} "
+                f"writes={stats.get('writes', 0)} evictions={stats.get('evictions', 0)}"
+            )
         lines.append("===END SUMMARY===")
         text = "\n".join(lines)
 
@@ -233,17 +507,30 @@ def main() -> int:
         "mode",
         nargs="?",
         default="all",
-        choices=["all", "report", "signal", "fetch", "auto"],
+        choices=["all", "report", "signal", "fetch", "auto", "backfill", "serve"],
         help="Task mode to run",
     )
     parser.add_argument("--codes", help="Comma-separated codes, e.g. 159843,512820.SH")
     parser.add_argument("--no-fetch", action="store_true", help="Skip data fetch before signal")
     parser.add_argument("--no-ai", action="store_true", help="Disable AI summary in report")
+    parser.add_argument("--mail", action="store_true", help="Email the HTML report (report/all modes)")
     parser.add_argument("--no-mail", action="store_true", help="Disable report email sending")
     parser.add_argument("--no-mail-auto", action="store_true", help="Disable autoProcess email sending")
+    parser.add_argument("--mail-digest", action="store_true", default=None,
+                        help="Auto mode: send one digest email for all codes (default: MAIL_DIGEST)")
     parser.add_argument("--format", choices=["text", "json"], default="text", help="Summary output format")
     parser.add_argument("--summary-file", help="Write summary to a file")
     parser.add_argument("--list-codes", action="store_true", help="List default signal codes and exit")
+    parser.add_argument("--start", help="Backfill start date, e.g. 2015-01-01")
+    parser.add_argument("--end", help="Backfill end date (default: today)")
+    parser.add_argument("--period", default="Day", help="Backfill period: Day or minutes (1/5/15/30/60/120)")
+    parser.add_argument("--jobs", type=int, default=None, help="Parallel workers (backfill chunks / signal codes)")
+    parser.add_argument("--max-workers", type=int, default=4, help="Max concurrent pipeline tasks")
+    parser.add_argument("--server", action="store_true",
+                        help="Send the request to a running 'run.py serve' instance")
+    parser.add_argument("--server-url", default=os.getenv("RUN_SERVER_URL") or None,
+                        help="Service URL, implies --server (default: RUN_SERVER_URL or SERVICE_HOST/PORT)")
+    parser.add_argument("--port", type=int, default=None, help="Listen port for serve mode")
 
     args = parser.parse_args()
 
@@ -264,20 +551,65 @@ def main() -> int:
         return 0
 
     codes = _parse_codes(args.codes)
-    if not codes and args.mode in ("signal", "fetch", "auto", "all"):
+    if not codes and args.mode in ("signal", "fetch", "auto", "all", "backfill", "serve"):
         codes = _default_codes_for_mode("auto" if args.mode == "auto" else "signal")
 
-    if args.mode in ("report", "all"):
-        payload["report"] = run_report(no_ai=args.no_ai, no_mail=args.no_mail)
+    if args.mode == "serve":
+        return run_serve(codes, args.port)
 
-    if args.mode in ("signal", "all"):
-        payload["signals"] = run_signal(codes, fetch_first=not args.no_fetch)
+    # 薄客户端：交给常驻服务执行，服务不可用时回退到本地执行
+    if (args.server or args.server_url) and args.mode != "backfill":
+        server_url = args.server_url or _default_server_url()
+        try:
+            served = _run_via_server(server_url, args, codes)
+        except OSError as exc:
+            print(f"[client] request to {server_url} failed: {exc}; not running locally to avoid "
+                  f"duplicate fetches and mail", file=sys.stderr)
+            return 1
+        if served is not None:
+            payload.update(served)
+            payload["served_by"] = server_url
+            _emit_summary(payload, fmt=args.format, summary_file=args.summary_file)
+            return 0
+
+    # HTTP_MODE=record/replay 时启用录制/回放层（默认 live 不做处理）
+    from http_replay import install as install_http_replay
+    payload["http_mode"] = install_http_replay()
+
+    if args.mode in ("report", "signal", "all", "auto"):
+        payload.update(run_pipeline(
+            args.mode, codes,
+            fetch_first=not args.no_fetch,
+            no_ai=args.no_ai,
+            no_mail=args.no_mail,
+            send_email_auto=not args.no_mail_auto,
+            jobs=args.jobs,
+            max_workers=args.max_workers,
+            mail_digest=args.mail_digest,
+            mail_report=args.mail,
+        ))
 
     if args.mode == "fetch":
         payload["fetch"] = run_fetch(codes)
 
-    if args.mode == "auto":
-        payload["auto"] = run_auto(codes, send_email=not args.no_mail_auto)
+    # 等待发件箱把本次运行入队的邮件投递完（超时未送达的留待下次运行），摘要中报告队列指标
+    from mail_outbox import drain_shared_outbox
+    outbox_stats = drain_shared_outbox()
+    if outbox_stats is not None:
+        payload.setdefault("mail", {}).update(outbox_stats)
+
+    if args.mode == "backfill":
+        payload["backfill"] = run_backfill(codes, args.start, args.end, args.period, args.jobs)
+
+    from frame_cache import get_frame_cache
+    frame_cache_stats = get_frame_cache().stats()
+    if frame_cache_stats["hits"] or frame_cache_stats["misses"]:
+        payload["frame_cache"] = frame_cache_stats
+
+    from ai_cache import get_ai_cache
+    ai_cache_stats = get_ai_cache().snapshot()
+    if ai_cache_stats["hits"] or ai_cache_stats["misses"]:
+        payload["ai_cache"] = ai_cache_stats
 
     _emit_summary(payload, fmt=args.format, summary_file=args.summary_file)
     return 0
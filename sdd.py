@@ -1,12 +1,10 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import itertools
 from io import StringIO
 import sys
 from datetime import datetime
 import platform
-import matplotlib.font_manager as fm
 import os
 import json
 import time
@@ -18,6 +16,14 @@ project_root = os.path.dirname((os.path.abspath(__file__)))
 sys.path.append(project_root)
 print(project_root)
 
+from bars import OHLCVBars, as_ohlcv_frame
+from frame_cache import get_frame_cache
+from lazy_import import lazy_import
+from config import CACHE_DIR
+
+# 字体探测结果缓存（按平台与 matplotlib 版本失效）
+FONT_CACHE_PATH = CACHE_DIR / "cjk_font.json"
+
 
 
 def get_beijing_time():
@@ -25,51 +31,73 @@ def get_beijing_time():
     return datetime.now(timezone(timedelta(hours=8)))
 
 # 动态设置matplotlib中文字体，以适应不同操作系统
-def set_chinese_font():
-    """
-    根据操作系统自动设置matplotlib的中文字体。
-    """
-    os_name = platform.system()
-    print(f"当前操作系统: {os_name}，正在配置中文字体...")
+def _detect_chinese_fonts(os_name):
+    """扫描 matplotlib 字体列表，返回当前平台可用的中文字体（按优先级）。"""
+    import matplotlib.font_manager as fm
 
     # 先读取可用字体，再按平台挑选（避免设置了不存在的字体导致中文乱码/方块）
     available_fonts = {f.name for f in fm.fontManager.ttflist}
 
-    def pick(candidates):
-        return [c for c in candidates if c in available_fonts]
-
     if os_name == 'Windows':
         # Windows系统: 优先使用微软雅黑，备选黑体
         candidates = ['Microsoft YaHei', 'SimHei', 'Microsoft JhengHei UI', 'Arial Unicode MS']
-        picked = pick(candidates)
-        if picked:
-            plt.rcParams['font.sans-serif'] = picked
     elif os_name == 'Linux':
         # Linux系统: 尝试使用常见的开源中文字体
         candidates = ['Noto Sans CJK SC', 'WenQuanYi Zen Hei', 'WenQuanYi Micro Hei', 'Source Han Sans SC', 'Arial Unicode MS']
-        picked = pick(candidates)
-        if picked:
-            plt.rcParams['font.sans-serif'] = picked
     elif os_name == 'Darwin':
         # macOS系统：部分 Python/Matplotlib 环境可能识别不到 PingFang/Heiti，
         # 这里动态选择实际可用字体。
         candidates = ['PingFang SC', 'Heiti SC', 'STHeiti', 'Songti SC', 'Arial Unicode MS']
-        picked = pick(candidates)
-        if picked:
-            plt.rcParams['font.sans-serif'] = picked
     else:
         print("未知的操作系统，使用matplotlib默认字体，中文可能无法正常显示。")
+        return []
+    return [c for c in candidates if c in available_fonts]
+
+
+def set_chinese_font():
+    """
+    根据操作系统自动设置matplotlib的中文字体。
+    探测结果缓存在 stock_data/_cache/cjk_font.json，后续进程无需再扫描字体列表。
+    """
+    import matplotlib
+
+    os_name = platform.system()
+    print(f"当前操作系统: {os_name}，正在配置中文字体...")
+
+    cache_key = {"platform": os_name, "matplotlib": matplotlib.__version__}
+    picked = None
+    try:
+        cached = json.loads(FONT_CACHE_PATH.read_text(encoding="utf-8"))
+        if all(cached.get(k) == v for k, v in cache_key.items()):
+            picked = cached.get("fonts", [])
+    except Exception:
+        picked = None
+
+    if picked is None:
+        picked = _detect_chinese_fonts(os_name)
+        # 没有找到中文字体时不缓存，之后安装字体即可生效
+        if picked:
+            _save_font_cache(dict(cache_key, fonts=picked))
+
+    if picked:
+        matplotlib.rcParams['font.sans-serif'] = picked
 
     # 解决负号'-'显示为方块的问题
-    plt.rcParams['axes.unicode_minus'] = False
+    matplotlib.rcParams['axes.unicode_minus'] = False
 
-    # 解决负号'-'显示为方块的问题
-    plt.rcParams['axes.unicode_minus'] = False
 
-# 在脚本开始时调用函数进行设置
-set_chinese_font()
+def _save_font_cache(entry):
+    try:
+        FONT_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        FONT_CACHE_PATH.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+    except OSError:
+        pass
 
-def load_etf_data(filepath):
+
+# pyplot 延迟到第一次绘图时才导入，导入时完成中文字体设置
+plt = lazy_import("matplotlib.pyplot", on_load=lambda _: set_chinese_font())
+
+def _parse_etf_csv(filepath):
     df = pd.read_csv(filepath, sep=',') # 或者 pd.read_excel(filepath)
     df['DateTime'] = pd.to_datetime(df['DateTime'])
     df.set_index('DateTime', inplace=True)
@@ -82,6 +110,18 @@ def load_etf_data(filepath):
     essential_cols = ['OpenValue', 'CloseValue', 'HighValue', 'LowValue']
     df.dropna(subset=essential_cols, inplace=True)
     return df
+
+
+def load_etf_data(filepath, compact=False):
+    """
+    加载日线CSV。compact=True 时返回紧凑的 OHLCVBars（float32 价格/int64 成交量），
+    用于参数寻优等需要在多进程间传递数据的场景；策略与回测函数均可直接接受。
+    解析结果经进程内缓存共享（文件修改后自动失效），返回的是缓存的深拷贝，可以原地修改。
+    """
+    df = get_frame_cache().load(filepath, "sdd", _parse_etf_csv)
+    if compact:
+        return OHLCVBars.from_frame(df, symbol=os.path.basename(os.path.dirname(filepath)))
+    return df
 
 # 使用示例:
 #etf_data = load_etf_data("D:\\Code\\Ai\\jinrongTest\\github\\stock_data\\588180\\588180_Day.csv")
@@ -100,7 +140,8 @@ def simple_ma_strategy(data, symbol, short_window, long_window,
                          VolumeSellRate=4.5,
                          plot_chart=1,
                          pic_folder='pic',
-                         enable_file_io=True
+                         enable_file_io=True,
+                         render_queue=None
                          ):
     """
     简单均线交叉策略
@@ -117,8 +158,10 @@ def simple_ma_strategy(data, symbol, short_window, long_window,
     :param plot_chart: int, 是否绘制K线和信号图 (0:不绘制, 1:仅保存,2: 保存图片并显示图表)
     :param pic_folder: str, 图片和CSV保存的文件夹路径
     :param enable_file_io: bool, 是否启用文件写入功能 (用于优化)
+    :param render_queue: chart_render.RenderQueue, 提供时 plot_chart=1 的图表交给后台进程渲染
     :return: Series, 包含信号 (1: 买入, -1: 卖出, 0: 持有)
     """
+    data = as_ohlcv_frame(data)
     signals = pd.DataFrame(index=data.index)
     signals['signal'] = 0.0
 
@@ -194,75 +237,121 @@ def simple_ma_strategy(data, symbol, short_window, long_window,
     
     # 新增绘图功能
     if plot_chart >= 1:
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(16, 9), sharex=True, 
-                                        gridspec_kw={'height_ratios': [3, 1]},
-                                        constrained_layout=True)
-        fig.suptitle('交易策略下的预期信号', fontsize=16)
-
-        # --- 1. K线图 & 均线 & 买卖点 ---
-        # 为了避免非交易日造成K线图断裂，我们使用数值索引绘图，然后将X轴标签设置为日期
-        plot_data = data.join(signals)
-        plot_data_reset = plot_data.reset_index()
-
-        # 计算7日均量
-        plot_data_reset['volume_ma'] = plot_data_reset['Volume'].rolling(window=7, min_periods=1).mean()
-
-        up = plot_data_reset[plot_data_reset['CloseValue'] >= plot_data_reset['OpenValue']]
-        down = plot_data_reset[plot_data_reset['CloseValue'] < plot_data_reset['OpenValue']]
-
-        # 使用整数索引绘图
-        # 绘制影线
-        ax1.vlines(plot_data_reset.index, plot_data_reset['LowValue'], plot_data_reset['HighValue'], color=np.where(plot_data_reset['CloseValue'] >= plot_data_reset['OpenValue'], 'red', 'green'), linewidth=1)
-        # 绘制实体 (红涨绿跌)
-        ax1.vlines(up.index, up['OpenValue'], up['CloseValue'], color='red', linewidth=5)
-        ax1.vlines(down.index, down['OpenValue'], down['CloseValue'], color='green', linewidth=5)
-
-        # 绘制均线
-        ax1.plot(plot_data_reset.index, plot_data_reset['short_mavg'], color='blue', label=f'短期均线({short_window})', linewidth=2)
-        ax1.plot(plot_data_reset.index, plot_data_reset['long_mavg'], color='Black', label=f'长期均线({long_window})', linewidth=2)
-
-        # 标记买卖点
-        buy_signals = plot_data_reset[plot_data_reset['signal'] == 1]
-        sell_signals = plot_data_reset[plot_data_reset['signal'] == -1]
-
-        if not buy_signals.empty:
-            ax1.plot(buy_signals.index, buy_signals['LowValue'] * 0.98, '^', color='red', markersize=10, label='买入信号')
-
-        if not sell_signals.empty:
-            ax1.plot(sell_signals.index, sell_signals['HighValue'] * 1.02, 'v', color='green', markersize=10, label='卖出信号')
-
-        ax1.set_ylabel('价格')
-        ax1.legend()
-        ax1.grid(True)
-
-        # --- 2. 成交量图 ---
-        ax2.bar(up.index, up['Volume'] / 10000, color='red', alpha=0.7)
-        ax2.bar(down.index, down['Volume'] / 10000, color='green', alpha=0.7)
-        ax2.plot(plot_data_reset.index, plot_data_reset['volume_ma'] / 10000, color='blue', linestyle='--', linewidth=1, label=f'{volume_mavg_Value}日均量')
-        ax2.set_ylabel('成交量(万手)')
-        ax2.legend()
-        ax2.grid(True)
-        
-        # --- 格式化 X 轴 ---
-        # 选择性地显示一些日期标签以避免拥挤
-        num_ticks = min(10, len(plot_data_reset))
-        if num_ticks > 0:
-            tick_indices = np.linspace(0, len(plot_data_reset) - 1, num_ticks, dtype=int)
-            tick_labels = plot_data_reset['DateTime'].iloc[tick_indices].dt.strftime('%Y-%m-%d')
-            ax2.set_xticks(tick_indices)
-            ax2.set_xticklabels(tick_labels, rotation=30, ha='right')
-
-        fig.savefig(os.path.join(pic_folder, f'{symbol}_expectSignal.png'))
-        #plt.close(fig)
-
-        if plot_chart == 2:
-            plt.show()
-        plt.close(fig)
+        chart_signals = signals[['signal', 'short_mavg', 'long_mavg']]
+        if render_queue is not None and plot_chart == 1:
+            # 仅保存图片时交给后台渲染进程，信号计算不等待绘图
+            render_queue.submit_expect_signal(data, chart_signals, symbol, short_window, long_window,
+                                              volume_mavg_Value=volume_mavg_Value, pic_folder=pic_folder)
+        else:
+            plot_expect_signal(data, chart_signals, symbol, short_window, long_window,
+                               volume_mavg_Value=volume_mavg_Value, plot_chart=plot_chart,
+                               pic_folder=pic_folder)
 
 
     return signals['signal'] # 返回的是一个包含每天信号的Series
 
 #全仓买入、卖出的策略
+def _plot_chan_overlay(ax, plot_data):
+    """在 K 线图上叠加缠论结构：顶/底分型标记、笔的折线、最近中枢的 ZG/ZD 区间。"""
+    import chan_engine
+
+    chan = chan_engine.analyze_frame(plot_data)
+    if len(chan.fractal_index):
+        tops = chan.fractal_index[chan.fractal_type == chan_engine.TOP]
+        bottoms = chan.fractal_index[chan.fractal_type == chan_engine.BOTTOM]
+        ax.scatter(tops, plot_data['HighValue'].to_numpy()[tops], marker='v', s=18, color='purple', alpha=0.6)
+        ax.scatter(bottoms, plot_data['LowValue'].to_numpy()[bottoms], marker='^', s=18, color='purple', alpha=0.6)
+    if chan.strokes:
+        xs = [chan.strokes[0]['start_index']] + [s['end_index'] for s in chan.strokes]
+        ys = [chan.strokes[0]['start_price']] + [s['end_price'] for s in chan.strokes]
+        ax.plot(xs, ys, color='purple', linewidth=1, alpha=0.7, label='笔')
+    pivot = chan.latest_pivot
+    if pivot:
+        ax.fill_between([pivot['start_index'], len(plot_data) - 1], pivot['ZD'], pivot['ZG'],
+                        color='orange', alpha=0.15, label=f"中枢 {pivot['ZD']:.3f}~{pivot['ZG']:.3f}")
+
+
+def plot_expect_signal(data, signals, symbol, short_window, long_window,
+                       volume_mavg_Value=10, plot_chart=1, pic_folder='pic', show_chan=True):
+    """
+    绘制策略预期信号图（K线 + 均线 + 买卖点 + 成交量），保存为 {symbol}_expectSignal.png。
+    :param data: DataFrame, 日线数据（DateTime 索引）
+    :param signals: DataFrame, 包含 'signal', 'short_mavg', 'long_mavg' 列
+    :param plot_chart: int, 1:仅保存, 2:保存并显示
+    :param show_chan: bool, 叠加缠论分型、笔与最近中枢（chan_engine）
+    :return: 图片路径
+    """
+    output_path = os.path.join(pic_folder, f'{symbol}_expectSignal.png')
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(16, 9), sharex=True, 
+                                    gridspec_kw={'height_ratios': [3, 1]},
+                                    constrained_layout=True)
+    fig.suptitle('交易策略下的预期信号', fontsize=16)
+
+    # --- 1. K线图 & 均线 & 买卖点 ---
+    # 为了避免非交易日造成K线图断裂，我们使用数值索引绘图，然后将X轴标签设置为日期
+    plot_data = data.join(signals)
+    plot_data_reset = plot_data.reset_index()
+
+    # 计算7日均量
+    plot_data_reset['volume_ma'] = plot_data_reset['Volume'].rolling(window=7, min_periods=1).mean()
+
+    up = plot_data_reset[plot_data_reset['CloseValue'] >= plot_data_reset['OpenValue']]
+    down = plot_data_reset[plot_data_reset['CloseValue'] < plot_data_reset['OpenValue']]
+
+    # 使用整数索引绘图
+    # 绘制影线
+    ax1.vlines(plot_data_reset.index, plot_data_reset['LowValue'], plot_data_reset['HighValue'], color=np.where(plot_data_reset['CloseValue'] >= plot_data_reset['OpenValue'], 'red', 'green'), linewidth=1)
+    # 绘制实体 (红涨绿跌)
+    ax1.vlines(up.index, up['OpenValue'], up['CloseValue'], color='red', linewidth=5)
+    ax1.vlines(down.index, down['OpenValue'], down['CloseValue'], color='green', linewidth=5)
+
+    # 绘制均线
+    ax1.plot(plot_data_reset.index, plot_data_reset['short_mavg'], color='blue', label=f'短期均线({short_window})', linewidth=2)
+    ax1.plot(plot_data_reset.index, plot_data_reset['long_mavg'], color='Black', label=f'长期均线({long_window})', linewidth=2)
+
+    # 标记买卖点
+    buy_signals = plot_data_reset[plot_data_reset['signal'] == 1]
+    sell_signals = plot_data_reset[plot_data_reset['signal'] == -1]
+
+    if not buy_signals.empty:
+        ax1.plot(buy_signals.index, buy_signals['LowValue'] * 0.98, '^', color='red', markersize=10, label='买入信号')
+
+    if not sell_signals.empty:
+        ax1.plot(sell_signals.index, sell_signals['HighValue'] * 1.02, 'v', color='green', markersize=10, label='卖出信号')
+
+    if show_chan:
+        _plot_chan_overlay(ax1, plot_data_reset)
+
+    ax1.set_ylabel('价格')
+    ax1.legend()
+    ax1.grid(True)
+
+    # --- 2. 成交量图 ---
+    ax2.bar(up.index, up['Volume'] / 10000, color='red', alpha=0.7)
+    ax2.bar(down.index, down['Volume'] / 10000, color='green', alpha=0.7)
+    ax2.plot(plot_data_reset.index, plot_data_reset['volume_ma'] / 10000, color='blue', linestyle='--', linewidth=1, label=f'{volume_mavg_Value}日均量')
+    ax2.set_ylabel('成交量(万手)')
+    ax2.legend()
+    ax2.grid(True)
+
+    # --- 格式化 X 轴 ---
+    # 选择性地显示一些日期标签以避免拥挤
+    num_ticks = min(10, len(plot_data_reset))
+    if num_ticks > 0:
+        tick_indices = np.linspace(0, len(plot_data_reset) - 1, num_ticks, dtype=int)
+        tick_labels = plot_data_reset['DateTime'].iloc[tick_indices].dt.strftime('%Y-%m-%d')
+        ax2.set_xticks(tick_indices)
+        ax2.set_xticklabels(tick_labels, rotation=30, ha='right')
+
+    fig.savefig(output_path)
+    #plt.close(fig)
+
+    if plot_chart == 2:
+        plt.show()
+    plt.close(fig)
+    return output_path
+
+
 def run_backtest0(data, signals, initial_capital=100000.0, commission_rate=0.0003):
     """
     执行回测
@@ -345,6 +434,7 @@ def run_backtest(data,symbol,
                  enable_file_io=True
                 ):
     
+    data = as_ohlcv_frame(data)
     # 根据回测时间范围筛选数据
     if statTime or endTime:
         backtest_data = data.loc[statTime:endTime]
@@ -730,12 +820,14 @@ def plot_performance(portfolio_df, symbol, benchmark_data=None,
     # 为所有子图添加十字光标功能
     add_crosshair_cursor(fig, ax_kline, ax_volume, plot_data)
     
-    fig.savefig(os.path.join(pic_folder, f'{symbol}_Strategy_Performance_Dashboard.png'))
+    output_path = os.path.join(pic_folder, f'{symbol}_Strategy_Performance_Dashboard.png')
+    fig.savefig(output_path)
     
     if plot_chart == 2:
         plt.show()
     
     plt.close(fig)
+    return output_path
 
 
 
@@ -765,6 +857,7 @@ from performance_analyzer import calculate_performance, plot_performance
 :param VolumeSellRate: 成交量卖出倍数
 :param plot_results: int, 控制绘图和保存。0:不绘制不保存, 1:仅保存图片, 2:保存并显示图片
 :param verbose: bool, 是否打印详细日志
+:param render_queue: chart_render.RenderQueue, 提供时 plot_results=1 的图表在后台进程渲染，不阻塞回测
 """
 def strategyFunc(filepath=None, 
              data=None,
@@ -786,7 +879,8 @@ def strategyFunc(filepath=None,
              VolumeSellRate=4.5,
              statTime=None, endTime=None,
              plot_results=2, verbose=True,
-             enable_file_io=True):
+             enable_file_io=True,
+             render_queue=None):
 
         # 从filepath推断出根目录和pic目录
         # filepath is like '.../stock_data/588180/588180_Day.csv'
@@ -804,7 +898,7 @@ def strategyFunc(filepath=None,
 
         # 1. 加载数据
         if data is not None:
-            etf_data = data
+            etf_data = as_ohlcv_frame(data)  # 兼容紧凑的 OHLCVBars
         elif filepath:
             etf_data = load_etf_data(filepath)
         else:
@@ -826,7 +920,8 @@ def strategyFunc(filepath=None,
                                      VolumeSellRate=VolumeSellRate,
                                      plot_chart=plot_results,
                                      pic_folder=pic_folder,
-                                     enable_file_io=enable_file_io
+                                     enable_file_io=enable_file_io,
+                                     render_queue=render_queue
                                      )
 
         # 3. 执行回测
@@ -859,7 +954,11 @@ def strategyFunc(filepath=None,
         plot_df = portfolio_df_for_plot.join(etf_data[['OpenValue', 'HighValue', 'LowValue', 'CloseValue', 'Volume']])
 
         # 6. 绘制图表
-        if plot_results >= 1:
+        if plot_results == 1 and render_queue is not None:
+            render_queue.submit_performance(plot_df, symbol, benchmark_df_for_plot,
+                                            short_window, long_window, volume_mavg_Value, rsi_period,
+                                            pic_folder=pic_folder)
+        elif plot_results >= 1:
             plot_performance(plot_df, symbol, benchmark_df_for_plot, 
                                 short_window, 
                                 long_window, 
@@ -1095,6 +1194,28 @@ class NpEncoder(json.JSONEncoder):
             return obj.tolist()
         return super(NpEncoder, self).default(obj)
 
+# 参数寻优工作进程共享的行情数据：通过进程池 initializer 每个进程只传递一次，
+# 而不是随每个任务重复序列化（任务元组中的数据位置传 None）
+_WORKER_BARS = None
+_WORKER_FRAME = None
+
+
+def _init_worker_data(bars):
+    global _WORKER_BARS, _WORKER_FRAME
+    _WORKER_BARS = bars
+    _WORKER_FRAME = None
+
+
+def _worker_frame(etf_data):
+    """返回任务使用的 DataFrame：任务未携带数据时使用进程共享数据（每个进程只还原一次）"""
+    global _WORKER_FRAME
+    if etf_data is not None:
+        return as_ohlcv_frame(etf_data)
+    if _WORKER_FRAME is None:
+        _WORKER_FRAME = as_ohlcv_frame(_WORKER_BARS)
+    return _WORKER_FRAME
+
+
 def _find_params_worker(args):
     """
     findGoodParam 的多进程 worker。
@@ -1102,6 +1223,7 @@ def _find_params_worker(args):
     """
     params, etf_data, symbol, windows = args
     try:
+        etf_data = _worker_frame(etf_data)
         perf_list = []
         for (w_start, w_end) in windows:
             performance_stats = strategyFunc(
@@ -1154,8 +1276,9 @@ def findGoodParam(symbol,
     #filepath="D:\\Code\\Ai\\jinrongTest\\github\\stock_data\\588180_Day.csv" # 科创50
     filepath = os.path.join(project_root, 'stock_data', f'{symbol}', f'{symbol}_Day.csv')
     print(f"Loading data from: {filepath}") 
-    # 1. 一次性加载数据
-    etf_data = load_etf_data(filepath)
+    # 1. 一次性加载数据（紧凑格式，仅在进程池初始化时传给每个工作进程一次）
+    bars = load_etf_data(filepath, compact=True)
+    etf_data = bars.to_frame()
     print("Data loaded successfully.")
 
     stock_data_folder = os.path.dirname(filepath) # .../stock_data/symbol
@@ -1214,11 +1337,11 @@ def findGoodParam(symbol,
     
     # 2. 准备要传递给工作进程的参数
     # 将共享的参数与每个变化的参数组合打包
-    tasks = [(p, etf_data, symbol, windows) for p in valid_combinations]
+    tasks = [(p, None, symbol, windows) for p in valid_combinations]
 
     results = []
     # 使用多进程池并行执行回测
-    with multiprocessing.Pool(processes=num_processes) as pool:
+    with multiprocessing.Pool(processes=num_processes, initializer=_init_worker_data, initargs=(bars,)) as pool:
         # 使用functools.partial来创建一个带有固定参数的新函数
         # task = partial(_find_params_worker, etf_data=etf_data, symbol=symbol, statTime=statTime, endTime=endTime)
         
@@ -1881,6 +2004,7 @@ def _find_best_params_worker(args):
     """find_best_params 的多进程 worker"""
     params, etf_data, symbol, train_start, train_end, valid_start, valid_end, MAX_MDD_TRAIN, MIN_TRADES_TRAIN = args
     try:
+        etf_data = _worker_frame(etf_data)
         # 训练集评估
         train_metrics = _evaluate_on_window(params, etf_data, symbol, train_start, train_end)
         
@@ -1954,7 +2078,8 @@ def find_best_params(symbol, phase1_cfg=None, constraints=None, seed=None, num_p
     if not os.path.exists(filepath):
         print(f"错误：数据文件不存在 -> {filepath}")
         return
-    etf_data = load_etf_data(filepath)
+    bars = load_etf_data(filepath, compact=True)
+    etf_data = bars.to_frame()
     if len(etf_data.index) < 100:
         print("数据量过少，无法进行7:3切分与参数搜索。")
         return
@@ -2055,7 +2180,7 @@ def find_best_params(symbol, phase1_cfg=None, constraints=None, seed=None, num_p
     
     # 准备任务参数
     phase1_tasks = [
-        (params, etf_data, symbol, train_start, train_end, valid_start, valid_end, MAX_MDD_TRAIN, MIN_TRADES_TRAIN)
+        (params, None, symbol, train_start, train_end, valid_start, valid_end, MAX_MDD_TRAIN, MIN_TRADES_TRAIN)
         for params in phase1_params
     ]
     
@@ -2065,7 +2190,7 @@ def find_best_params(symbol, phase1_cfg=None, constraints=None, seed=None, num_p
     step1 = max(1, NUM_PHASE1 // 20)
     completed = 0
     
-    with multiprocessing.Pool(processes=num_processes) as pool:
+    with multiprocessing.Pool(processes=num_processes, initializer=_init_worker_data, initargs=(bars,)) as pool:
         for result in pool.imap_unordered(_find_best_params_worker, phase1_tasks):
             if result is not None:
                 stage1_results.append(result)
@@ -2103,7 +2228,7 @@ def find_best_params(symbol, phase1_cfg=None, constraints=None, seed=None, num_p
     
     # 准备任务参数
     phase2_tasks = [
-        (params, etf_data, symbol, train_start, train_end, valid_start, valid_end, MAX_MDD_TRAIN, MIN_TRADES_TRAIN)
+        (params, None, symbol, train_start, train_end, valid_start, valid_end, MAX_MDD_TRAIN, MIN_TRADES_TRAIN)
         for params in phase2_params
     ]
     
@@ -2113,7 +2238,7 @@ def find_best_params(symbol, phase1_cfg=None, constraints=None, seed=None, num_p
     step2 = max(1, NUM_PHASE2 // 20)
     completed = 0
     
-    with multiprocessing.Pool(processes=num_processes) as pool:
+    with multiprocessing.Pool(processes=num_processes, initializer=_init_worker_data, initargs=(bars,)) as pool:
         for result in pool.imap_unordered(_find_best_params_worker, phase2_tasks):
             if result is not None:
                 stage2_results.append(result)
@@ -0,0 +1,296 @@
+"""
+常驻服务模式（python run.py serve）。
+
+每次 cron 调用 run.py / autoProcess.py 都要付出解释器启动、pandas/akshare/matplotlib 导入
+以及完整的数据重载成本。服务进程启动时一次性完成这些导入并常驻：
+- 日线数据经 frame_cache 常驻内存（文件更新后自动失效）；
+- 信号结果按 (数据文件状态, strategy_params.json 状态, 日期) 缓存，数据未变化时直接返回；
+- 后台线程按 SERVICE_REFRESH_SECONDS 周期抓取最新数据并预先计算信号；
+- 通过本机 HTTP 提供 JSON 接口，返回内容与 run.py 的摘要 payload 结构一致，
+  run.py 的各模式加 --server 即成为薄客户端。
+
+接口:
+  GET  /health              服务状态
+  GET  /signals?codes=a,b   读取（必要时计算）信号，不抓取
+  POST /run                 {"mode": "signal|report|all|auto|fetch", "codes": [...], "no_fetch": false, ...}
+  POST /optimize            {"code": "159843", "seed": 1, "processes": 4}  后台参数寻优，返回任务号
+  GET  /jobs/<id>           查询寻优任务
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from config import (
+    BASE_DIR, DATA_DIR, SERVICE_HOST, SERVICE_PORT, SERVICE_REFRESH_SECONDS, SERVICE_CLIENT_TIMEOUT,
+)
+
+PARAMS_PATH = BASE_DIR / "strategy_params.json"
+
+
+def _file_signature(path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class SignalService:
+    """服务状态：预热的模块、信号缓存、后台刷新与寻优任务。"""
+
+    def __init__(self, codes: List[str], refresh_seconds: int = SERVICE_REFRESH_SECONDS):
+        self.codes = list(codes)
+        self.refresh_seconds = refresh_seconds
+        self.started_at = time.time()
+        self.last_refresh: Optional[float] = None
+        self._signals: Dict[str, Tuple[tuple, tuple]] = {}
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # 信号计算与完整流水线串行执行（图表由后台渲染队列生成）
+        self._compute_lock = threading.Lock()
+        # 定时刷新与请求可能同时抓取同一代码，抓取（写 CSV）串行执行
+        self._fetch_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    def warm_up(self) -> None:
+        """导入重量级模块并加载交易日历，之后的请求不再承担这些开销。"""
+        import matplotlib
+        matplotlib.use("Agg")
+        import autoProcess  # noqa: F401  (连带导入 sdd / pandas / akshare / deepSeekAi)
+        from trade_calendar import get_trade_calendar
+        get_trade_calendar()
+
+    # ------------------------------------------------------------------
+    # 信号
+    # ------------------------------------------------------------------
+    def _signal_key(self, code: str) -> tuple:
+        symbol = code.split(".")[0]
+        csv_path = DATA_DIR / symbol / f"{symbol}_Day.csv"
+        return _file_signature(csv_path), _file_signature(PARAMS_PATH), datetime.now().date().isoformat()
+
+    def signal(self, code: str) -> Tuple[tuple, bool]:
+        """返回 ((类型, 文本, 说明), 是否命中缓存)。"""
+        key = self._signal_key(code)
+        with self._lock:
+            cached = self._signals.get(code)
+        if cached is not None and cached[0] == key:
+            return cached[1], True
+        with self._compute_lock:
+            with self._lock:
+                cached = self._signals.get(code)
+            if cached is not None and cached[0] == key:
+                return cached[1], True
+            from autoProcess import get_trading_signal
+            from chart_render import get_render_queue
+            result = tuple(get_trading_signal(code, render_queue=get_render_queue()))
+        with self._lock:
+            self._signals[code] = (self._signal_key(code), result)
+        return result, False
+
+    def signals(self, codes: List[str], fetch_first: bool) -> List[Dict[str, Any]]:
+        from run import _fetch_one, _signal_entry, _signal_error
+
+        entries = []
+        for code in codes:
+            fetch_ok = None
+            if fetch_first:
+                with self._fetch_lock:
+                    fetch_ok = _fetch_one(code)
+            try:
+                result, cached = self.signal(code)
+                entry = _signal_entry(code, result, fetch_ok)
+                entry["cached"] = cached
+            except Exception as exc:
+                entry = _signal_error(code, exc, fetch_ok)
+            entries.append(entry)
+        return entries
+
+    # ------------------------------------------------------------------
+    # 请求处理
+    # ------------------------------------------------------------------
+    def run(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """执行 run.py 的一个模式，返回摘要 payload 的各段。"""
+        from run import run_fetch, run_pipeline
+
+        mode = request.get("mode", "signal")
+        codes = request.get("codes") or self.codes
+        fetch_first = not request.get("no_fetch", False)
+
+        if mode == "signal":
+            return {"signals": self.signals(codes, fetch_first)}
+        if mode == "fetch":
+            return {"fetch": run_fetch(codes)}
+        if mode in ("report", "all", "auto"):
+            with self._compute_lock:
+                return run_pipeline(
+                    mode, codes,
+                    fetch_first=fetch_first,
+                    no_ai=request.get("no_ai", False),
+                    no_mail=request.get("no_mail", False),
+                    send_email_auto=not request.get("no_mail_auto", False),
+                    jobs=request.get("jobs"),
+                    max_workers=request.get("max_workers") or 4,
+                    mail_digest=request.get("mail_digest"),
+                    mail_report=request.get("mail", False),
+                )
+        raise ValueError(f"不支持的模式: {mode}")
+
+    def start_optimize(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        code = str(request.get("code") or "").split(".")[0]
+        if not code:
+            raise ValueError("缺少 code")
+        job_id = uuid.uuid4().hex[:12]
+        job = {"id": job_id, "code": code, "status": "running", "started_at": time.time()}
+        with self._lock:
+            self._jobs[job_id] = job
+
+        def work():
+            from sdd import find_best_params
+            try:
+                results = find_best_params(code, seed=request.get("seed"),
+                                           num_processes=request.get("processes"))
+                job["result"] = [
+                    {"params": r.get("params"), "score_train": r.get("score_train")}
+                    for r in (results or [])[:5]
+                ]
+                job["status"] = "ok" if results else "empty"
+            except Exception as exc:
+                job["status"] = "error"
+                job["error"] = str(exc)
+            job["finished_at"] = time.time()
+
+        threading.Thread(target=work, name=f"optimize-{code}", daemon=True).start()
+        return {"job": job_id, "status": "running"}
+
+    def job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def health(self) -> Dict[str, Any]:
+        from frame_cache import get_frame_cache
+
+        with self._lock:
+            cached_codes = sorted(self._signals)
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "codes": self.codes,
+            "cached_signals": cached_codes,
+            "last_refresh": self.last_refresh,
+            "frame_cache": get_frame_cache().stats(),
+        }
+
+    # ------------------------------------------------------------------
+    # 定时刷新
+    # ------------------------------------------------------------------
+    def refresh(self) -> None:
+        """抓取（数据已是最新时 ETFTest 会跳过）并预计算全部代码的信号。"""
+        self.signals(self.codes, fetch_first=True)
+        self.last_refresh = time.time()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as exc:
+                print(f"[服务] 定时刷新失败: {exc}")
+            self._stop.wait(self.refresh_seconds)
+
+    def start_refresher(self) -> None:
+        if self.refresh_seconds > 0 and self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="service-refresh", daemon=True)
+            self._refresher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def make_handler(service: SignalService):
+    class ServiceHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            return
+
+        def _send_json(self, status: int, payload: Any) -> None:
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self) -> Dict[str, Any]:
+            length = int(self.headers.get("Content-Length") or 0)
+            if not length:
+                return {}
+            return json.loads(self.rfile.read(length).decode("utf-8"))
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            query = dict(parse_qsl(parts.query))
+            try:
+                if parts.path == "/health":
+                    return self._send_json(200, service.health())
+                if parts.path == "/signals":
+                    codes = [c for c in query.get("codes", "").split(",") if c] or service.codes
+                    return self._send_json(200, {"signals": service.signals(codes, fetch_first=False)})
+                if parts.path.startswith("/jobs/"):
+                    job = service.job(parts.path.rsplit("/", 1)[-1])
+                    return self._send_json(200 if job else 404, job or {"error": "job not found"})
+                return self._send_json(404, {"error": "not found"})
+            except Exception as exc:
+                return self._send_json(500, {"error": str(exc)})
+
+        def do_POST(self):
+            path = urlsplit(self.path).path
+            try:
+                request = self._read_json()
+                if path == "/run":
+                    return self._send_json(200, service.run(request))
+                if path == "/optimize":
+                    return self._send_json(202, service.start_optimize(request))
+                return self._send_json(404, {"error": "not found"})
+            except ValueError as exc:
+                return self._send_json(400, {"error": str(exc)})
+            except Exception as exc:
+                return self._send_json(500, {"error": str(exc)})
+
+    return ServiceHandler
+
+
+def serve(codes: List[str], host: str = SERVICE_HOST, port: int = SERVICE_PORT,
+          refresh_seconds: int = SERVICE_REFRESH_SECONDS, warm: bool = True) -> Tuple[ThreadingHTTPServer, SignalService]:
+    """创建服务（调用方负责 serve_forever / shutdown）。"""
+    service = SignalService(codes, refresh_seconds=refresh_seconds)
+    if warm:
+        service.warm_up()
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    service.start_refresher()
+    return server, service
+
+
+def call_service(url: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                 timeout: Optional[float] = SERVICE_CLIENT_TIMEOUT) -> Dict[str, Any]:
+    """
+    薄客户端：只依赖标准库。连接失败抛出 URLError（reason 为 ConnectionRefusedError 等），
+    服务端错误抛出 HTTPError，超过 timeout 秒抛出 TimeoutError 或 reason 为超时的 URLError。
+    """
+    from urllib.request import Request, urlopen
+
+    data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    req = Request(url.rstrip("/") + path, data=data, method="GET" if data is None else "POST",
+                  headers={"Content-Type": "application/json"})
+    with urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read().decode("utf-8"))
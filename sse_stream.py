@@ -0,0 +1,164 @@
+"""
+OpenAI 兼容接口的流式响应（server-sent events）解析。
+
+非流式调用要等完整回答生成完才返回，长推理很容易触发 400 秒读取超时，
+tenacity 重试又从头再来一次。流式调用逐块读取：
+- 读取超时只约束相邻两块之间的间隔，而不是整个回答；
+- 内容出现停止标记（如 </分析结束>）或报告段结束标记（如 </分析报告>）时即可提前结束读取；
+- section_callbacks 中的段结束标记（如 </策略输出>）一出现就回调，调用方可边读边提取各段结果；
+- 连接中途断开时已收到的内容保留下来，由调用方决定是否使用部分结果。
+
+用法（httpx / requests 的逐行迭代均可）：
+    acc = StreamAccumulator(stop_markers=("</分析结束>",), section_end="</分析报告>")
+    for line in response.iter_lines():
+        data = parse_sse_line(line)
+        if data is None:
+            continue
+        if data == SSE_DONE or acc.feed_json(data):
+            break
+    result = acc.result()
+"""
+
+import json
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+SSE_DONE = "[DONE]"
+
+# 流中断时附加在内容末尾的提示
+INTERRUPTED_NOTE = "[注意：连接中断，以上为已接收的部分内容]"
+
+
+def parse_sse_line(line: Union[str, bytes, None]) -> Optional[str]:
+    """解析一行 SSE，返回 data 字段内容；注释、空行及其他字段返回 None。"""
+    if not line:
+        return None
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", errors="replace")
+    if not line.startswith("data:"):
+        return None
+    return line[5:].strip()
+
+
+class StreamAccumulator:
+    """
+    累积 chat/completions 流式响应的增量内容。
+
+    feed / feed_json 每收到一块调用一次，返回 True 表示可以停止读取
+    （出现停止标记、报告段已结束且 stop_after_section=True，或服务端给出 finish_reason）。
+    """
+
+    def __init__(self, stop_markers: Iterable[str] = (), section_end: Optional[str] = None,
+                 stop_after_section: bool = True,
+                 on_section: Optional[Callable[[str], None]] = None,
+                 section_callbacks: Optional[Dict[str, Callable[[str], None]]] = None):
+        self.stop_markers = tuple(stop_markers)
+        self.section_end = section_end
+        self.stop_after_section = stop_after_section
+        self.on_section = on_section
+        # {段结束标记: 回调}，标记首次出现时以截至该标记的内容回调一次（不影响是否停止读取）
+        self._pending_sections = dict(section_callbacks or {})
+        self._text = ""
+        self._reasoning: list = []
+        self.finish_reason: Optional[str] = None
+        self.usage: Dict[str, Any] = {}
+        self.chunks = 0
+        self.stopped_early = False
+        self.section_closed = False
+        self.interrupted: Optional[str] = None
+
+    @property
+    def content(self) -> str:
+        return self._text
+
+    @property
+    def reasoning(self) -> str:
+        return "".join(self._reasoning)
+
+    @property
+    def done(self) -> bool:
+        return self.finish_reason is not None or self.stopped_early
+
+    def feed_json(self, data: str) -> bool:
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            return self.done
+        return self.feed(chunk)
+
+    def feed(self, chunk: Dict[str, Any]) -> bool:
+        self.chunks += 1
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+        for choice in chunk.get("choices") or []:
+            delta = choice.get("delta") or choice.get("message") or {}
+            if delta.get("reasoning_content"):
+                self._reasoning.append(delta["reasoning_content"])
+            if delta.get("content"):
+                self._append(delta["content"])
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+        return self.done
+
+    def _append(self, text: str) -> None:
+        if self.stopped_early:
+            return
+        # 标记可能跨块出现，只在新增内容附近查找
+        tail_len = max([len(m) for m in self.stop_markers] + [len(m) for m in self._pending_sections]
+                       + [len(self.section_end or "")]) - 1
+        start = max(0, len(self._text) - max(tail_len, 0))
+        self._text += text
+
+        for marker in self.stop_markers:
+            idx = self._text.find(marker, start)
+            if idx != -1:
+                # 与接口的 stop 参数一致：停止标记本身不计入内容
+                self._text = self._text[:idx]
+                self.stopped_early = True
+                break
+
+        for marker in list(self._pending_sections):
+            idx = self._text.find(marker, start)
+            if idx != -1:
+                self._pending_sections.pop(marker)(self._text[:idx + len(marker)])
+
+        if self.section_end and not self.section_closed:
+            idx = self._text.find(self.section_end, start)
+            if idx != -1:
+                self.section_closed = True
+                if self.on_section is not None:
+                    self.on_section(self._text[:idx + len(self.section_end)])
+                if self.stop_after_section:
+                    self._text = self._text[:idx + len(self.section_end)]
+                    self.stopped_early = True
+
+    def interrupt(self, reason: Any) -> None:
+        """记录读取中途断开（超时、连接重置等）。"""
+        self.interrupted = str(reason) or type(reason).__name__
+
+    def result(self) -> Dict[str, Any]:
+        """
+        返回与非流式 _process_response 相同结构的字典，另含：
+          streamed=True, stopped_early, partial（连接中断且内容不完整）
+        """
+        content = self.content
+        complete = self.stopped_early or self.finish_reason == "stop" or self.section_closed
+        partial = bool(self.interrupted) and not complete
+        if not complete:
+            if partial:
+                note = INTERRUPTED_NOTE
+            elif self.finish_reason == "length":
+                note = "[注意：响应因长度限制被截断]"
+            elif self.finish_reason == "content_filter":
+                note = "[注意：内容被安全策略过滤]"
+            else:
+                note = "[注意：响应未完成]"
+            content = f"{content}\n{note}"
+        return {
+            "content": content,
+            "reasoning": self.reasoning or "无详细推理",
+            "is_complete": complete,
+            "usage": self.usage,
+            "streamed": True,
+            "stopped_early": self.stopped_early,
+            "partial": partial,
+        }
@@ -0,0 +1,207 @@
+"""
+沪深交易所交易日历（本地缓存 + O(1) 查询）。
+
+- 数据来源 ak.tool_trade_date_hist_sina()，缓存到 stock_data/_cache/trade_calendar.json，
+  每 TRADE_CALENDAR_REFRESH_DAYS 天（或日历已不覆盖今天时）刷新一次；
+- 刷新失败时沿用旧缓存；完全没有缓存时退化为“周一至周五均为交易日”；
+- 加载后构建按日期序号的稠密数组，is_trading_day / previous_trading_day 均为数组下标访问；
+- is_data_current 用于在抓取/信号/报告前判断本地日线是否已是最新，避免无效请求和回测。
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+
+from config import TRADE_CALENDAR_PATH, TRADE_CALENDAR_REFRESH_DAYS
+
+BEIJING_TZ = timezone(timedelta(hours=8))
+MARKET_OPEN = (9, 30)
+MARKET_CLOSE = (15, 0)
+
+DateLike = Union[date, datetime, str]
+
+
+def _to_date(value: DateLike) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").date()
+
+
+def beijing_now() -> datetime:
+    return datetime.now(BEIJING_TZ)
+
+
+class TradeCalendar:
+    """交易日历索引：稠密布尔数组 + 前向填充的“最近交易日”数组。"""
+
+    def __init__(self, trade_dates: Iterable[DateLike] = (), source: str = "weekday"):
+        self.source = source
+        self._build(sorted({_to_date(d) for d in trade_dates}))
+
+    def _build(self, days: List[date]) -> None:
+        if not days:
+            self._start = 0
+            self._open = np.zeros(0, dtype=bool)
+            self._prev = np.zeros(0, dtype=np.int64)
+            self.first_day = self.last_day = None
+            return
+        self._start = days[0].toordinal()
+        size = days[-1].toordinal() - self._start + 1
+        self._open = np.zeros(size, dtype=bool)
+        self._open[[d.toordinal() - self._start for d in days]] = True
+        # _prev[i]: 不晚于第 i 天的最近交易日下标
+        self._prev = np.maximum.accumulate(np.where(self._open, np.arange(size), -1))
+        self.first_day, self.last_day = days[0], days[-1]
+
+    def __len__(self) -> int:
+        return int(self._open.sum())
+
+    def covers(self, day: DateLike) -> bool:
+        offset = _to_date(day).toordinal() - self._start
+        return 0 <= offset < len(self._open)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    def is_trading_day(self, day: DateLike) -> bool:
+        d = _to_date(day)
+        offset = d.toordinal() - self._start
+        if 0 <= offset < len(self._open):
+            return bool(self._open[offset])
+        return d.weekday() < 5
+
+    def previous_trading_day(self, day: DateLike, inclusive: bool = False) -> date:
+        """返回 day 之前（inclusive=True 时含当天）的最近交易日。"""
+        d = _to_date(day)
+        offset = d.toordinal() - self._start - (0 if inclusive else 1)
+        if 0 <= offset < len(self._prev) and self._prev[offset] >= 0:
+            return date.fromordinal(int(self._prev[offset]) + self._start)
+        # 超出日历范围：按工作日推算
+        cursor = d if inclusive else d - timedelta(days=1)
+        while not self.is_trading_day(cursor):
+            cursor -= timedelta(days=1)
+        return cursor
+
+    def next_trading_day(self, day: DateLike, inclusive: bool = False) -> date:
+        """返回 day 之后（inclusive=True 时含当天）的最近交易日。"""
+        cursor = _to_date(day) if inclusive else _to_date(day) + timedelta(days=1)
+        for _ in range(366):
+            if self.is_trading_day(cursor):
+                return cursor
+            cursor += timedelta(days=1)
+        return cursor
+
+    def expected_data_date(self, now: Optional[datetime] = None) -> date:
+        """当前时刻应能取得的最新日线日期：交易日开盘后为今天，否则为上一交易日。"""
+        now = now or beijing_now()
+        today = now.date()
+        if self.is_trading_day(today) and (now.hour, now.minute) >= MARKET_OPEN:
+            return today
+        return self.previous_trading_day(today)
+
+    def closed_session(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """
+        当前交易日已收盘时返回其收盘时刻（北京时间），交易日收盘前返回 None。
+        当前交易日：今天是交易日则为今天，否则为上一交易日（休市日视为已收盘）。
+        """
+        now = now or beijing_now()
+        today = now.date()
+        session = today if self.is_trading_day(today) else self.previous_trading_day(today)
+        close_at = datetime(session.year, session.month, session.day, MARKET_CLOSE[0], MARKET_CLOSE[1],
+                            tzinfo=now.tzinfo or BEIJING_TZ)
+        return close_at if now >= close_at else None
+
+    def is_data_current(self, last_data_date: Optional[DateLike], fetched_at: Optional[float] = None,
+                        now: Optional[datetime] = None) -> bool:
+        """
+        判断本地日线是否已是最新（无需再抓取）：
+        - 交易时段内今天的K线仍在变化，视为不是最新；
+        - 收盘后需包含今天的K线，且数据写入时间（fetched_at，时间戳）不早于收盘；
+        - 非交易日/开盘前只需包含上一交易日。
+        """
+        if not last_data_date:
+            return False
+        now = now or beijing_now()
+        expected = self.expected_data_date(now)
+        if _to_date(last_data_date) < expected:
+            return False
+        if expected != now.date():
+            return True
+        close_at = now.replace(hour=MARKET_CLOSE[0], minute=MARKET_CLOSE[1], second=0, microsecond=0)
+        if now < close_at:
+            return False
+        return fetched_at is None or fetched_at >= close_at.timestamp()
+
+    # ------------------------------------------------------------------
+    # 缓存
+    # ------------------------------------------------------------------
+    def to_json(self) -> dict:
+        days = [date.fromordinal(int(i) + self._start).isoformat() for i in np.flatnonzero(self._open)]
+        return {"source": self.source, "updated_at": time.time(), "dates": days}
+
+
+def _fetch_trade_dates() -> List[date]:
+    import akshare as ak
+
+    raw = ak.tool_trade_date_hist_sina()
+    values = raw.iloc[:, 0].tolist() if hasattr(raw, "iloc") else list(raw)
+    return [_to_date(v) for v in values]
+
+
+def load_trade_calendar(cache_path: Optional[Path] = None, refresh_days: Optional[int] = None,
+                        force_refresh: bool = False) -> TradeCalendar:
+    """读取本地缓存，必要时刷新；任何失败都不会抛出，最差退化为工作日日历。"""
+    cache_path = Path(cache_path or TRADE_CALENDAR_PATH)
+    refresh_days = TRADE_CALENDAR_REFRESH_DAYS if refresh_days is None else refresh_days
+
+    cached = None
+    if cache_path.exists():
+        try:
+            cached = json.loads(cache_path.read_text(encoding="utf-8"))
+        except Exception:
+            cached = None
+
+    today = beijing_now().date()
+    need_refresh = force_refresh or cached is None
+    if cached is not None and not need_refresh:
+        age_days = (time.time() - float(cached.get("updated_at", 0))) / 86400
+        last_day = cached["dates"][-1] if cached.get("dates") else ""
+        # 日历未覆盖今天（如新年度尚未发布）时每天最多重试一次
+        need_refresh = age_days >= refresh_days or (last_day < today.isoformat() and age_days >= 1)
+
+    if need_refresh:
+        try:
+            calendar = TradeCalendar(_fetch_trade_dates(), source="sina")
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(calendar.to_json(), ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, cache_path)
+            return calendar
+        except Exception as e:
+            print(f"[交易日历] 刷新失败，{'沿用本地缓存' if cached else '按工作日推算'}: {e}")
+
+    if cached and cached.get("dates"):
+        return TradeCalendar(cached["dates"], source=cached.get("source", "cache"))
+    return TradeCalendar(source="weekday")
+
+
+_shared_calendar: Optional[TradeCalendar] = None
+_shared_lock = threading.Lock()
+
+
+def get_trade_calendar() -> TradeCalendar:
+    """返回进程内共享的交易日历（首次调用时加载）。"""
+    global _shared_calendar
+    if _shared_calendar is None:
+        with _shared_lock:
+            if _shared_calendar is None:
+                _shared_calendar = load_trade_calendar()
+    return _shared_calendar
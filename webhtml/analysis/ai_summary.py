@@ -2,14 +2,19 @@
 
 根据《需求说明书.md》的模板组装 Prompt，并在 USE_DEEPSEEK 为真时
 调用 DeepSeek Chat Completions 接口生成当日AI结论（控制在约200字）。
+相同提示词的结论经项目根目录的 ai_cache 复用，命中时在结论前标注“缓存结果”。
+AI_STREAM 开启时以 SSE 流式读取（sse_stream），断线时保留已生成的部分结论。
 """
 
 from __future__ import annotations
 
-from typing import Dict
+from typing import Dict, Optional
 import requests
 
 from webhtml.config import settings
+from ai_cache import cached_label, get_ai_cache, request_key  # 项目根目录: DeepSeek 响应缓存
+from config import AI_STREAM  # 项目根目录: 是否流式读取模型输出
+from sse_stream import SSE_DONE, StreamAccumulator, parse_sse_line  # 项目根目录: SSE 增量解析
 
 
 def build_prompt_from_view(view: Dict) -> str:
@@ -71,20 +76,72 @@ def _deepseek_chat(prompt: str) -> str:
         "max_tokens": 1024*16,
         "temperature": 0,
         "top_p": 0,
-        "stream": False,
+        "stream": AI_STREAM,
         "response_format": {"type": "text"},
     }
+    cache = get_ai_cache()
+    cache_key = request_key(
+        model=payload["model"],
+        system_prompt=system_prompt,
+        user_prompt=prompt,
+        temperature=payload["temperature"],
+        top_p=payload["top_p"],
+    )
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return f"{cached_label(cached['created_at'])} {cached['response']}"
+
+    if AI_STREAM:
+        return _deepseek_chat_stream(url, headers, payload, cache_key)
+
     try:
         resp = requests.post(url, headers=headers, json=payload, timeout=60*3)
         resp.raise_for_status()
         data = resp.json()
-        return data.get("choices", [{}])[0].get("message", {}).get("content", "").strip() or "(AI返回空)"
+        content = data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
     except Exception:
         return "(AI调用失败)"
+    if not content:
+        return "(AI返回空)"
+    cache.put(cache_key, content, meta={"model": payload["model"]})
+    return content
+
+
+def _deepseek_chat_stream(url: str, headers: Dict, payload: Dict, cache_key: str) -> str:
+    """流式读取：timeout 约束连接与相邻数据块的间隔，而非整段回答。"""
+    acc = StreamAccumulator()
+    try:
+        with requests.post(url, headers=headers, json=payload, timeout=(10, 60*3), stream=True) as resp:
+            resp.raise_for_status()
+            resp.encoding = "utf-8"
+            try:
+                for line in resp.iter_lines(decode_unicode=True):
+                    data = parse_sse_line(line)
+                    if data is None:
+                        continue
+                    if data == SSE_DONE or acc.feed_json(data):
+                        break
+            except requests.RequestException as exc:
+                if not acc.content.strip():
+                    raise
+                acc.interrupt(exc)
+    except Exception:
+        return "(AI调用失败)"
+
+    result = acc.result()
+    content = acc.content.strip()
+    if not content:
+        return "(AI返回空)"
+    if result["partial"]:
+        return f"{content}（AI输出中断，以上为部分结论）"
+    if result["is_complete"]:
+        get_ai_cache().put(cache_key, content, meta={"model": payload["model"]})
+    return content
 
 
-def generate_ai_summary(view: Dict) -> str:
-    if not settings.USE_DEEPSEEK:
+def generate_ai_summary(view: Dict, use_ai: Optional[bool] = None) -> str:
+    """use_ai 为 None 时取 settings.USE_DEEPSEEK；按次传入，避免常驻服务中一次请求改写全局开关。"""
+    if not (settings.USE_DEEPSEEK if use_ai is None else use_ai):
         return "(未启用AI) 今日市场温度与风格已汇总，详见各表格。"
     prompt = build_prompt_from_view(view)
     return _deepseek_chat(prompt)
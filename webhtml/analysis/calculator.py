@@ -3,11 +3,18 @@
 将 fetcher 的原始数据转换为模板渲染所需结构：
 - 格式化涨跌幅显示(+/-X.XX%)与颜色类
 - 行业/主题排序与Top/Bottom高亮
+- 基于历史指标库的多日趋势列与走势小图(sparkline)
 """
 
 from __future__ import annotations
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+
+import pandas as pd
+
+# 走势小图(内联 SVG)尺寸
+SPARK_WIDTH = 80
+SPARK_HEIGHT = 20
 
 
 def _pct_to_str(p: float) -> str:
@@ -19,10 +26,61 @@ def _class_by_value(v: float) -> str:
     return "positive" if v >= 0 else "negative"
 
 
-def build_report_view(raw: Dict[str, Any]) -> Dict[str, Any]:
+def _sparkline(values: List[float]) -> str:
+    """将序列映射为 SVG polyline 的 points 字符串；有效点少于 2 个时返回空串。"""
+    values = [v for v in values if v == v]
+    if len(values) < 2:
+        return ""
+    lo, hi = min(values), max(values)
+    span = (hi - lo) or 1.0
+    step = SPARK_WIDTH / (len(values) - 1)
+    return " ".join(
+        f"{i * step:.1f},{(hi - v) / span * (SPARK_HEIGHT - 2) + 1:.1f}" for i, v in enumerate(values)
+    )
+
+
+def _history_series(history: Optional[pd.DataFrame], report_date: Optional[str]) -> Dict[Tuple[str, str], Tuple[list, list]]:
+    """将历史指标长表整理为 {(group, code): (value 列表, change_pct 列表)}，按日期升序，不含报告日。"""
+    if history is None or history.empty:
+        return {}
+    if report_date:
+        history = history[history["date"] < pd.Timestamp(report_date)]
+    series = {}
+    for (group, code), sub in history.sort_values("date").groupby(["group", "code"], observed=True):
+        series[(str(group), str(code))] = (sub["value"].tolist(), sub["change_pct"].tolist())
+    return series
+
+
+def _trend_fields(past: Optional[Tuple[list, list]], today_pct: float, today_value: Optional[float] = None) -> Dict[str, Any]:
+    """
+    多日趋势字段：有收盘价(指数)时按点位计算区间涨跌，否则按每日涨跌幅复利累计。
+    返回 trend_days / trend_pct_str / trend_class / spark；无历史时 trend_days 为 1、其余为空。
+    """
+    values, pcts = past if past else ([], [])
+    if today_value is not None:
+        path = [v for v in values if v == v] + [today_value]
+    else:
+        path = [1.0]
+        for p in [p for p in pcts if p == p] + [today_pct]:
+            path.append(path[-1] * (1 + p / 100))
+    days = len(path) if today_value is not None else len(path) - 1
+    if days < 2 or not path[0]:
+        return {"trend_days": days, "trend_pct_str": "", "trend_class": "", "spark": ""}
+    trend_pct = (path[-1] / path[0] - 1) * 100
+    return {
+        "trend_days": days,
+        "trend_pct_str": _pct_to_str(trend_pct),
+        "trend_class": _class_by_value(trend_pct),
+        "spark": _sparkline(path),
+    }
+
+
+def build_report_view(raw: Dict[str, Any], history: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
     """
     将原始市场数据转换为HTML模板渲染所需的结构化数据
     输入：raw - 包含市场指数、涨跌统计、风格、行业、风险指标、全球市场等原始数据
+          history - 可选，历史指标库中报告日之前的指标长表(见 history_store.load_trend_history)，
+                    提供时为指数、风格、行业生成多日趋势列与走势小图
     输出：格式化后的数据字典，包含涨跌幅显示格式、颜色类、排序高亮等模板渲染所需字段
     """
     result: Dict[str, Any] = {
@@ -30,6 +88,9 @@ def build_report_view(raw: Dict[str, Any]) -> Dict[str, Any]:
         "current_year": raw.get("date", "0000")[:4],
         "ai_summary": "(AI未开启)",
     }
+    past = _history_series(history, raw.get("date")) if raw.get("_source") != "mock" else {}
+    # 回退到 mock 的板块当天数值为占位 0，不与历史拼接
+    fallback = raw.get("_fallback", {})
 
     # A股市场温度
     # 构建A股市场温度（指数）部分
@@ -42,6 +103,8 @@ def build_report_view(raw: Dict[str, Any]) -> Dict[str, Any]:
             "change_class": _class_by_value(item["change_pct"]),  # 涨跌幅对应的颜色类
             "change_pct_str": _pct_to_str(item["change_pct"]),    # 涨跌幅格式化字符串（带正负号和百分号）
             "turnover_billion": f"{item['turnover_billion']}",    # 成交额（亿元）
+            **_trend_fields(None if fallback.get("indexes") else past.get(("index", str(item.get("code", "")))),
+                            item["change_pct"], float(item["close"])),
         })
     result["indexes"] = indexes
     
@@ -87,6 +150,8 @@ def build_report_view(raw: Dict[str, Any]) -> Dict[str, Any]:
                 "change_class": _class_by_value(it["change_pct"]),
                 "change_pct_str": _pct_to_str(it["change_pct"]),
                 "row_class": "bg-slate-50" if "价值" in cat else "",
+                **_trend_fields(None if fallback.get("styles") else past.get(("style", str(it["code"]))),
+                                it["change_pct"]),
             })
         styles_groups.append({"category": cat, "items": view_items})
     result["styles_groups"] = styles_groups
@@ -122,6 +187,8 @@ def build_report_view(raw: Dict[str, Any]) -> Dict[str, Any]:
             "name_text_class": name_text_class,
             "row_class": row_class,
             "leaders": leaders,
+            **_trend_fields(None if fallback.get("sectors") else past.get(("sector", str(s.get("code", "")))),
+                            s.get("change_pct", 0)),
         })
     result["sectors"] = view_sectors
 
@@ -184,6 +251,10 @@ def build_report_view(raw: Dict[str, Any]) -> Dict[str, Any]:
         globals_groups.append({"category": cat, "items": vitems})
     result["globals_groups"] = globals_groups
 
+    # 趋势列覆盖的交易日数(含报告日)；不足 2 日时模板不显示趋势列
+    trend_items = indexes + view_sectors + [it for g in styles_groups for it in g["items"]]
+    result["trend_days"] = max((it["trend_days"] for it in trend_items if it["spark"]), default=0)
+
     result["_raw"] = raw
     return result
 
@@ -10,10 +10,17 @@ OUTPUT_DIR = os.path.join(PROJECT_ROOT, "output")
 REPORT_DIR = os.path.join(OUTPUT_DIR, "reports")
 LOG_DIR = os.path.join(OUTPUT_DIR, "logs")
 DATA_DIR = os.path.join(OUTPUT_DIR, "data")
+# 每日报告指标历史库(按年份分区，见 data_handler/history_store.py)
+HISTORY_DIR = os.path.join(DATA_DIR, "history")
 
 # 模板目录
 TEMPLATES_DIR = os.path.join(PROJECT_ROOT, "templates")
 REPORT_TEMPLATE_NAME = "report_template.html"
+# Jinja 模板编译结果（字节码）缓存目录，新进程首次渲染时免去模板编译
+JINJA_CACHE_DIR = os.path.join(OUTPUT_DIR, "cache", "jinja")
+
+# 报告趋势列与走势小图覆盖的交易日数(含报告日)，0 表示关闭
+HISTORY_TREND_DAYS = int(os.getenv("REPORT_TREND_DAYS", "20"))
 
 # 功能开关
 SEND_MAIL = 1  # 可选邮件发送，默认关闭，由 main 控制
@@ -23,6 +30,10 @@ USE_DEEPSEEK = 1  # 可选AI总结，默认关闭；可复用 deepSeekAi.py
 DEEPSEEK_API_BASE = "https://api.siliconflow.cn/v1"
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY") or ""
 
+# 行情抓取并发配置：各板块并行构建，整体受统一截止时间约束，超时板块回退 mock
+FETCH_MAX_WORKERS = int(os.getenv("REPORT_FETCH_WORKERS", "6"))
+FETCH_DEADLINE_SECONDS = float(os.getenv("REPORT_FETCH_DEADLINE", "120"))
+
 
 def ensure_directories() -> None:
     """确保输出目录存在。"""
@@ -12,23 +12,25 @@ from __future__ import annotations
 
 from typing import Dict, Any, List, Optional, Tuple, Callable
 from datetime import datetime, date
+from concurrent.futures import Future, wait
 import logging
 import pandas as pd
+import queue
+import threading
 import time
 import random
 
 from webhtml.config import market_watch_list as watch  # 监控清单(指数/风格/行业/风险/全球)
 from webhtml.config import settings  # 路径与日期等配置
+from webhtml.data_handler.quote_table import QuoteTable  # 快照索引表(代码/名称/别名)
+from quote_cache import get_quote_cache  # 项目根目录: 各阶段共享的行情快照缓存
+from trade_calendar import get_trade_calendar  # 项目根目录: 本地缓存的沪深交易日历
 
-try:
-    import akshare as ak  # type: ignore
-except Exception:  # noqa: BLE001
-    ak = None  # 允许在无 akshare 环境下运行（mock）
+from lazy_import import lazy_import  # 项目根目录: 重量级依赖首次使用时才导入
 
-try:
-    import yfinance as yf  # type: ignore
-except Exception:  # noqa: BLE001
-    yf = None  # 允许在无 yfinance 环境下运行
+# 未安装时为 None（允许在无 akshare / yfinance 环境下运行，使用 mock）
+ak = lazy_import("akshare", optional=True)
+yf = lazy_import("yfinance", optional=True)
 
 import requests
 import re
@@ -245,22 +247,8 @@ def lastTradeDateStr() -> str:
     返回: YYYY-MM-DD 字符串。
     """
     try:
-        d = ak.tool_trade_date_hist_sina()
-        today_str = settings.today_str()
-        if hasattr(d, "to_frame"):
-            df = d.to_frame().reset_index(drop=True)
-            if df.shape[1] == 1:
-                values = df.iloc[:, 0].astype(str).tolist()
-            else:
-                values = [str(x) for x in df.astype(str).values.ravel().tolist()]
-        else:
-            values = [str(x) for x in list(d)]
-        today = today_str
-        candidates = [v[:10] for v in values]
-        candidates = [v for v in candidates if v <= today]
-        if not candidates:
-            return today
-        return candidates[-1]
+        today = datetime.strptime(settings.today_str(), "%Y-%m-%d").date()
+        return get_trade_calendar().previous_trading_day(today, inclusive=True).isoformat()
     except Exception as e:  # noqa: BLE001
         logging.warning("获取最近交易日失败，使用今日: %s", e)
         return settings.today_str()
@@ -363,36 +351,28 @@ def buildIndexes(watch_indexes: List[Dict[str, Any]],
                 continue
         
         if all_index_data:
-            idx_df = pd.concat(all_index_data, ignore_index=True).drop_duplicates(subset=["代码"])
-            
-            code_to_data = {}
-            for _, row in idx_df.iterrows():
-                code = str(row["代码"]).strip()
-                if code:
-                    code_to_data[code] = row
-            
+            idx_df = pd.concat(all_index_data, ignore_index=True)
+
+            # 按归一化代码建索引(含 sh/sz 前缀等别名)，查找为一次 reindex 连接
+            table = QuoteTable(idx_df, code_col="代码", name_col="名称")
+            value_cols = ["最新价", "涨跌幅", "成交额", "成交量", "振幅", "量比"]
+            matched = table.lookup_many([dct["code"] for dct in watch_indexes], value_cols)
+            matched[value_cols] = matched[value_cols].fillna(0.0)
+
             out: List[Dict[str, Any]] = []
-            for dct in watch_indexes:
-                code = dct["code"]
-                row = code_to_data.get(code)
-
-                if row is None:
-                    for k, v in code_to_data.items():
-                        if code in k or k in code:
-                            row = v
-                            break
-                    if row is None:
-                        continue
-                
+            for dct, (_, row) in zip(watch_indexes, matched.iterrows()):
+                if not row["_found"]:
+                    continue
+
                 out.append({
                     "name": dct["name"],
-                    "code": code,
-                    "close": toFloatMaybe(row.get("最新价")) or 0.0,
-                    "change_pct": toFloatMaybe(row.get("涨跌幅")) or 0.0,
-                    "turnover_billion": roundToInt((toFloatMaybe(row.get("成交额")) or 0.0) / 1e8),
-                    "volume": toFloatMaybe(row.get("成交量")) or 0.0,
-                    "amplitude": toFloatMaybe(row.get("振幅")) or 0.0,
-                    "volume_ratio": toFloatMaybe(row.get("量比")) or 0.0,
+                    "code": dct["code"],
+                    "close": float(row["最新价"]),
+                    "change_pct": float(row["涨跌幅"]),
+                    "turnover_billion": roundToInt(float(row["成交额"]) / 1e8),
+                    "volume": float(row["成交量"]),
+                    "amplitude": float(row["振幅"]),
+                    "volume_ratio": float(row["量比"]),
                 })
             
             if out:
@@ -518,15 +498,12 @@ def buildSectors(a_spot: Any, watch_sectors: List[Dict[str, Any]], mock_sectors:
         # 构建龙头股名称到涨跌幅的映射
         a_map: Dict[str, float] = {}
         
-        # 从 a_spot DataFrame 读取（东方财富或新浪备用数据）
-        if a_spot is not None and hasattr(a_spot, 'iterrows'):
+        # 从 a_spot DataFrame 读取（东方财富或新浪备用数据）：按名称建索引，向量化转换涨跌幅
+        if isinstance(a_spot, pd.DataFrame) and not a_spot.empty:
             a_name_col = firstCol(a_spot, ["名称"]) or "名称"
             a_pct_col = firstCol(a_spot, ["涨跌幅"]) or "涨跌幅"
-            for _, r in a_spot.iterrows():
-                n = str(r.get(a_name_col, "")).strip()
-                v = toFloatMaybe(r.get(a_pct_col))
-                if n:
-                    a_map[n] = float(v or 0.0)
+            table = QuoteTable(a_spot, code_col=None, name_col=a_name_col)
+            a_map = table.values_by_name(a_pct_col)
         
         # 如果 a_spot 为空，直接从新浪获取所有龙头股数据
         if not a_map:
@@ -708,40 +685,19 @@ def getCryptoChangePct(code: str) -> Optional[float]:
 
 def getSpecificEtfChangePct(code: str, sina_code: str = None) -> Optional[float]:
     """功能: 获取特定ETF最新一日涨跌幅(%)。
-    优先使用新浪接口（更稳定），失败时使用东方财富接口备用。
+    优先使用新浪接口（更稳定），失败时使用东方财富接口备用（经行情快照缓存）。
     参数: code (ETF代码), sina_code (新浪代码，可选)。
     返回: 浮点数涨跌幅或 None(获取失败)。
     """
-    # ===== 方案1: 优先使用新浪接口 =====
-    target_sina_code = sina_code or _convert_code_to_sina(code)
-    try:
-        sina_data = _sina_realtime_quote([target_sina_code])
-        if target_sina_code in sina_data:
-            return sina_data[target_sina_code].get("change_pct", 0.0)
-    except Exception as e:
-        logging.debug(f"新浪ETF {target_sina_code} 接口失败: {e}")
-    
-    # ===== 方案2: 东方财富接口备用 =====
-    try:
-        if ak is not None:
-            df = ak.fund_etf_hist_em(symbol=code, adjust="qfq")
-            if df is not None and not getattr(df, "empty", True) and len(df) >= 1:
-                latest = df.iloc[-1]
-                change = toFloatMaybe(latest.get("涨跌幅"))
-                if change is not None:
-                    return float(change)
-    except Exception as e:
-        logging.debug(f"东方财富ETF {code} 接口也失败: {e}")
-    
-    logging.warning(f"ETF {code} 所有接口均失败")
-    return None
+    result = getSpecificEtfChangePctWithPrice(code, sina_code)
+    if result is None:
+        return None
+    return result[0]
 
 
-def getSpecificEtfChangePctWithPrice(code: str, sina_code: str = None) -> Optional[Tuple[float, float]]:
-    """功能: 获取特定ETF最新一日涨跌幅(%)和价格。
-    优先使用新浪接口（更稳定），失败时使用东方财富接口备用。
-    参数: code (ETF代码), sina_code (新浪代码，可选)。
-    返回: (涨跌幅, 价格) 或 None(获取失败)。
+def _fetchEtfChangePctWithPrice(code: str, sina_code: str = None) -> Optional[List[float]]:
+    """功能: 实际请求ETF涨跌幅与价格(新浪优先，东方财富备用)，供行情快照缓存回源。
+    返回: [涨跌幅, 价格] 或 None(获取失败)。
     """
     # ===== 方案1: 优先使用新浪接口 =====
     target_sina_code = sina_code or _convert_code_to_sina(code)
@@ -751,7 +707,7 @@ def getSpecificEtfChangePctWithPrice(code: str, sina_code: str = None) -> Option
             data = sina_data[target_sina_code]
             change_pct = data.get("change_pct", 0.0)
             price = data.get("price", 0.0)
-            return (change_pct, price)
+            return [change_pct, price]
     except Exception as e:
         logging.debug(f"新浪ETF {target_sina_code} 接口失败: {e}")
     
@@ -764,7 +720,7 @@ def getSpecificEtfChangePctWithPrice(code: str, sina_code: str = None) -> Option
                 change = toFloatMaybe(latest.get("涨跌幅"))
                 close = toFloatMaybe(latest.get("收盘"))
                 if change is not None:
-                    return (float(change), float(close) if close else 0.0)
+                    return [float(change), float(close) if close else 0.0]
     except Exception as e:
         logging.debug(f"东方财富ETF {code} 接口也失败: {e}")
     
@@ -772,6 +728,29 @@ def getSpecificEtfChangePctWithPrice(code: str, sina_code: str = None) -> Option
     return None
 
 
+def getSpecificEtfChangePctWithPrice(code: str, sina_code: str = None) -> Optional[Tuple[float, float]]:
+    """功能: 获取特定ETF最新一日涨跌幅(%)和价格。
+    先查行情快照缓存：当前交易日已收盘、且信号/抓取阶段在收盘后写入了当天的日线快照时直接复用；
+    否则(盘中、快照为上一交易日或盘中抓取)读取实时行情快照(秒级有效，过期时先返回旧值并后台刷新)。
+    参数: code (ETF代码), sina_code (新浪代码，可选)。
+    返回: (涨跌幅, 价格) 或 None(获取失败)。
+    """
+    cache = get_quote_cache()
+    cache_code = str(code).split(".")[0].strip()
+
+    daily = cache.peek_entry("etf", cache_code, "daily")
+    close_at = get_trade_calendar().closed_session() if daily is not None else None
+    if (close_at is not None and daily["value"].get("date") == close_at.date().isoformat()
+            and daily["fetched_at"] >= close_at.timestamp()):
+        value = daily["value"]
+        return (float(value["change_pct"]), float(value["price"]))
+
+    value = cache.get("etf", cache_code, "quote", lambda: _fetchEtfChangePctWithPrice(code, sina_code))
+    if value is None:
+        return None
+    return (float(value[0]), float(value[1]))
+
+
 def buildRisks(watch_risks: List[Dict[str, Any]], mock_risks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], bool]:
     """功能: 汇总风险偏好与风险锚指标。
     参数: watch_risks 为监控清单, mock_risks 为回退数据。
@@ -987,39 +966,20 @@ def buildGlobals(watch_globals: List[Dict[str, Any]], mock_globals: List[Dict[st
         return mock_globals, True
 
 
-def fetch_all_data() -> Dict[str, Any]:
-    """获取全部原始数据快照；失败时按片段回退到 mock，并标记来源。
-
-    功能:
-    - 汇总当日或最近交易日的市场原始数据，覆盖指数、涨跌家数、风格ETF、行业与主题ETF(含龙头)、风险偏好、全球关联。
-    - 结果直接供上层 analysis 与报表模板使用。
-
-    参数:
-    - 无
-
-    返回:
-    - 类型: Dict[str, Any]，结构参考 _mock_raw_data。
+def _fetch_leader_spot() -> Any:
+    """功能: 获取行业龙头股快照(名称/涨跌幅)，供 buildSectors 使用。
+    优先使用新浪接口（更稳定），失败时使用东方财富 A 股快照备用。
+    返回: DataFrame 或 None。
     """
-    # 若 ak 不可用，直接返回 mock
-    if ak is None:
-        return _mock_raw_data()
-
-    # 调用一次 mock，供回退时复用片段
-    mock = _mock_raw_data()
-
-    # 日期
-    report_date = lastTradeDateStr()
-
-    # 拉取龙头股数据：优先使用新浪接口（更稳定）
     a_spot = None
-    
+
     # ===== 方案1: 优先使用新浪接口获取龙头股数据 =====
     try:
         logging.info("使用新浪接口获取龙头股数据...")
         # 从配置中读取龙头股的新浪代码（自动同步，无需手动维护）
         codes_to_fetch = []
         code_to_name = {}
-        
+
         for sector in watch.SECTORS:
             for leader in sector.get("leaders", []):
                 if isinstance(leader, dict):
@@ -1028,10 +988,10 @@ def fetch_all_data() -> Dict[str, Any]:
                     if sina_code and name:
                         codes_to_fetch.append(sina_code)
                         code_to_name[sina_code] = name
-        
+
         if codes_to_fetch:
             sina_data = _sina_realtime_quote(codes_to_fetch)
-            
+
             if sina_data:
                 rows = []
                 for sina_code, name in code_to_name.items():
@@ -1041,13 +1001,13 @@ def fetch_all_data() -> Dict[str, Any]:
                             "名称": name,
                             "涨跌幅": data.get("change_pct", 0.0),
                         })
-                
+
                 if rows:
                     a_spot = pd.DataFrame(rows)
                     logging.info("A股龙头股数据获取成功 (新浪接口), 共 %d 条", len(a_spot))
     except Exception as e:
         logging.warning("新浪接口获取龙头股失败: %s", e)
-    
+
     # ===== 方案2: 东方财富接口备用 =====
     if a_spot is None or (hasattr(a_spot, 'empty') and a_spot.empty):
         try:
@@ -1059,32 +1019,151 @@ def fetch_all_data() -> Dict[str, Any]:
             logging.warning("东方财富A股快照也失败: %s", e)
             a_spot = None
 
+    return a_spot
 
 
-    # 构造各段
-  
-    logging.info("开始构建指数数据...")
-    indexes, fb_idx = buildIndexes(watch.INDEXES, mock["indexes"])                   # 构建指数数据，fb_idx为是否回退到mock
-    logging.info("开始构建涨跌家数数据...")
-    up_down, fb_ud = buildUpDown(mock["up_down"])                                     # 构建涨跌家数，fb_ud为是否回退到mock
-    logging.info("开始构建风格ETF数据...")
-    styles, fb_st = buildStyles(watch.STYLES, mock["styles"])              # 构建风格ETF数据，fb_st为是否回退到mock
-    logging.info("开始构建行业与主题ETF数据...")
-    sectors, fb_sc = buildSectors(a_spot, watch.SECTORS, mock["sectors"])  # 构建行业与主题ETF数据，fb_sc为是否回退到mock
-    logging.info("开始构建风险偏好数据...")
-    risks, fb_rk = buildRisks(watch.RISKS, mock["risks"])                  # 构建风险偏好数据，fb_rk为是否回退到mock
-    logging.info("开始构建全球关联数据...")
-    globals_list, fb_gl = buildGlobals(watch.GLOBALS, mock["globals"])               # 构建全球关联数据，fb_gl为是否回退到mock
-    # 创建回退标志字典，记录各个数据源的回退状态
-    # 每个键值对表示对应数据类别是否使用了回退数据源
-    fallback_flags: Dict[str, bool] = {
-        "indexes": fb_idx,    # 指数数据回退标志
-        "up_down": fb_ud,     # 涨跌数据回退标志
-        "styles": fb_st,      # 风格数据回退标志
-        "sectors": fb_sc,     # 行业数据回退标志
-        "risks": fb_rk,       # 风险数据回退标志
-        "globals": fb_gl,     # 全球数据回退标志
+def _timed_section(name: str, builder: Callable[[], Tuple[Any, bool]]) -> Tuple[Any, bool, float, Optional[Exception]]:
+    """功能: 在工作线程中执行单个板块构建函数并计时。
+    参数: name 为板块名(仅用于日志), builder 为无参构建函数，返回 (数据, 是否回退)。
+    返回: (数据, 是否回退, 耗时秒数, 异常或 None)。
+    """
+    logging.info("开始构建%s数据...", name)
+    start = time.perf_counter()
+    try:
+        data, fallback = builder()
+    except Exception as e:  # noqa: BLE001
+        return None, True, time.perf_counter() - start, e
+    elapsed = time.perf_counter() - start
+    logging.info("%s数据构建完成，耗时 %.2f 秒%s", name, elapsed, "（使用mock）" if fallback else "")
+    return data, fallback, elapsed, None
+
+
+def _start_daemon_workers(jobs: Dict[str, Callable[[], Any]], max_workers: int,
+                          name_prefix: str) -> Dict[Future, str]:
+    """功能: 用守护线程执行一组无参任务，返回 {Future: 任务键}。
+    与 ThreadPoolExecutor 不同，解释器退出时不会 join 守护线程，卡住的网络请求不会拖住进程；
+    尚未开始的任务可以 Future.cancel() 取消。
+    """
+    pending: "queue.SimpleQueue[Tuple[Future, Callable[[], Any]]]" = queue.SimpleQueue()
+    futures: Dict[Future, str] = {}
+    for key, job in jobs.items():
+        fut: Future = Future()
+        futures[fut] = key
+        pending.put((fut, job))
+
+    def worker() -> None:
+        while True:
+            try:
+                fut, job = pending.get_nowait()
+            except queue.Empty:
+                return
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(job())
+            except BaseException as exc:  # noqa: BLE001
+                fut.set_exception(exc)
+
+    for n in range(max(1, min(max_workers, len(jobs)))):
+        threading.Thread(target=worker, name=f"{name_prefix}_{n}", daemon=True).start()
+    return futures
+
+
+def _run_sections_with_deadline(sections: Dict[str, Callable[[], Tuple[Any, bool]]],
+                                mock_slices: Dict[str, Any],
+                                deadline_seconds: float,
+                                max_workers: int) -> Tuple[Dict[str, Any], Dict[str, bool], Dict[str, Dict[str, Any]]]:
+    """功能: 在守护线程中并发构建各板块，整体受统一截止时间约束。
+    参数: sections 为 {板块键: 构建函数}, mock_slices 为 {板块键: mock 片段},
+          deadline_seconds 为整体时间预算(秒), max_workers 为线程数。
+    返回: (板块数据字典, 回退标志字典, 各板块耗时信息字典)。
+    超时或异常的板块回退到对应 mock 片段并标记回退；超时线程不再等待（结果丢弃），
+    且为守护线程，进程退出时不会被仍在进行的网络请求阻塞。
+    """
+    results: Dict[str, Any] = {}
+    fallback_flags: Dict[str, bool] = {}
+    timings: Dict[str, Dict[str, Any]] = {}
+
+    start = time.perf_counter()
+    futures = _start_daemon_workers(
+        {key: (lambda key=key, builder=builder: _timed_section(key, builder)) for key, builder in sections.items()},
+        max_workers, "report-fetch")
+    done, not_done = wait(futures, timeout=max(0.0, deadline_seconds))
+    for fut in done:
+        key = futures[fut]
+        data, fallback, elapsed, error = fut.result()
+        if error is not None:
+            logging.warning("%s 构建异常，使用mock: %s", key, error)
+            results[key] = mock_slices[key]
+            fallback_flags[key] = True
+            timings[key] = {"seconds": round(elapsed, 3), "status": "error"}
+        else:
+            results[key] = data
+            fallback_flags[key] = bool(fallback)
+            timings[key] = {"seconds": round(elapsed, 3), "status": "fallback" if fallback else "ok"}
+    for fut in not_done:
+        key = futures[fut]
+        # 尚未开始的板块直接取消；已在运行的守护线程不再等待（结果丢弃）
+        fut.cancel()
+        logging.warning("%s 超过截止时间 %.1f 秒，使用mock", key, deadline_seconds)
+        results[key] = mock_slices[key]
+        fallback_flags[key] = True
+        timings[key] = {"seconds": round(time.perf_counter() - start, 3), "status": "timeout"}
+
+    # 按板块声明顺序输出耗时，便于对比
+    timings = {key: timings[key] for key in sections}
+    return results, fallback_flags, timings
+
+
+def fetch_all_data() -> Dict[str, Any]:
+    """获取全部原始数据快照；失败时按片段回退到 mock，并标记来源。
+
+    功能:
+    - 汇总当日或最近交易日的市场原始数据，覆盖指数、涨跌家数、风格ETF、行业与主题ETF(含龙头)、风险偏好、全球关联。
+    - 各板块相互独立，在线程池中并发构建，整体受 settings.FETCH_DEADLINE_SECONDS 约束；
+      超时板块回退到 mock 片段并标记回退，总耗时约为最慢板块耗时而非各板块之和。
+    - 各板块耗时记录在 "_timings" 中，随原始数据一起备份。
+    - 结果直接供上层 analysis 与报表模板使用。
+
+    参数:
+    - 无
+
+    返回:
+    - 类型: Dict[str, Any]，结构参考 _mock_raw_data。
+    """
+    # 若 ak 不可用，直接返回 mock
+    if ak is None:
+        return _mock_raw_data()
+
+    # 调用一次 mock，供回退时复用片段
+    mock = _mock_raw_data()
+    started = time.perf_counter()
+
+    # 构造各段（相互独立，可并发）；行业板块依赖龙头股快照，在同一任务内先取快照
+    sections: Dict[str, Callable[[], Tuple[Any, bool]]] = {
+        "date": lambda: (lastTradeDateStr(), False),
+        "indexes": lambda: buildIndexes(watch.INDEXES, mock["indexes"]),
+        "up_down": lambda: buildUpDown(mock["up_down"]),
+        "styles": lambda: buildStyles(watch.STYLES, mock["styles"]),
+        "sectors": lambda: buildSectors(_fetch_leader_spot(), watch.SECTORS, mock["sectors"]),
+        "risks": lambda: buildRisks(watch.RISKS, mock["risks"]),
+        "globals": lambda: buildGlobals(watch.GLOBALS, mock["globals"]),
     }
+    mock_slices: Dict[str, Any] = {key: mock[key] for key in sections if key != "date"}
+    mock_slices["date"] = settings.today_str()
+
+    results, flags, timings = _run_sections_with_deadline(
+        sections,
+        mock_slices,
+        deadline_seconds=settings.FETCH_DEADLINE_SECONDS,
+        max_workers=settings.FETCH_MAX_WORKERS,
+    )
+    total_seconds = time.perf_counter() - started
+    logging.info("全部板块构建完成，总耗时 %.2f 秒", total_seconds)
+
+    # 创建回退标志字典，记录各个数据源的回退状态
+    # 每个键值对表示对应数据类别是否使用了回退数据源（日期不计入）
+    fallback_flags: Dict[str, bool] = {key: flags[key] for key in sections if key != "date"}
 
     # 统计使用回退数据源的数据类别数量
     fb_count = sum(1 for v in fallback_flags.values() if v)
@@ -1098,13 +1177,18 @@ def fetch_all_data() -> Dict[str, Any]:
         source_tag = "mixed"      # 部分回退：混合使用akshare和模拟数据
 
     return {
-        "date": report_date,
-        "indexes": indexes,
-        "up_down": up_down,
-        "styles": styles,
-        "sectors": sectors,
-        "risks": risks,
-        "globals": globals_list,
+        "date": results["date"],
+        "indexes": results["indexes"],
+        "up_down": results["up_down"],
+        "styles": results["styles"],
+        "sectors": results["sectors"],
+        "risks": results["risks"],
+        "globals": results["globals"],
         "_source": source_tag,
+        "_fallback": fallback_flags,
+        "_timings": {
+            "total_seconds": round(total_seconds, 3),
+            "deadline_seconds": settings.FETCH_DEADLINE_SECONDS,
+            "sections": timings,
+        },
     }
-
@@ -0,0 +1,358 @@
+"""历史指标库(history_store)
+
+backup_raw_data 每天把原始快照以带缩进的 JSON 写入 output/data/raw_data_{date}.json，
+"某行业近 60 日排名如何"之类的问题要逐个读取、解析几十个文件。这里把每日报告的关键数值
+整理成长表，按年份分区保存：
+- 列: date / group / code / name / value / change_pct，group 为
+  index(value=收盘点位) / breadth(code 为 up、down，value=家数) / style / sector /
+  risk(value=价格) / global(value=价格)；
+- 目录结构: output/data/history/YYYY.pkl + manifest.json（记录每个分区的日期范围与行数），
+  查询只打开与区间重叠的年份，已读分区按文件 mtime 缓存在进程内；
+- 同一日期重复写入时整体替换当天的行（重跑报告不会产生重复）；
+- 回退到 mock 的板块不入库，避免占位的 0 值污染趋势；
+- import_json 可批量导入旧的 raw_data_*.json 备份，每个年份分区只重写一次。
+
+用法:
+  python -m webhtml.data_handler.history_store import [目录或文件...]   # 默认 output/data
+  python -m webhtml.data_handler.history_store show sector 512760 --days 60
+  python -m webhtml.data_handler.history_store rank sector --days 20
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import argparse
+import glob
+import json
+import logging
+import os
+import threading
+
+import pandas as pd
+
+from webhtml.config import settings
+
+logger = logging.getLogger(__name__)
+
+GROUPS = ("index", "breadth", "style", "sector", "risk", "global")
+COLUMNS = ["date", "group", "code", "name", "value", "change_pct"]
+
+# 原始快照中的板块 -> (group, 名称字段, 数值字段, 涨跌字段)
+_SECTION_FIELDS = {
+    "indexes": ("index", "name", "close", "change_pct"),
+    "styles": ("style", "name", None, "change_pct"),
+    "sectors": ("sector", "etf_name", None, "change_pct"),
+    "risks": ("risk", "name", "price", "value_or_change"),
+    "globals": ("global", "indicator", "price", "value_or_change"),
+}
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def extract_metrics(raw: Dict[str, Any]) -> pd.DataFrame:
+    """功能: 从 fetch_all_data 的原始快照提取当天的指标行。
+    参数: raw 为原始快照(含 date 与各板块列表)。
+    返回: COLUMNS 列的 DataFrame；全部为 mock 或无日期时为空表。
+    """
+    date = raw.get("date")
+    if not date or raw.get("_source") == "mock":
+        return pd.DataFrame(columns=COLUMNS)
+    fallback = raw.get("_fallback", {})
+
+    rows: List[Tuple] = []
+    for section, (group, name_key, value_key, change_key) in _SECTION_FIELDS.items():
+        if fallback.get(section):
+            continue
+        for item in raw.get(section) or []:
+            code = str(item.get("code") or item.get(name_key) or "").strip()
+            if not code:
+                continue
+            rows.append((
+                date, group, code, str(item.get(name_key, "")),
+                _to_float(item.get(value_key)) if value_key else float("nan"),
+                _to_float(item.get(change_key)),
+            ))
+    up_down = raw.get("up_down") or {}
+    if up_down and not fallback.get("up_down"):
+        for key, name in (("up", "上涨家数"), ("down", "下跌家数")):
+            rows.append((date, "breadth", key, name, _to_float(up_down.get(key)), float("nan")))
+
+    frame = pd.DataFrame(rows, columns=COLUMNS)
+    frame["date"] = pd.to_datetime(frame["date"])
+    return frame
+
+
+class HistoryStore:
+    """按年份分区的每日报告指标库(长表，线程安全)。"""
+
+    MANIFEST_NAME = "manifest.json"
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or settings.HISTORY_DIR
+        self._lock = threading.RLock()
+        self._partitions: Dict[str, Tuple[int, pd.DataFrame]] = {}
+
+    # ------------------------------------------------------------------
+    # 分区与清单
+    # ------------------------------------------------------------------
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, self.MANIFEST_NAME)
+
+    def load_manifest(self) -> Dict[str, Any]:
+        """读取分区清单；不存在或损坏时返回空清单。"""
+        try:
+            with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"partitions": {}}
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        tmp_path = f"{self._manifest_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self._manifest_path())
+
+    def _read_partition(self, year: str, meta: Dict[str, Any]) -> pd.DataFrame:
+        path = os.path.join(self.directory, meta["file"])
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return pd.DataFrame(columns=COLUMNS)
+        cached = self._partitions.get(year)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        frame = pd.read_pickle(path)
+        self._partitions[year] = (mtime, frame)
+        return frame
+
+    def _write_partition(self, year: str, frame: pd.DataFrame) -> Dict[str, Any]:
+        filename = f"{year}.pkl"
+        path = os.path.join(self.directory, filename)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        frame = frame.sort_values(["date", "group", "code"], kind="stable").reset_index(drop=True)
+        for col in ("group", "code", "name"):
+            frame[col] = frame[col].astype("category")
+        frame.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+        self._partitions[year] = (os.stat(path).st_mtime_ns, frame)
+        return {
+            "file": filename,
+            "start": frame["date"].iloc[0].strftime("%Y-%m-%d"),
+            "end": frame["date"].iloc[-1].strftime("%Y-%m-%d"),
+            "days": int(frame["date"].nunique()),
+            "rows": int(len(frame)),
+        }
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def append(self, metrics: pd.DataFrame) -> int:
+        """功能: 写入若干天的指标行，已存在的日期整体替换。返回写入的天数。"""
+        if metrics is None or metrics.empty:
+            return 0
+        metrics = metrics.drop_duplicates(subset=["date", "group", "code"], keep="last")
+        years = metrics["date"].dt.strftime("%Y")
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            manifest = self.load_manifest()
+            for year, chunk in metrics.groupby(years, sort=True):
+                meta = manifest["partitions"].get(year)
+                if meta:
+                    existing = self._read_partition(year, meta)
+                    existing = existing[~existing["date"].isin(chunk["date"].unique())]
+                    # 分类列先转回普通列再拼接，避免类别不一致时退化为 object 且丢失压缩
+                    chunk = pd.concat([existing.astype({c: str for c in ("group", "code", "name")}), chunk],
+                                      ignore_index=True)
+                manifest["partitions"][year] = self._write_partition(year, chunk)
+            self._save_manifest(manifest)
+        return int(metrics["date"].nunique())
+
+    def record(self, raw: Dict[str, Any]) -> int:
+        """功能: 从原始快照提取指标并写入。返回写入的行数。"""
+        metrics = extract_metrics(raw)
+        self.append(metrics)
+        return len(metrics)
+
+    def import_json(self, paths: Iterable[str]) -> int:
+        """功能: 批量导入 raw_data_*.json 备份(所有文件解析后一次写入)。返回导入的天数。"""
+        frames = []
+        for path in sorted(paths):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+            except (OSError, ValueError) as exc:
+                logger.warning("历史指标导入跳过 %s: %s", path, exc)
+                continue
+            metrics = extract_metrics(raw)
+            if not metrics.empty:
+                frames.append(metrics)
+        if not frames:
+            return 0
+        return self.append(pd.concat(frames, ignore_index=True))
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    def load(self, start: Optional[str] = None, end: Optional[str] = None,
+             group: Optional[str] = None, codes: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """功能: 读取 [start, end] 区间的指标长表，可按 group 与代码过滤。"""
+        start_ts = pd.Timestamp(start) if start is not None else None
+        end_ts = pd.Timestamp(end) if end is not None else None
+        with self._lock:
+            manifest = self.load_manifest()
+            frames = []
+            for year in sorted(manifest["partitions"]):
+                meta = manifest["partitions"][year]
+                if start_ts is not None and pd.Timestamp(meta["end"]) < start_ts:
+                    continue
+                if end_ts is not None and pd.Timestamp(meta["start"]) > end_ts:
+                    continue
+                frames.append(self._read_partition(year, meta))
+        codes = [str(c) for c in codes] if codes is not None else None
+        parts = []
+        for df in frames:
+            # 先在各分区内过滤再拼接，跨年查询不必复制整年的数据
+            mask = pd.Series(True, index=df.index)
+            if start_ts is not None:
+                mask &= df["date"] >= start_ts
+            if end_ts is not None:
+                mask &= df["date"] <= end_ts
+            if group is not None:
+                mask &= df["group"] == group
+            if codes is not None:
+                mask &= df["code"].isin(codes)
+            if mask.any():
+                parts.append(df[mask].astype({c: str for c in ("group", "code", "name")}))
+        if not parts:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.concat(parts, ignore_index=True)
+
+    def dates(self) -> List[str]:
+        """功能: 返回库中全部日期(升序，YYYY-MM-DD)。"""
+        df = self.load()
+        return [d.strftime("%Y-%m-%d") for d in sorted(df["date"].unique())] if not df.empty else []
+
+    def recent(self, days: int, end: Optional[str] = None, group: Optional[str] = None) -> pd.DataFrame:
+        """功能: 返回截至 end(含)的最近 days 个交易日的指标长表；days <= 0 时返回空表。"""
+        if days <= 0:
+            return pd.DataFrame(columns=COLUMNS)
+        if end is None:
+            manifest = self.load_manifest()["partitions"]
+            if not manifest:
+                return pd.DataFrame(columns=COLUMNS)
+            end = max(meta["end"] for meta in manifest.values())
+        # 先按自然日粗略放宽区间(交易日 ≈ 自然日 × 5/7，另加长假余量)，再精确截取
+        start = (pd.Timestamp(end) - pd.Timedelta(days=days * 7 // 5 + 20)).strftime("%Y-%m-%d")
+        df = self.load(start=start, end=end, group=group)
+        if df.empty:
+            return df
+        keep = sorted(df["date"].unique())[-days:]
+        return df[df["date"].isin(keep)].reset_index(drop=True)
+
+    def panel(self, group: str, field: str = "change_pct", days: int = 60,
+              end: Optional[str] = None) -> pd.DataFrame:
+        """功能: 返回 日期 × 代码 的宽表(field 取 value 或 change_pct)。"""
+        df = self.recent(days, end=end, group=group)
+        if df.empty:
+            return pd.DataFrame()
+        return df.pivot(index="date", columns="code", values=field)
+
+    def series(self, group: str, code: str, field: str = "change_pct", days: int = 60,
+               end: Optional[str] = None) -> pd.Series:
+        """功能: 单个代码最近 days 日的时间序列。"""
+        panel = self.panel(group, field=field, days=days, end=end)
+        if panel.empty or code not in panel.columns:
+            return pd.Series(dtype=float)
+        return panel[code].dropna()
+
+    def ranks(self, group: str = "sector", days: int = 60, end: Optional[str] = None) -> pd.DataFrame:
+        """功能: 每日按涨跌幅排名(1 为当日最强)，日期 × 代码。"""
+        panel = self.panel(group, field="change_pct", days=days, end=end)
+        if panel.empty:
+            return panel
+        return panel.rank(axis=1, ascending=False, method="min")
+
+    def stats(self) -> Dict[str, Any]:
+        partitions = self.load_manifest()["partitions"]
+        return {
+            "partitions": len(partitions),
+            "days": sum(meta.get("days", 0) for meta in partitions.values()),
+            "rows": sum(meta.get("rows", 0) for meta in partitions.values()),
+            "start": min((meta["start"] for meta in partitions.values()), default=None),
+            "end": max((meta["end"] for meta in partitions.values()), default=None),
+        }
+
+
+_shared_store: Optional[HistoryStore] = None
+_shared_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    """返回进程内共享的历史指标库。"""
+    global _shared_store
+    if _shared_store is None:
+        with _shared_lock:
+            if _shared_store is None:
+                _shared_store = HistoryStore()
+    return _shared_store
+
+
+def load_trend_history(report_date: Optional[str] = None, days: Optional[int] = None) -> Optional[pd.DataFrame]:
+    """功能: 读取报告日之前最近 days 个交易日的指标(不含报告日当天)，供 build_report_view 生成趋势列。
+    参数: days 默认为 settings.HISTORY_TREND_DAYS，含报告日当天；
+          不足 2 日(无历史可取)或读取失败时返回 None(报告不显示趋势)。
+    """
+    days = settings.HISTORY_TREND_DAYS if days is None else days
+    if days - 1 < 1:
+        return None
+    try:
+        end = None
+        if report_date:
+            end = (pd.Timestamp(report_date) - pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+        return get_history_store().recent(days - 1, end=end)
+    except Exception as exc:
+        logger.warning("读取历史指标失败，报告不显示趋势: %s", exc)
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="报告历史指标库")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="导入 raw_data_*.json 备份")
+    p_import.add_argument("paths", nargs="*", help="JSON 文件或目录，默认 output/data")
+    p_show = sub.add_parser("show", help="显示单个代码的序列")
+    p_show.add_argument("group", choices=GROUPS)
+    p_show.add_argument("code")
+    p_show.add_argument("--field", default="change_pct", choices=["change_pct", "value"])
+    p_show.add_argument("--days", type=int, default=60)
+    p_rank = sub.add_parser("rank", help="显示每日涨跌幅排名")
+    p_rank.add_argument("group", nargs="?", default="sector", choices=GROUPS)
+    p_rank.add_argument("--days", type=int, default=20)
+    sub.add_parser("status", help="显示分区统计")
+    args = parser.parse_args(argv)
+
+    store = get_history_store()
+    if args.command == "import":
+        files: List[str] = []
+        for path in args.paths or [settings.DATA_DIR]:
+            if os.path.isdir(path):
+                files.extend(glob.glob(os.path.join(path, "raw_data_*.json")))
+            else:
+                files.append(path)
+        print(f"导入 {store.import_json(files)} 天（共 {len(files)} 个文件）")
+        print(store.stats())
+    elif args.command == "show":
+        print(store.series(args.group, args.code, field=args.field, days=args.days).to_string())
+    elif args.command == "rank":
+        print(store.ranks(args.group, days=args.days).to_string())
+    else:
+        print(store.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""行情索引表(quote_table)
+
+将东方财富等接口返回的整表快照(数千行)构建为一次性索引，
+替代逐行 iterrows + 子串扫描的查找方式：
+- 按归一化代码索引(去掉 sh/sz/bj 前缀、.SH/.SZ 后缀，统一为 6 位)；
+- 按名称索引；
+- 预计算代码别名表(原始代码、带市场前缀、带后缀等)，模糊代码匹配变为字典命中；
+- 数值列一次性向量化转换(兼容 "1.23%"、"1,234" 等字符串格式)。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional
+import re
+
+import pandas as pd
+
+
+_MARKET_PREFIXES = ("sh", "sz", "bj")
+_DIGITS_RE = re.compile(r"(\d+)")
+
+
+def normalize_code(code: Any) -> str:
+    """功能: 代码归一化。
+    参数: code，如 "sh000001"、"000001"、"000001.SH"、1。
+    返回: 6 位数字代码；无法识别数字时返回小写去空格的原值。
+    """
+    text = str(code).strip().lower()
+    if not text:
+        return ""
+    text = text.split(".")[0]
+    if text[:2] in _MARKET_PREFIXES:
+        text = text[2:]
+    match = _DIGITS_RE.search(text)
+    if not match:
+        return text
+    digits = match.group(1)
+    return digits[-6:].zfill(6)
+
+
+def _code_aliases(raw_code: str, norm: str) -> List[str]:
+    """功能: 生成单个代码的全部别名(用于模糊匹配的字典索引)。"""
+    aliases = {raw_code.strip().lower(), norm}
+    for prefix in _MARKET_PREFIXES:
+        aliases.add(f"{prefix}{norm}")
+    for suffix in ("sh", "sz", "bj"):
+        aliases.add(f"{norm}.{suffix}")
+    stripped = norm.lstrip("0")
+    if stripped:
+        aliases.add(stripped)
+    return [a for a in aliases if a]
+
+
+def to_numeric_series(series: pd.Series) -> pd.Series:
+    """功能: 向量化地将列转换为 float(兼容百分号与千分位逗号)。
+    参数: series 为任意 dtype 的列。返回: float 列，无法转换为 NaN。
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    cleaned = (
+        series.astype(str)
+        .str.strip()
+        .str.replace("%", "", regex=False)
+        .str.replace(",", "", regex=False)
+    )
+    return pd.to_numeric(cleaned, errors="coerce")
+
+
+class QuoteTable:
+    """行情索引表：按代码/名称索引的快照表，提供字典命中与向量化查找。"""
+
+    def __init__(self, df: pd.DataFrame, code_col: Optional[str] = "代码", name_col: Optional[str] = "名称"):
+        frame = df if df is not None else pd.DataFrame()
+        self.code_col = code_col if code_col and code_col in frame.columns else None
+        self.name_col = name_col if name_col and name_col in frame.columns else None
+        self._numeric_cache: Dict[str, pd.Series] = {}
+
+        if self.code_col:
+            raw_codes = frame[self.code_col].astype(str).str.strip()
+            norm_codes = raw_codes.map(normalize_code)
+            keyed = frame.assign(_norm_code=norm_codes.values)
+            keyed = keyed[keyed["_norm_code"] != ""].drop_duplicates(subset=["_norm_code"], keep="first")
+            self.by_code = keyed.set_index("_norm_code")
+            # 别名 -> 归一化代码；先登记的代码优先(与原先首个匹配即返回一致)
+            alias_index: Dict[str, str] = {}
+            for raw, norm in zip(keyed[self.code_col].astype(str).str.strip(), keyed["_norm_code"]):
+                for alias in _code_aliases(raw, norm):
+                    alias_index.setdefault(alias, norm)
+            self._alias_index = alias_index
+        else:
+            self.by_code = pd.DataFrame()
+            self._alias_index = {}
+
+        if self.name_col:
+            names = frame[self.name_col].astype(str).str.strip()
+            named = frame.assign(_name=names.values)
+            named = named[named["_name"] != ""].drop_duplicates(subset=["_name"], keep="last")
+            self.by_name = named.set_index("_name")
+        else:
+            self.by_name = pd.DataFrame()
+
+    def __len__(self) -> int:
+        return len(self.by_code) if self.code_col else len(self.by_name)
+
+    def resolve(self, code: Any) -> Optional[str]:
+        """功能: 将任意格式代码解析为表内归一化代码(字典命中)。返回 None 表示不存在。"""
+        text = str(code).strip().lower()
+        hit = self._alias_index.get(text)
+        if hit is not None:
+            return hit
+        return self._alias_index.get(normalize_code(text))
+
+    def numeric(self, column: str, by: str = "code") -> pd.Series:
+        """功能: 返回按代码或名称索引的数值列(向量化转换，结果缓存)。"""
+        key = f"{by}:{column}"
+        cached = self._numeric_cache.get(key)
+        if cached is not None:
+            return cached
+        base = self.by_code if by == "code" else self.by_name
+        if column in base.columns:
+            series = to_numeric_series(base[column])
+        else:
+            series = pd.Series(float("nan"), index=base.index, dtype=float)
+        self._numeric_cache[key] = series
+        return series
+
+    def lookup_many(self, codes: Iterable[Any], columns: List[str]) -> pd.DataFrame:
+        """功能: 批量按代码查找数值列(一次 reindex 连接)。
+        参数: codes 为查询代码序列, columns 为需要的列名。
+        返回: 以查询代码为索引的 DataFrame；未找到的行全部为 NaN，"_found" 列标记是否命中。
+        """
+        codes = list(codes)
+        resolved = [self.resolve(c) for c in codes]
+        keys = [r if r is not None else "" for r in resolved]
+        data = {col: self.numeric(col, by="code").reindex(keys).to_numpy() for col in columns}
+        out = pd.DataFrame(data, index=pd.Index(codes, name="query"))
+        out["_found"] = [r is not None for r in resolved]
+        return out
+
+    def values_by_name(self, column: str, default: float = 0.0) -> Dict[str, float]:
+        """功能: 返回 {名称: 数值} 映射(向量化转换后一次性构建字典)。"""
+        series = self.numeric(column, by="name").fillna(default)
+        return dict(zip(series.index, series.astype(float).tolist()))
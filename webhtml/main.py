@@ -13,12 +13,12 @@ sys.path.insert(0, project_root)
 print('code path is ', project_root)
 
 import logging
-from datetime import datetime
 from typing import Dict, Any
 from webhtml.config import settings
 from webhtml.reporter.generator import render_report, save_report, backup_raw_data
-from webhtml.reporter.mailer import send_report_mail
+from webhtml.reporter.mailer import build_report_mail, send_report_mail
 from webhtml.data_handler.fetcher import fetch_all_data
+from webhtml.data_handler.history_store import load_trend_history
 from webhtml.analysis.calculator import build_report_view
 from webhtml.analysis.ai_summary import generate_ai_summary
 
@@ -37,13 +37,16 @@ def setup_logging() -> None:
 
 def build_pipeline_data() -> Dict[str, Any]:
     raw = fetch_all_data()
-    view = build_report_view(raw)
+    view = build_report_view(raw, history=load_trend_history(raw.get("date")))
     view["ai_summary"] = generate_ai_summary(view)
     return view
 
 
 def main() -> None:
     setup_logging()
+    # HTTP_MODE=record/replay 时启用录制/回放层（默认 live 不做处理）
+    from http_replay import install as install_http_replay
+    install_http_replay()
     logging.info("开始生成报告...")
     data = build_pipeline_data()
     backup_raw_data(data.get("_raw", {}))
@@ -55,17 +58,7 @@ def main() -> None:
     # 邮件发送默认关闭，按 settings.SEND_MAIL 控制
     logging.info(f"报告邮件准备中，SEND_MAIL is {settings.SEND_MAIL}")
     if settings.SEND_MAIL:
-       
-        # 获取当前时间，格式化为 HH:MM
-        current_time = datetime.now().strftime("%H:%M")
-        subject = f"{current_time} 金融行情早晚报"
-        body = (
-            "尊敬的客户您好，我是淮州金融科技小艾：\n\n"
-            f"已为您生成 {data.get('report_date')} 全球金融行情监控报告\n\n"
-            f"中国大陆市场一句话总结：\n{data.get('ai_summary', '暂无总结')}\n\n"
-            "详细请查看附件HTML文件获取详细图表。\n\n"
-            "(本邮件由系统自动发送)"
-        )
+        subject, body = build_report_mail(data)
         ok = send_report_mail(subject=subject, body=body, html_path=output_path)
         logging.info(f"报告邮件发送结果: {'成功' if ok else '失败'}")
     
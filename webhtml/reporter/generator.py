@@ -1,38 +1,115 @@
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List, Optional
 import json
+import logging
 import os
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+import threading
+import time
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 
 from webhtml.config import settings
+from webhtml.data_handler.history_store import get_history_store
 
+logger = logging.getLogger(__name__)
 
-def _create_jinja_env():
+# 报告各版块，与模板中 {% if '<版块>' in sections %} 的判断一致
+REPORT_SECTIONS = ("summary", "breadth", "styles", "sectors", "risks", "globals")
+# 报告版本：完整版包含全部版块，摘要版只有今日点评与 A 股市场温度
+REPORT_VARIANTS = {
+    "full": REPORT_SECTIONS,
+    "summary": ("summary", "breadth"),
+}
+
+_env: Optional[Environment] = None
+_env_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {"renders": 0, "render_ms_total": 0.0, "last_render_ms": 0.0, "env_ms": 0.0}
+
+
+def _create_jinja_env() -> Environment:
+    os.makedirs(settings.JINJA_CACHE_DIR, exist_ok=True)
     env = Environment(
         loader=FileSystemLoader(settings.TEMPLATES_DIR, followlinks=True),
         autoescape=select_autoescape(["html", "xml"]),
         trim_blocks=True,
         lstrip_blocks=True,
+        # 编译结果写入磁盘，新进程首次 get_template 直接加载字节码；模板文件修改后按 mtime 自动重新编译
+        bytecode_cache=FileSystemBytecodeCache(settings.JINJA_CACHE_DIR),
+        auto_reload=True,
     )
     return env
 
 
+def get_jinja_env() -> Environment:
+    """返回模块级共享的 Jinja 环境（首次调用时创建，之后复用已编译的模板）。"""
+    global _env
+    if _env is None:
+        with _env_lock:
+            if _env is None:
+                started = time.perf_counter()
+                _env = _create_jinja_env()
+                _env.get_template(settings.REPORT_TEMPLATE_NAME)
+                with _stats_lock:
+                    _stats["env_ms"] = (time.perf_counter() - started) * 1000
+    return _env
+
+
+def _base_context(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "report_date": data.get("report_date"),
+        "ai_summary": data.get("ai_summary", "(AI未启用)"),
+        "indexes": data.get("indexes", []),
+        "up_down": data.get("up_down", {}),
+        "styles_groups": data.get("styles_groups", []),
+        "sectors": data.get("sectors", []),
+        "risks": data.get("risks", []),
+        "globals_groups": data.get("globals_groups", []),
+        "current_year": data.get("current_year"),
+        "trend_days": data.get("trend_days", 0),
+        "sections": REPORT_SECTIONS,
+        "recipient_name": None,
+    }
+
+
+def render_reports(data: Dict[str, Any], variants: Iterable[str] = ("full",),
+                   recipients: Optional[List[Dict[str, Any]]] = None) -> Dict[str, str]:
+    """
+    用同一个已编译模板一次渲染多个版本的报告，返回 {名称: HTML}。
+    variants: REPORT_VARIANTS 中的版本名，结果键即版本名；
+    recipients: [{"name": "张三", "variant": "summary", "sections": [...]}]，每位收件人渲染一份
+                （称呼 + 其版本或自定义版块），结果键为 "recipient:<name>"。
+    """
+    template = get_jinja_env().get_template(settings.REPORT_TEMPLATE_NAME)
+    base = _base_context(data)
+    jobs = [(name, {"sections": REPORT_VARIANTS[name]}) for name in variants]
+    for recipient in recipients or []:
+        sections = recipient.get("sections") or REPORT_VARIANTS[recipient.get("variant", "full")]
+        jobs.append((f"recipient:{recipient['name']}", {"sections": tuple(sections),
+                                                        "recipient_name": recipient["name"]}))
+
+    started = time.perf_counter()
+    outputs = {name: template.render({**base, **overrides}) for name, overrides in jobs}
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _stats_lock:
+        _stats["renders"] += len(jobs)
+        _stats["render_ms_total"] += elapsed_ms
+        _stats["last_render_ms"] = elapsed_ms
+    logger.info("报告渲染 %d 个版本，耗时 %.1fms", len(jobs), elapsed_ms)
+    return outputs
+
+
 def render_report(data: Dict[str, Any]) -> str:
-    """将结构化数据渲染成 HTML 字符串。"""
-    env = _create_jinja_env()
-    template = env.get_template(settings.REPORT_TEMPLATE_NAME)
-
-    html = template.render(
-        report_date=data.get("report_date"),
-        ai_summary=data.get("ai_summary", "(AI未启用)"),
-        indexes=data.get("indexes", []),
-        up_down=data.get("up_down", {}),
-        styles_groups=data.get("styles_groups", []),
-        sectors=data.get("sectors", []),
-        risks=data.get("risks", []),
-        globals_groups=data.get("globals_groups", []),
-        current_year=data.get("current_year"),
-    )
-    return html
+    """将结构化数据渲染成 HTML 字符串（完整版）。"""
+    return render_reports(data)["full"]
+
+
+def render_stats() -> Dict[str, Any]:
+    """渲染计时：env_ms 为本进程创建环境并加载模板的耗时（含编译或读取字节码），其余为累计/最近一次渲染。"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["env_ms"] = round(stats["env_ms"], 2)
+    stats["last_render_ms"] = round(stats["last_render_ms"], 2)
+    stats["render_ms_total"] = round(stats["render_ms_total"], 2)
+    return stats
 
 
 def save_report(html: str) -> str:
@@ -45,11 +122,14 @@ def save_report(html: str) -> str:
 
 
 def backup_raw_data(raw_data: Dict[str, Any]) -> str:
-    """备份原始数据到 output/data 目录。"""
+    """备份原始数据到 output/data 目录，并把当天指标写入历史指标库。"""
     settings.ensure_directories()
     path = settings.raw_data_output_path()
     with open(path, "w", encoding="utf-8") as f:
         json.dump(raw_data, f, ensure_ascii=False, indent=2)
+    try:
+        rows = get_history_store().record(raw_data)
+        logger.info("历史指标库写入 %d 行 (%s)", rows, raw_data.get("date"))
+    except Exception as exc:
+        logger.warning("历史指标库写入失败: %s", exc)
     return path
-
-
@@ -1,50 +1,63 @@
 """可选邮件发送(默认关闭)。
 
 为避免引入外部依赖，此处留出接口，默认不做实际发送。
-如需复用现有 mailFun.EmailSender，可在 settings.SEND_MAIL=True 时调用。
+settings.SEND_MAIL=True 时复用项目根目录 mailFun.MailDispatcher 发送。
 """
 
 from __future__ import annotations
 
-import time
-from typing import Optional
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
 from webhtml.config import settings
 
 
-def send_report_mail(subject: str, body: str, html_path: str) -> bool:
-    if not settings.SEND_MAIL:
+def build_report_mail(data: Dict[str, Any]) -> Tuple[str, str]:
+    """根据报告数据生成邮件主题与正文。"""
+    # 获取当前时间，格式化为 HH:MM
+    current_time = datetime.now().strftime("%H:%M")
+    subject = f"{current_time} 金融行情早晚报"
+    body = (
+        "尊敬的客户您好，我是淮州金融科技小艾：\n\n"
+        f"已为您生成 {data.get('report_date')} 全球金融行情监控报告\n\n"
+        f"中国大陆市场一句话总结：\n{data.get('ai_summary', '暂无总结')}\n\n"
+        "详细请查看附件HTML文件获取详细图表。\n\n"
+        "(本邮件由系统自动发送)"
+    )
+    return subject, body
+
+
+def send_report_mail(subject: str, body: str, html_path: str, dispatcher: Any = None,
+                     enabled: Optional[bool] = None) -> bool:
+    """
+    复用项目根目录 mailFun.MailDispatcher 发送报告（失败重试由其负责）。
+    dispatcher 由调用方传入时与同一次运行的其他邮件共用 SMTP 连接，否则单独连接后关闭；
+    enabled 为 None 时取 settings.SEND_MAIL。
+    """
+    if not (settings.SEND_MAIL if enabled is None else enabled):
         return False
-    
-    max_retries = 3
-    delay_seconds = 10
-
-    for attempt in range(max_retries):
-        try:
-            # 示例：复用项目根目录 mailFun
-            from mailFun import EmailSender, config as email_config  # type: ignore
-
-            sender = EmailSender(provider_name=email_config.ACTIVE_SMTP_PROVIDER)
-            time.sleep(2)  # 初始化后短暂延迟
-            success = sender.send(
-                recipient_emails=email_config.DEFAULT_RECIPIENTS["to"],
-                subject=subject,
-                body_text=body,
-                image_paths=[html_path],
-                cc_emails=email_config.DEFAULT_RECIPIENTS["cc"],
-            )
-            if success:
-                print("邮件报告已成功发送。")
-                return True
-            else:
-                print(f"邮件发送返回失败状态 (尝试 {attempt + 1}/{max_retries})")
-        except Exception as e:
-            print(f"错误：初始化或发送邮件时发生严重错误 (尝试 {attempt + 1}/{max_retries}): {e}")
-
-        if attempt < max_retries - 1:
-            print(f"将在 {delay_seconds} 秒后重试...")
-            time.sleep(delay_seconds)
-    
-    print("错误：邮件发送失败，已达到最大重试次数。请检查 emailFile/mailFun.py 的输出日志。")
-    return False
-
 
+    owned = dispatcher is None
+    try:
+        from mailFun import MailDispatcher, config as email_config  # type: ignore
+
+        if owned:
+            dispatcher = MailDispatcher(provider_name=email_config.ACTIVE_SMTP_PROVIDER)
+        success = dispatcher.send(
+            recipient_emails=email_config.DEFAULT_RECIPIENTS["to"],
+            subject=subject,
+            body_text=body,
+            image_paths=[html_path],
+            cc_emails=email_config.DEFAULT_RECIPIENTS["cc"],
+        )
+    except Exception as e:
+        print(f"错误：初始化或发送邮件时发生严重错误: {e}")
+        success = False
+    finally:
+        if owned and dispatcher is not None:
+            dispatcher.close()
+
+    if success:
+        print("邮件报告已成功发送。")
+    else:
+        print("错误：邮件发送失败，已达到最大重试次数。请检查 mailFun.py 的输出日志。")
+    return success